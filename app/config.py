@@ -24,6 +24,13 @@ class Settings(BaseSettings):
     QDRANT_URL: str = "http://localhost:6333"
     QDRANT_API_KEY: str = ""
     QDRANT_COLLECTION_NAME: str = "memories"
+    QDRANT_TENANT_INDEXING: bool = True  # per-user HNSW graphs (every search filters on user_id)
+    
+    # Vector store: "qdrant" or "embedded" (in-process, single app process only)
+    VECTOR_STORE: str = "qdrant"
+    EMBEDDED_VECTOR_PATH: str = "data/vectors"
+    EMBEDDED_VECTOR_DTYPE: str = "float32"  # "float16" halves disk and page cache use
+    EMBEDDED_HNSW_MIN_POINTS: int = 20000  # per-user HNSW graph above this size (needs hnswlib)
     
     # OpenAI
     OPENAI_API_KEY: str = ""
@@ -33,8 +40,58 @@ class Settings(BaseSettings):
     COHERE_API_KEY: str = ""
     COHERE_EMBEDDING_MODEL: str = "embed-english-v3.0"
     
-    # Embedding Provider: "openai" or "cohere"
+    # Embedding Provider: "openai", "cohere" or "local" (offline hashing embedder)
     EMBEDDING_PROVIDER: str = "cohere"
+    LOCAL_EMBEDDING_DIMENSION: int = 384
+    
+    # Document chunking (estimated tokens; capped at the provider's input limit)
+    CHUNK_MAX_TOKENS: int = 400
+    CHUNK_OVERLAP_TOKENS: int = 40
+    
+    # Near-duplicate detection at ingest (SimHash Hamming distance, 0-3)
+    DEDUP_ENABLED: bool = True
+    DEDUP_MAX_DISTANCE: int = 3
+    
+    # Embedding cache (in-process LRU + shared Redis tier)
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ITEMS: int = 10000
+    EMBEDDING_CACHE_TTL_SECONDS: int = 60 * 60 * 24 * 30
+    
+    # Search result cache (Redis, invalidated per user on every write)
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_TTL_SECONDS: int = 300
+    
+    # Embedding mode: "sync" embeds inside the request, "async" queues rows
+    # as pending for the background embedding worker
+    EMBEDDING_MODE: str = "sync"
+    EMBEDDING_WORKER_ENABLED: bool = True
+    EMBEDDING_WORKER_BATCH_SIZE: int = 64
+    EMBEDDING_WORKER_POLL_SECONDS: float = 2.0
+    EMBEDDING_WORKER_MAX_ATTEMPTS: int = 3
+    
+    # Background sync jobs (/social/sync/{platform}), run by a pool of worker threads
+    SYNC_WORKER_ENABLED: bool = True
+    SYNC_WORKERS: int = 4
+    SYNC_MAX_JOBS_PER_USER: int = 2  # running at once
+    SYNC_MAX_JOBS_PER_PLATFORM: int = 2  # running at once, across users (shared API quotas)
+    SYNC_INTERVAL_MINUTES: int = 360  # re-sync accounts this long after last_synced_at; 0 disables
+    SYNC_SCHEDULER_POLL_SECONDS: float = 60.0
+    SYNC_PROGRESS_INTERVAL_SECONDS: float = 2.0
+    SYNC_JOB_STALE_MINUTES: int = 30  # running jobs without a heartbeat this long are failed
+    
+    # Connector HTTP clients (one pooled, keep-alive httpx client per provider)
+    CONNECTOR_HTTP2: bool = True  # used when the h2 package is installed
+    CONNECTOR_MAX_CONNECTIONS: int = 20
+    CONNECTOR_MAX_KEEPALIVE: int = 10
+    CONNECTOR_KEEPALIVE_EXPIRY: float = 30.0
+    CONNECTOR_CONNECT_TIMEOUT: float = 5.0
+    
+    # Connector rate limiting (token bucket per provider and account)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_MAX_RETRIES: int = 5  # retries of a rate-limited (429/503) request
+    RATE_LIMIT_BACKOFF_BASE: float = 1.0  # seconds; doubles per retry, fully jittered
+    RATE_LIMIT_BACKOFF_CAP: float = 60.0
+    RATE_LIMIT_MAX_WAIT: float = 300.0  # longer waits fail the request instead
     
     # Facebook OAuth
     FACEBOOK_APP_ID: str = ""
@@ -63,6 +120,7 @@ class Settings(BaseSettings):
     NOTION_CLIENT_ID: str = ""
     NOTION_CLIENT_SECRET: str = ""
     NOTION_REDIRECT_URI: str = ""
+    NOTION_MAX_CONCURRENCY: int = 3  # requests in flight during a sync (Notion allows ~3/s on average)
     
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://localhost:8000"
@@ -1,11 +1,26 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 
+
+def _async_database_url(url: str) -> str:
+    """Point a postgres URL at the asyncpg driver"""
+    for prefix in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            # asyncpg takes ssl=, not libpq's sslmode=
+            return "postgresql+asyncpg://" + url[len(prefix):].replace("sslmode=", "ssl=")
+    return url
+
+
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Used by the async services so request handlers never block the event loop
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -16,3 +31,100 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Idempotent DDL for columns added after a table was first created.
+# create_all() only creates missing tables, so new columns on existing
+# tables are added here on startup.
+SCHEMA_UPDATES = [
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'memories' AND column_name = 'embedding_status'
+        ) THEN
+            ALTER TABLE memories ADD COLUMN embedding_status VARCHAR DEFAULT 'skipped';
+            ALTER TABLE memories ADD COLUMN embedding_attempts INTEGER DEFAULT 0;
+            UPDATE memories SET embedding_status = 'ready' WHERE vector_id IS NOT NULL;
+        END IF;
+    END $$;
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_embedding_pending
+        ON memories (id) WHERE embedding_status = 'pending'
+    """,
+    """
+    ALTER TABLE memories ADD COLUMN IF NOT EXISTS content_tsv tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_content_tsv
+        ON memories USING GIN (content_tsv)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_user_created
+        ON memories (user_id, created_at DESC, id DESC)
+    """,
+    "ALTER TABLE memories ADD COLUMN IF NOT EXISTS content_simhash BIGINT",
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_simhash_b0
+        ON memories (user_id, ((content_simhash >> 0) & 65535))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_simhash_b1
+        ON memories (user_id, ((content_simhash >> 16) & 65535))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_simhash_b2
+        ON memories (user_id, ((content_simhash >> 32) & 65535))
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS ix_memories_simhash_b3
+        ON memories (user_id, ((content_simhash >> 48) & 65535))
+    """,
+    # memory_counts maintenance: statement-level triggers aggregate each
+    # INSERT/DELETE (bulk inserts included) into one upsert per (user, source)
+    """
+    CREATE OR REPLACE FUNCTION memory_counts_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO memory_counts (user_id, source, count)
+            SELECT user_id, source, count(*) FROM changed_rows GROUP BY user_id, source
+            ON CONFLICT (user_id, source) DO UPDATE SET count = memory_counts.count + EXCLUDED.count;
+        ELSE
+            UPDATE memory_counts SET count = memory_counts.count - d.removed
+            FROM (SELECT user_id, source, count(*) AS removed FROM changed_rows GROUP BY user_id, source) d
+            WHERE memory_counts.user_id = d.user_id AND memory_counts.source = d.source;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'memories_count_insert') THEN
+            -- Backfill and attach the triggers atomically so no write is missed
+            LOCK TABLE memories IN SHARE ROW EXCLUSIVE MODE;
+            DELETE FROM memory_counts;
+            INSERT INTO memory_counts (user_id, source, count)
+            SELECT user_id, source, count(*) FROM memories GROUP BY user_id, source;
+            
+            CREATE TRIGGER memories_count_insert AFTER INSERT ON memories
+                REFERENCING NEW TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION memory_counts_apply();
+            CREATE TRIGGER memories_count_delete AFTER DELETE ON memories
+                REFERENCING OLD TABLE AS changed_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION memory_counts_apply();
+        END IF;
+    END $$;
+    """,
+]
+
+
+def apply_schema_updates():
+    """Bring existing tables up to date with the models"""
+    with engine.begin() as conn:
+        for statement in SCHEMA_UPDATES:
+            conn.execute(text(statement))
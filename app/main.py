@@ -1,12 +1,17 @@
+import asyncio
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.routers import auth, memory, social, oauth, upload
-from app.database import engine, Base, SessionLocal
+from app.database import engine, Base, SessionLocal, apply_schema_updates
 from app.models.user import User
 from app.models.memory import Memory
+from app.models.memory_count import MemoryCount
 from app.models.social_account import SocialAccount
 from app.models.permission import Permission
+from app.models.sync_cursor import SyncCursor
+from app.models.sync_job import SyncJob
 from passlib.context import CryptContext
 
 app = FastAPI(
@@ -30,6 +35,7 @@ async def startup_event():
     try:
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        apply_schema_updates()
         print("✅ Database tables created successfully!")
         
         # Create test user if not exists
@@ -53,6 +59,50 @@ async def startup_event():
             db.close()
     except Exception as e:
         print(f"❌ Startup error: {e}")
+    
+    if settings.EMBEDDING_WORKER_ENABLED:
+        from app.services.embedding_worker import embedding_worker
+        embedding_worker.start()
+    
+    if settings.SYNC_WORKER_ENABLED:
+        from app.services.sync_worker import sync_worker
+        sync_worker.start(asyncio.get_running_loop())
+    
+    # Data written before newer fields existed (each is a no-op once done)
+    threading.Thread(target=_run_backfills, name="backfill", daemon=True).start()
+
+
+def _run_backfills():
+    from app.services.memory_service import memory_service
+    
+    try:
+        memory_service.backfill_payload_timestamps()
+    except Exception as e:
+        print(f"Qdrant payload backfill failed: {str(e)}")
+    
+    try:
+        memory_service.backfill_simhashes()
+    except Exception as e:
+        print(f"SimHash backfill failed: {str(e)}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.embedding_worker import embedding_worker
+    from app.services.sync_worker import sync_worker
+    from app.services.async_memory_service import async_memory_service
+    from app.services.file_service import file_service
+    from app.utils.redis_client import redis_client
+    from app.utils.http_client import http_clients
+    from app.database import async_engine
+    
+    embedding_worker.stop()
+    sync_worker.stop()
+    file_service.shutdown()
+    await async_memory_service.close()
+    await redis_client.close()
+    await http_clients.close()
+    await async_engine.dispose()
 
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
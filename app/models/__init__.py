@@ -1,6 +1,9 @@
 from app.models.user import User
 from app.models.memory import Memory
+from app.models.memory_count import MemoryCount
 from app.models.social_account import SocialAccount
 from app.models.permission import Permission
+from app.models.sync_cursor import SyncCursor
+from app.models.sync_job import SyncJob
 
-__all__ = ["User", "Memory", "SocialAccount", "Permission"]
+__all__ = ["User", "Memory", "MemoryCount", "SocialAccount", "Permission", "SyncCursor", "SyncJob"]
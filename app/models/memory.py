@@ -1,8 +1,19 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, JSON, Index, Computed, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.sql import func
 from app.database import Base
 
+# Near-duplicate detection: the 64-bit SimHash is split into 4 x 16-bit bands,
+# each with its own expression index (see DedupService)
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = 16
+
+
+def simhash_band_sql(band: int) -> str:
+    """SQL for one band of content_simhash; must match the index expressions verbatim"""
+    return f"((content_simhash >> {band * SIMHASH_BAND_BITS}) & {(1 << SIMHASH_BAND_BITS) - 1})"
+
 
 class Memory(Base):
     __tablename__ = "memories"
@@ -22,6 +33,14 @@ class Memory(Base):
     
     # Vector search
     vector_id = Column(String, unique=True)  # ID in Qdrant
+    embedding_status = Column(String, default="skipped")  # pending, ready, failed, skipped
+    embedding_attempts = Column(Integer, default=0)
+    
+    # Full-text search (generated by Postgres, deferred so normal loads skip it)
+    content_tsv = deferred(Column(TSVECTOR, Computed("to_tsvector('english', content)", persisted=True)))
+    
+    # Near-duplicate detection (signed 64-bit SimHash of the content)
+    content_simhash = Column(BigInteger)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -29,3 +48,20 @@ class Memory(Base):
     
     # Relationships
     user = relationship("User", back_populates="memories")
+    
+    __table_args__ = (
+        # Keeps the embedding worker's queue scan proportional to the backlog
+        Index(
+            "ix_memories_embedding_pending",
+            "id",
+            postgresql_where=text("embedding_status = 'pending'")
+        ),
+        Index("ix_memories_content_tsv", "content_tsv", postgresql_using="gin"),
+        # Keyset pagination for /memory/list: page N costs the same as page 1
+        Index("ix_memories_user_created", "user_id", created_at.desc(), id.desc()),
+        # One per SimHash band: near-duplicate lookups are index probes, not scans
+        *(
+            Index(f"ix_memories_simhash_b{band}", "user_id", text(simhash_band_sql(band)))
+            for band in range(SIMHASH_BANDS)
+        ),
+    )
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, BigInteger, ForeignKey
+from app.database import Base
+
+
+class MemoryCount(Base):
+    """Number of memories per (user, source), kept current by triggers on memories
+    
+    Lets /memory/list report totals without a COUNT(*) over the user's history.
+    The triggers are installed by apply_schema_updates() in app/database.py.
+    """
+    __tablename__ = "memory_counts"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    source = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class SyncCursor(Base):
+    """Where the last incremental import of a source stopped, per user and account
+    
+    cursor is the source's own position (a last-visit timestamp, a page token,
+    a history id); state holds anything else the importer wants to keep.
+    account_id tells apart several accounts or browser profiles of one source.
+    """
+    __tablename__ = "sync_cursors"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    source = Column(String, primary_key=True)
+    account_id = Column(String, primary_key=True, default="")
+    
+    cursor = Column(String)
+    state = Column(JSON, default={})
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
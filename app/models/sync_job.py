@@ -0,0 +1,50 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON, Index, text
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class SyncJob(Base):
+    """One background sync of a connected account
+    
+    The table is the job queue: workers claim queued rows with FOR UPDATE
+    SKIP LOCKED (see SyncJobService.claim_next), so jobs survive restarts and
+    are shared by every app process.
+    """
+    __tablename__ = "sync_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    social_account_id = Column(Integer, ForeignKey("social_accounts.id", ondelete="CASCADE"), nullable=False)
+    platform = Column(String, nullable=False)
+    
+    status = Column(String, nullable=False, default="queued")  # queued, running, succeeded, failed
+    trigger = Column(String, default="manual")  # manual, scheduled
+    
+    # Running counts reported by the sync; result is its final response
+    progress = Column(JSON, default={})
+    result = Column(JSON)
+    error = Column(Text)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True))
+    finished_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    __table_args__ = (
+        # Workers scan only the backlog and the running set
+        Index(
+            "ix_sync_jobs_active",
+            "status",
+            "id",
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+        # At most one queued or running job per account
+        Index(
+            "ux_sync_jobs_account_active",
+            "social_account_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+        Index("ix_sync_jobs_user_created", "user_id", "id"),
+    )
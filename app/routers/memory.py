@@ -1,6 +1,10 @@
+import asyncio
 from fastapi import APIRouter, Query, Body
 from typing import Optional
-from app.services.memory_service import memory_service
+from app.services.async_memory_service import async_memory_service
+from app.services.embedding_service import embedding_service
+from app.services.search_cache import search_cache
+from app.schemas.memory import MemoryBulkCreate
 
 router = APIRouter()
 
@@ -12,16 +16,29 @@ async def create_memory(
     user_id: int = Body(1, description="User ID (temporarily hardcoded for testing)"),
     category: Optional[str] = Body(None, description="Category tag"),
     original_url: Optional[str] = Body(None, description="Original source URL"),
-    generate_embedding: bool = Body(True, description="Generate embedding with Cohere (free)")
+    generate_embedding: bool = Body(True, description="Generate embedding with Cohere (free)"),
+    async_embedding: Optional[bool] = Body(None, description="Queue the embedding instead of waiting for it (defaults to EMBEDDING_MODE)")
 ):
     """Create a new memory with optional embedding"""
-    return memory_service.create_memory(
+    return await async_memory_service.create_memory(
         user_id=user_id,
         content=content,
         source=source,
         category=category,
         original_url=original_url,
-        generate_embedding=generate_embedding
+        generate_embedding=generate_embedding,
+        embedding_mode=_embedding_mode(async_embedding)
+    )
+
+
+@router.post("/bulk")
+async def create_memories_bulk(payload: MemoryBulkCreate):
+    """Create many memories in one request (batched embeddings, single INSERT)"""
+    return await async_memory_service.create_memories_bulk(
+        user_id=payload.user_id,
+        items=[item.model_dump() for item in payload.items],
+        generate_embedding=payload.generate_embedding,
+        embedding_mode=_embedding_mode(payload.async_embedding)
     )
 
 
@@ -30,14 +47,20 @@ async def search_memories(
     query: str = Query(..., description="Search query"),
     user_id: int = Query(1, description="User ID"),
     limit: int = Query(10, ge=1, le=50),
-    source: Optional[str] = Query(None, description="Filter by source")
+    source: Optional[str] = Query(None, description="Filter by source"),
+    mode: str = Query(
+        "vector",
+        pattern="^(vector|lexical|hybrid)$",
+        description="vector (semantic), lexical (full-text, no embedding call) or hybrid (both, rank-fused)"
+    )
 ):
-    """Semantic search for memories"""
-    return memory_service.search_memories(
+    """Search memories"""
+    return await async_memory_service.search_memories(
         query=query,
         user_id=user_id,
         limit=limit,
-        source_filter=source
+        source_filter=source,
+        mode=mode
     )
 
 
@@ -46,24 +69,59 @@ async def list_memories(
     user_id: int = Query(1, description="User ID"),
     source: Optional[str] = Query(None, description="Filter by source"),
     limit: int = Query(50, ge=1, le=100),
-    offset: int = Query(0, ge=0)
+    offset: int = Query(0, ge=0, description="Deprecated: use cursor"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    total_mode: str = Query("counter", pattern="^(counter|exact|none)$", description="How to compute total")
 ):
-    """List all memories for a user"""
-    return memory_service.list_memories(
+    """List all memories for a user (newest first, cursor-paginated)"""
+    return await async_memory_service.list_memories(
         user_id=user_id,
         source=source,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor,
+        total_mode=total_mode
     )
 
 
+@router.get("/embedding-cache/stats")
+async def get_embedding_cache_stats():
+    """Embedding cache hit/miss counters"""
+    return {"success": True, "stats": embedding_service.get_cache_stats()}
+
+
+@router.get("/search-cache/stats")
+async def get_search_cache_stats():
+    """Search result cache hit/miss counters"""
+    return {"success": True, "stats": search_cache.get_stats()}
+
+
 @router.get("/{memory_id}")
 async def get_memory(
     memory_id: int,
     user_id: int = Query(1, description="User ID")
 ):
     """Get a specific memory by ID"""
-    return memory_service.get_memory_by_id(memory_id, user_id)
+    return await async_memory_service.get_memory_by_id(memory_id, user_id)
+
+
+@router.get("/{memory_id}/status")
+async def get_embedding_status(
+    memory_id: int,
+    user_id: int = Query(1, description="User ID"),
+    wait: float = Query(0, ge=0, le=30, description="Seconds to wait for a pending embedding")
+):
+    """Embedding status of a memory; optionally wait until it leaves 'pending'"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    
+    while True:
+        result = await async_memory_service.get_embedding_status(memory_id, user_id)
+        if not result.get("success") or result["embedding_status"] != "pending":
+            return result
+        if loop.time() >= deadline:
+            return result
+        await asyncio.sleep(0.25)
 
 
 @router.delete("/{memory_id}")
@@ -72,4 +130,10 @@ async def delete_memory(
     user_id: int = Query(1, description="User ID")
 ):
     """Delete a memory"""
-    return memory_service.delete_memory(memory_id, user_id)
+    return await async_memory_service.delete_memory(memory_id, user_id)
+
+
+def _embedding_mode(async_embedding: Optional[bool]) -> Optional[str]:
+    if async_embedding is None:
+        return None
+    return "async" if async_embedding else "sync"
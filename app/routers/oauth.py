@@ -67,7 +67,7 @@ async def linkedin_oauth_callback(
             "message": "No authorization code received from LinkedIn. Your app may need verification."
         }
     
-    result = linkedin_service.exchange_code_for_token(code)
+    result = await linkedin_service.exchange_code_for_token(code)
     
     if result.get("success"):
         return {
@@ -113,7 +113,7 @@ async def gmail_oauth_callback(
             "message": "No authorization code received from Google."
         }
     
-    result = gmail_service.exchange_code_for_token(code)
+    result = await gmail_service.exchange_code_for_token(code)
     
     if result.get("success"):
         return {
@@ -160,7 +160,7 @@ async def notion_oauth_callback(
             "message": "No authorization code received from Notion."
         }
     
-    result = notion_service.exchange_code_for_token(code)
+    result = await notion_service.exchange_code_for_token(code)
     
     if result.get("success"):
         return {
@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Depends, Query
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
 from app.models.user import User
+from app.schemas.social import SocialAccountConnect
 from app.utils.dependencies import get_current_user
 from app.services.twitter_service import twitter_service
 from app.services.linkedin_service import linkedin_service
 from app.services.gmail_service import gmail_service
 from app.services.notion_service import notion_service
+from app.services.social_account_service import social_account_service
+from app.services.sync_job_service import sync_job_service
+from app.services.sync_worker import sync_worker
 
 router = APIRouter()
 
@@ -12,67 +18,29 @@ router = APIRouter()
 @router.get("/twitter/test-connection")
 async def test_twitter_connection():
     """Test Twitter API connection - Get authenticated user info"""
-    return twitter_service.get_my_user_info()
+    return await run_in_threadpool(twitter_service.get_my_user_info)
 
 
 @router.get("/twitter/my-tweets")
 async def get_my_tweets(max_results: int = Query(default=10, ge=1, le=100)):
     """Get authenticated user's recent tweets"""
-    return twitter_service.get_my_recent_tweets(max_results=max_results)
+    return await run_in_threadpool(twitter_service.get_my_recent_tweets, max_results)
 
 
 @router.get("/twitter/user/{username}")
 async def search_twitter_user(username: str):
     """Search for a Twitter user by username"""
-    return twitter_service.search_user_by_username(username)
+    return await run_in_threadpool(twitter_service.search_user_by_username, username)
 
 
 @router.post("/twitter/sync-to-memory")
 async def sync_twitter_to_memory(
     user_id: int = Query(1, description="User ID"),
-    max_tweets: int = Query(50, ge=1, le=100, description="Max tweets to sync")
+    max_tweets: int = Query(3200, ge=1, le=3200, description="Max tweets to sync in this run"),
+    full_resync: bool = Query(False, description="Ignore the since_id cursor and page through the whole timeline")
 ):
-    """Fetch your tweets and save them as memories"""
-    from app.services.memory_service import memory_service
-    
-    # Fetch tweets
-    result = twitter_service.get_my_recent_tweets(max_results=max_tweets)
-    
-    if not result.get("success"):
-        return result
-    
-    tweets = result.get("data", [])
-    saved_count = 0
-    errors = []
-    
-    # Save each tweet as a memory
-    for tweet in tweets:
-        memory_result = memory_service.create_memory(
-            user_id=user_id,
-            content=tweet["text"],
-            source="twitter",
-            category="tweet",
-            meta_data={
-                "likes": tweet.get("likes", 0),
-                "retweets": tweet.get("retweets", 0),
-                "replies": tweet.get("replies", 0)
-            },
-            original_post_id=str(tweet["id"]),
-            original_url=f"https://twitter.com/i/web/status/{tweet['id']}"
-        )
-        
-        if memory_result.get("success"):
-            saved_count += 1
-        else:
-            errors.append(memory_result.get("error"))
-    
-    return {
-        "success": True,
-        "tweets_fetched": len(tweets),
-        "memories_saved": saved_count,
-        "errors": errors if errors else None,
-        "message": f"Successfully synced {saved_count} tweets to memory!"
-    }
+    """Save tweets posted since the last sync as memories (the whole timeline on the first run)"""
+    return await run_in_threadpool(twitter_service.sync_to_memory, user_id, max_tweets, full_resync)
 
 
 @router.get("/linkedin/oauth-url")
@@ -89,7 +57,7 @@ async def get_linkedin_oauth_url():
 @router.get("/linkedin/test-token")
 async def test_linkedin_token(access_token: str = Query(..., description="LinkedIn access token")):
     """Test LinkedIn API with access token - Get user profile"""
-    return linkedin_service.get_user_profile(access_token)
+    return await linkedin_service.get_user_profile(access_token)
 
 
 @router.get("/linkedin/my-posts")
@@ -98,7 +66,7 @@ async def get_linkedin_posts(
     count: int = Query(default=10, ge=1, le=50)
 ):
     """Get user's LinkedIn posts"""
-    return linkedin_service.get_user_posts(access_token, count)
+    return await linkedin_service.get_user_posts(access_token, count)
 
 
 @router.post("/linkedin/sync-to-memory")
@@ -107,71 +75,60 @@ async def sync_linkedin_to_memory(
     user_id: int = Query(1, description="User ID")
 ):
     """Save your LinkedIn profile as a memory"""
-    from app.services.memory_service import memory_service
-    
-    # Fetch profile
-    result = linkedin_service.get_user_profile(access_token)
-    
-    if not result.get("success"):
-        return result
-    
-    profile = result.get("data", {})
-    
-    # Create structured content
-    content = f"""LinkedIn Profile:
-Name: {profile.get('name', 'N/A')}
-Email: {profile.get('email', 'N/A')}
-Profile: {profile.get('sub', 'N/A')}
-"""
-    
-    # Save as memory
-    memory_result = memory_service.create_memory(
-        user_id=user_id,
-        content=content,
-        source="linkedin",
-        category="profile",
-        meta_data=profile,
-        original_url="https://www.linkedin.com/in/me"
-    )
-    
-    return {
-        "success": memory_result.get("success"),
-        "profile_saved": True,
-        "memory_id": memory_result.get("memory_id"),
-        "message": "LinkedIn profile synced to memory!"
-    }
+    return await linkedin_service.sync_to_memory(access_token, user_id)
 
 
 @router.get("/gmail/test-token")
 async def test_gmail_token(access_token: str = Query(..., description="Gmail access token")):
     """Test Gmail API with access token - Get user profile"""
-    return gmail_service.get_user_profile(access_token)
+    return await run_in_threadpool(gmail_service.get_user_profile, access_token)
 
 
 @router.get("/gmail/my-emails")
 async def get_my_emails(
     access_token: str = Query(..., description="Gmail access token"),
     max_results: int = Query(default=10, ge=1, le=50),
-    query: str = Query(default="", description="Search query (e.g., 'from:someone@example.com')")
+    query: str = Query(default="", description="Search query (e.g., 'from:someone@example.com')"),
+    message_format: str = Query(default="full", pattern="^(full|metadata)$", description="'metadata' skips bodies")
 ):
     """Get user's recent emails"""
-    return gmail_service.get_recent_emails(access_token, max_results, query)
+    return await run_in_threadpool(gmail_service.get_recent_emails, access_token, max_results, query, message_format)
 
 
 @router.get("/gmail/search")
 async def search_gmail(
     access_token: str = Query(..., description="Gmail access token"),
     query: str = Query(..., description="Gmail search query"),
-    max_results: int = Query(default=20, ge=1, le=100)
+    max_results: int = Query(default=20, ge=1, le=100),
+    message_format: str = Query(default="full", pattern="^(full|metadata)$", description="'metadata' skips bodies")
 ):
     """Search Gmail with specific query"""
-    return gmail_service.search_emails(access_token, query, max_results)
+    return await run_in_threadpool(gmail_service.search_emails, access_token, query, max_results, message_format)
+
+
+@router.post("/gmail/sync-to-memory")
+async def sync_gmail_to_memory(
+    access_token: str = Query(..., description="Gmail access token"),
+    user_id: int = Query(1, description="User ID"),
+    max_messages: int = Query(500, ge=1, le=5000, description="Messages to import on the first (full) sync"),
+    message_format: str = Query(default="full", pattern="^(full|metadata)$", description="'metadata' skips bodies"),
+    full_resync: bool = Query(False, description="Ignore the stored historyId and list the mailbox again")
+):
+    """Save emails received since the last sync as memories"""
+    return await run_in_threadpool(
+        gmail_service.sync_to_memory,
+        access_token,
+        user_id,
+        max_messages,
+        message_format,
+        full_resync
+    )
 
 
 @router.get("/notion/test-token")
 async def test_notion_token(access_token: str = Query(..., description="Notion access token")):
     """Test Notion API - Search all pages"""
-    return notion_service.search_pages(access_token, query="", page_size=10)
+    return await notion_service.search_pages(access_token, query="", page_size=10)
 
 
 @router.get("/notion/search")
@@ -181,7 +138,7 @@ async def search_notion_pages(
     page_size: int = Query(default=20, ge=1, le=100)
 ):
     """Search pages in Notion workspace"""
-    return notion_service.search_pages(access_token, query, page_size)
+    return await notion_service.search_pages(access_token, query, page_size)
 
 
 @router.get("/notion/page/{page_id}")
@@ -190,88 +147,66 @@ async def get_notion_page_content(
     access_token: str = Query(..., description="Notion access token")
 ):
     """Get content from a specific Notion page"""
-    return notion_service.get_page_content(access_token, page_id)
+    return await notion_service.aget_page_content(access_token, page_id)
 
 
 @router.post("/notion/sync-to-memory")
 async def sync_notion_to_memory(
     access_token: str = Query(..., description="Notion access token"),
     user_id: int = Query(1, description="User ID"),
-    max_pages: int = Query(20, ge=1, le=100, description="Max pages to sync")
+    max_pages: int = Query(500, ge=1, le=5000, description="Max pages to sync")
 ):
-    """Fetch Notion pages and save them as memories"""
-    from app.services.memory_service import memory_service
-    
-    # Search all pages
-    search_result = notion_service.search_pages(access_token, query="", page_size=max_pages)
-    
-    if not search_result.get("success"):
-        return search_result
+    """Fetch Notion pages (nested blocks included) and save them as memories"""
+    return await notion_service.sync_to_memory(access_token, user_id, max_pages)
+
+
+@router.post("/sync/{platform}")
+async def sync_social_platform(
+    platform: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Queue a background sync of your connected accounts on a platform
     
-    pages = search_result.get("data", [])
-    saved_count = 0
-    errors = []
+    Returns at once with the queued jobs; poll /social/sync/jobs/{job_id}
+    for progress. An account already queued or syncing keeps its job.
+    """
+    if platform not in sync_job_service.PLATFORMS:
+        return {"success": False, "error": f"Unsupported platform: {platform}"}
     
-    # Save each page
-    for page in pages:
-        page_id = page.get("id")
-        
-        # Get page content
-        content_result = notion_service.get_page_content(access_token, page_id)
-        
-        if content_result.get("success"):
-            page_content = content_result.get("content", "")
-            
-            # Create structured content
-            full_content = f"""Notion Page: {page.get('title', 'Untitled')}
-
-{page_content}
-
----
-Created: {page.get('created_time', 'N/A')}
-Last Edited: {page.get('last_edited_time', 'N/A')}
-"""
-            
-            memory_result = memory_service.create_memory(
-                user_id=user_id,
-                content=full_content,
-                source="notion",
-                category="document",
-                meta_data={
-                    "page_id": page_id,
-                    "title": page.get("title"),
-                    "created_time": page.get("created_time"),
-                    "last_edited_time": page.get("last_edited_time")
-                },
-                original_post_id=page_id,
-                original_url=page.get("url"),
-                generate_embedding=True
-            )
-            
-            if memory_result.get("success"):
-                saved_count += 1
-            else:
-                errors.append(memory_result.get("error"))
+    jobs = await sync_job_service.enqueue(current_user.id, platform)
+    if not jobs:
+        return {"success": False, "error": f"No connected {platform} account (connect one at POST /social/accounts/{platform})"}
     
+    sync_worker.notify()
     return {
         "success": True,
-        "pages_fetched": len(pages),
-        "memories_saved": saved_count,
-        "errors": errors if errors else None,
-        "message": f"Successfully synced {saved_count} Notion pages to memory!"
+        "jobs": jobs,
+        "message": f"Syncing {platform} in the background"
     }
 
 
-@router.post("/sync/{platform}")
-async def sync_social_platform(
-    platform: str,
+@router.get("/sync/jobs")
+async def list_sync_jobs(
+    platform: Optional[str] = Query(default=None),
+    status: Optional[str] = Query(default=None, pattern="^(queued|running|succeeded|failed)$"),
+    limit: int = Query(default=20, ge=1, le=100),
     current_user: User = Depends(get_current_user)
 ):
-    """Sync memories from social media platform"""
-    return {
-        "message": f"Syncing {platform} - To be implemented",
-        "user_id": current_user.id
-    }
+    """List your most recent sync jobs, newest first"""
+    jobs = await sync_job_service.list_jobs(current_user.id, platform, status, limit)
+    return {"success": True, "count": len(jobs), "jobs": jobs}
+
+
+@router.get("/sync/jobs/{job_id}")
+async def get_sync_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user)
+):
+    """Get a sync job's status, progress and result"""
+    job = await sync_job_service.get_job(current_user.id, job_id)
+    if job is None:
+        return {"success": False, "error": "Sync job not found"}
+    return {"success": True, "job": job}
 
 
 @router.get("/accounts")
@@ -279,10 +214,18 @@ async def list_connected_accounts(
     current_user: User = Depends(get_current_user)
 ):
     """List all connected social media accounts"""
-    return {
-        "message": "List connected accounts - To be implemented",
-        "user_id": current_user.id
-    }
+    accounts = await social_account_service.list_accounts(current_user.id)
+    return {"success": True, "count": len(accounts), "accounts": accounts}
+
+
+@router.post("/accounts/{platform}")
+async def connect_account(
+    platform: str,
+    credentials: SocialAccountConnect,
+    current_user: User = Depends(get_current_user)
+):
+    """Connect a social media account, so it can be synced in the background"""
+    return await social_account_service.connect(current_user.id, platform, credentials.model_dump())
 
 
 @router.delete("/accounts/{platform}")
@@ -291,7 +234,11 @@ async def disconnect_account(
     current_user: User = Depends(get_current_user)
 ):
     """Disconnect a social media account"""
+    disconnected = await social_account_service.disconnect(current_user.id, platform)
+    if not disconnected:
+        return {"success": False, "error": f"No connected {platform} account"}
     return {
-        "message": f"Disconnect {platform} - To be implemented",
-        "user_id": current_user.id
+        "success": True,
+        "disconnected": disconnected,
+        "message": f"Disconnected {platform}"
     }
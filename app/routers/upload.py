@@ -1,7 +1,13 @@
+import io
+import json
 from fastapi import APIRouter, UploadFile, File, Form, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 from app.services.file_service import file_service
-from app.services.browser_history_service import browser_history_service
+from app.services.browser_history_service import browser_history_service, DomainStats
+from app.services.async_memory_service import async_memory_service
+from app.services.sync_cursor_service import sync_cursor_service
 from app.services.whatsapp_service import whatsapp_service
 
 router = APIRouter()
@@ -11,15 +17,24 @@ router = APIRouter()
 async def upload_document(
     file: UploadFile = File(...),
     category: str = Form(default="document"),
-    description: Optional[str] = Form(default=None)
+    description: Optional[str] = Form(default=None),
+    include_text: bool = Form(default=False)
 ):
-    """Upload document file (txt, pdf, docx) and extract text"""
+    """Upload document file (txt, pdf, docx) and extract text
+    
+    The multipart parser has already spooled the upload (in memory up to 1MB,
+    then to a temp file), so the size check happens before any bytes are read
+    and extraction streams from the spooled file handle in a worker thread.
+    """
     try:
-        # Read file content
-        content = await file.read()
-        
-        # Process file
-        result = file_service.process_file(file.filename, content)
+        result = await run_in_threadpool(
+            file_service.process_upload,
+            file.filename,
+            file.file,
+            file.size,
+            3,  # Return first 3 chunks as preview
+            include_text
+        )
         
         if not result.get("success"):
             return result
@@ -29,11 +44,6 @@ async def upload_document(
         result["description"] = description
         result["upload_status"] = "processed"
         
-        # Chunk text for embeddings
-        chunks = file_service.chunk_text(result["text"])
-        result["chunk_count"] = len(chunks)
-        result["chunks"] = chunks[:3]  # Return first 3 chunks as preview
-        
         return result
     except Exception as e:
         return {"success": False, "error": str(e)}
@@ -43,21 +53,98 @@ async def upload_document(
 async def upload_browser_history(
     file: UploadFile = File(...),
     browser_type: str = Form(default="chrome"),
-    format_type: str = Form(default="json")
+    format_type: str = Form(default="json"),
+    include_entries: bool = Form(default=True, description="Return every parsed entry (turn off for large exports)"),
+    stream: bool = Form(default=False, description="Stream NDJSON: one entry per line, then a summary line"),
+    save_to_memory: bool = Form(default=False, description="Store one memory per visited domain"),
+    max_domains: int = Form(default=500, ge=1, le=5000, description="Most visited domains to store"),
+    user_id: int = Form(default=1, description="User ID")
 ):
-    """Upload browser history export file"""
+    """Upload browser history export file
+    
+    The export is parsed incrementally from the spooled upload and domain
+    totals are kept as running aggregates, so memory use stays flat however
+    many entries there are (unless include_entries asks for all of them).
+    """
     try:
-        content = await file.read()
-        content_str = content.decode('utf-8')
+        if stream:
+            chunks = _detach_upload(file, browser_history_service.READ_SIZE)
+            return StreamingResponse(
+                _ndjson(browser_history_service.iter_history_events(chunks, browser_type, format_type)),
+                media_type="application/x-ndjson"
+            )
         
-        if browser_type == "chrome":
-            result = browser_history_service.parse_chrome_history(content_str)
-        elif browser_type == "firefox":
-            result = browser_history_service.parse_firefox_history(content_str)
-        elif browser_type == "safari":
-            result = browser_history_service.parse_safari_history(content_str)
-        else:
-            result = browser_history_service.parse_generic_history(content_str, format_type)
+        stats = DomainStats()
+        result = await run_in_threadpool(
+            browser_history_service.parse_history,
+            file.file,
+            browser_type,
+            format_type,
+            include_entries,
+            stats
+        )
+        
+        if result.get("success") and save_to_memory:
+            bulk_result = await async_memory_service.create_memories_bulk(
+                user_id=user_id,
+                items=stats.memory_items(result["source"], max_domains)
+            )
+            result["memories_saved"] = bulk_result["created"]
+            result["duplicates_skipped"] = bulk_result["deduplicated"]
+        
+        return result
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+@router.post("/upload/browser-history-db")
+async def upload_browser_history_database(
+    file: UploadFile = File(..., description="Chrome 'History' or Firefox 'places.sqlite' file"),
+    browser_type: Optional[str] = Form(default=None, description="chrome or firefox (detected when omitted)"),
+    profile: str = Form(default="default", description="Browser profile; each keeps its own high-water mark"),
+    full_import: bool = Form(default=False, description="Ignore the stored high-water mark and read everything"),
+    include_entries: bool = Form(default=False, description="Return every imported entry"),
+    save_to_memory: bool = Form(default=True, description="Store one memory per visited domain"),
+    max_domains: int = Form(default=500, ge=1, le=5000, description="Most visited domains of the delta to store (the rest are skipped for good)"),
+    user_id: int = Form(default=1, description="User ID")
+):
+    """Import a browser's SQLite history database directly
+    
+    Only URLs visited since the last import of this profile are read. The
+    high-water mark advances once the delta has been stored as memories, so
+    a weekly re-import reads a week of history, not all of it; if any memory
+    fails to store, it stays put and the next import reads the delta again.
+    A domain visited again updates the memory of the previous import, whose
+    visit totals the new visits are added to.
+    
+    Only the max_domains most visited domains of the delta are stored. The
+    high-water mark still moves past the others' visits, so they are lost;
+    the response counts them in domains_skipped.
+    """
+    try:
+        saved = None if full_import else await sync_cursor_service.aget(user_id, "browser_history", profile)
+        
+        stats = DomainStats()
+        result = await run_in_threadpool(
+            browser_history_service.parse_history_database,
+            file.file,
+            browser_type,
+            saved["cursor"] if saved else None,
+            include_entries,
+            stats
+        )
+        
+        if result.get("success") and save_to_memory:
+            result.update(await _save_domain_memories(user_id, stats, result["source"], profile, max_domains))
+            
+            if result["count"] and not result["memories_failed"]:
+                await sync_cursor_service.asave(
+                    user_id,
+                    "browser_history",
+                    profile,
+                    result["cursor"],
+                    {"browser": result["source"], "last_import_count": result["count"]}
+                )
         
         return result
     except Exception as e:
@@ -67,19 +154,23 @@ async def upload_browser_history(
 @router.post("/upload/whatsapp-chat")
 async def upload_whatsapp_chat(
     file: UploadFile = File(...),
-    sender_filter: Optional[str] = Form(default=None)
+    sender_filter: Optional[str] = Form(default=None),
+    stream: bool = Form(default=False, description="Stream NDJSON: one message per line, then a summary line")
 ):
     """Upload WhatsApp chat export file"""
     try:
-        content = await file.read()
-        content_str = content.decode('utf-8')
-        
-        if sender_filter:
-            result = whatsapp_service.parse_whatsapp_chat_filtered(content_str, sender_filter)
-        else:
-            result = whatsapp_service.parse_whatsapp_chat(content_str)
+        if stream:
+            return StreamingResponse(
+                _ndjson(whatsapp_service.iter_chat_events(_detach_upload(file), sender_filter)),
+                media_type="application/x-ndjson"
+            )
         
-        return result
+        # Lines are read from the spooled upload, never as one decoded string
+        return await run_in_threadpool(
+            whatsapp_service.parse_whatsapp_chat_filtered,
+            file.file,
+            sender_filter
+        )
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -100,6 +191,11 @@ async def get_supported_formats():
                 "browsers": ["chrome", "firefox", "safari", "generic"],
                 "endpoint": "/upload/browser-history"
             },
+            "browser_history_database": {
+                "types": ["Chrome History", "Firefox places.sqlite"],
+                "incremental": True,
+                "endpoint": "/upload/browser-history-db"
+            },
             "whatsapp": {
                 "types": [".txt"],
                 "format": "WhatsApp chat export",
@@ -107,3 +203,80 @@ async def get_supported_formats():
             }
         }
     }
+
+
+async def _save_domain_memories(
+    user_id: int,
+    stats: DomainStats,
+    source: str,
+    profile: str,
+    max_domains: int
+) -> dict:
+    """Store a database import's domains, updating the memories earlier imports of the profile made
+    
+    memories_failed counts the domains whose memory was not stored.
+    """
+    stored = {}
+    for record in await async_memory_service.list_source_records(user_id, "browser_history"):
+        meta_data = record["meta_data"]
+        if meta_data.get("browser") == source and meta_data.get("profile") == profile:
+            # Newest wins
+            stored[record["original_post_id"]] = record
+    
+    for domain, record in stored.items():
+        stats.add_stored(domain, record["meta_data"])
+    
+    new_items, updates = [], []
+    for item in stats.memory_items(source, max_domains, {"profile": profile}):
+        record = stored.get(item["original_post_id"])
+        if record is None:
+            new_items.append(item)
+        else:
+            updates.append({**item, "memory_id": record["memory_id"], "vector_id": record["vector_id"]})
+    
+    saved = {
+        "memories_saved": 0,
+        "memories_updated": 0,
+        "memories_failed": 0,
+        "duplicates_skipped": 0,
+        "domains_skipped": max(0, len(stats.domains) - max_domains)
+    }
+    errors = []
+    if new_items:
+        bulk_result = await async_memory_service.create_memories_bulk(user_id=user_id, items=new_items)
+        saved["memories_saved"] = bulk_result["created"]
+        saved["memories_failed"] += bulk_result["failed"]
+        saved["duplicates_skipped"] = bulk_result["deduplicated"]
+        errors.extend(r["error"] for r in bulk_result["results"] if r.get("error"))
+    if updates:
+        update_result = await async_memory_service.update_memories_bulk(user_id=user_id, items=updates)
+        saved["memories_updated"] = update_result["updated"]
+        saved["memories_failed"] += update_result["failed"]
+        errors.extend(r["error"] for r in update_result["results"] if r.get("error"))
+    saved["errors"] = errors if errors else None
+    return saved
+
+
+def _detach_upload(file: UploadFile, chunk_size: Optional[int] = None):
+    """Take over the upload's spooled file so it outlives the request handler
+    
+    FastAPI closes form files when the endpoint returns, before a streaming
+    body is sent; the caller's generator owns (and closes) the returned file.
+    Yields lines, or fixed-size chunks when chunk_size is given.
+    """
+    handle, file.file = file.file, io.BytesIO()
+    
+    def read():
+        with handle:
+            handle.seek(0)
+            if chunk_size:
+                yield from iter(lambda: handle.read(chunk_size), b"")
+            else:
+                yield from handle
+    
+    return read()
+
+
+def _ndjson(events):
+    for event in events:
+        yield json.dumps(event) + "\n"
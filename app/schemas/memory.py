@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
@@ -36,3 +36,20 @@ class MemoryQueryResult(BaseModel):
     memories: List[MemoryResponse]
     total: int
     query: str
+
+
+class MemoryBulkItem(BaseModel):
+    content: str
+    source: str
+    category: Optional[str] = None
+    meta_data: Optional[Dict[str, Any]] = None
+    original_post_id: Optional[str] = None
+    original_url: Optional[str] = None
+    source_timestamp: Optional[datetime] = None
+
+
+class MemoryBulkCreate(BaseModel):
+    user_id: int = 1
+    generate_embedding: bool = True
+    async_embedding: Optional[bool] = None
+    items: List[MemoryBulkItem] = Field(..., min_length=1, max_length=1000)
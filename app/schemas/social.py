@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+
+
+class SocialAccountConnect(BaseModel):
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
+    platform_user_id: Optional[str] = None  # Looked up from the token when omitted (Notion: workspace_id)
+    platform_username: Optional[str] = None
+    profile_data: Optional[Dict[str, Any]] = None
@@ -0,0 +1,476 @@
+import asyncio
+from qdrant_client.models import PointStruct
+from sqlalchemy import select
+from typing import List, Dict, Optional, Tuple
+from uuid import uuid4
+from app.services.embedding_service import async_embedding_service
+from app.services.embedding_worker import embedding_worker
+from app.services.search_cache import search_cache
+from app.services.dedup_service import dedup_service
+from app.services.vector_store import create_async_vector_client
+from app.services.memory_service import MemoryServiceBase
+from app.database import AsyncSessionLocal
+from app.models.memory import Memory
+from datetime import datetime
+
+
+class AsyncMemoryService(MemoryServiceBase):
+    """Async MemoryService for request handlers (AsyncQdrantClient + AsyncSession)
+    
+    Mirrors MemoryService method for method; every network call is awaited so
+    one slow embedding or Qdrant call does not stall other requests.
+    """
+    
+    def __init__(self):
+        # Collection bootstrap is done once by the sync MemoryService
+        self.qdrant_client = create_async_vector_client()
+    
+    async def close(self):
+        """Release Qdrant and provider connections (on app shutdown)"""
+        await self.qdrant_client.close()
+        await async_embedding_service.close()
+    
+    async def create_memory(
+        self,
+        user_id: int,
+        content: str,
+        source: str,
+        category: Optional[str] = None,
+        meta_data: Optional[Dict] = None,
+        original_post_id: Optional[str] = None,
+        original_url: Optional[str] = None,
+        source_timestamp: Optional[datetime] = None,
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
+    ) -> Dict:
+        """Create a new memory (embeddings optional; near-duplicates are not stored)"""
+        signature = dedup_service.simhash(content)
+        duplicates = await self._find_duplicates(user_id, {0: signature})
+        if duplicates:
+            return self._duplicate_response(duplicates[0][1], content)
+        
+        source_timestamp = source_timestamp or datetime.utcnow()
+        vector_id = None
+        embedding_status = "skipped"
+        
+        if generate_embedding and self._embedding_enabled():
+            embedding_status = "pending"
+        
+        if embedding_status == "pending" and not self._is_async_mode(embedding_mode):
+            try:
+                embedding = await async_embedding_service.generate_embedding(content)
+                vector_id = str(uuid4())
+                
+                await self.qdrant_client.upsert(
+                    collection_name=self.collection_name,
+                    points=[
+                        PointStruct(
+                            id=vector_id,
+                            vector=embedding,
+                            payload=self._build_payload(
+                                user_id, content, source, category, original_post_id, original_url, source_timestamp
+                            )
+                        )
+                    ]
+                )
+                embedding_status = "ready"
+            except Exception as e:
+                vector_id = None
+                embedding_status = "failed"
+                print(f"Embedding generation skipped: {str(e)}")
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                memory = Memory(
+                    user_id=user_id,
+                    content=content,
+                    source=source,
+                    category=category or "general",
+                    meta_data=meta_data or {},
+                    original_post_id=original_post_id,
+                    original_url=original_url,
+                    vector_id=vector_id,
+                    embedding_status=embedding_status,
+                    content_simhash=signature,
+                    source_timestamp=source_timestamp
+                )
+                
+                db.add(memory)
+                await db.commit()
+                await db.refresh(memory)
+            except Exception as e:
+                await db.rollback()
+                return {"success": False, "error": str(e)}
+        
+        await search_cache.ainvalidate([user_id])
+        if embedding_status == "pending":
+            embedding_worker.notify()
+        
+        return {
+            "success": True,
+            "memory_id": memory.id,
+            "vector_id": vector_id,
+            "embedding_generated": vector_id is not None,
+            "embedding_status": embedding_status,
+            "content_preview": self._preview(content)
+        }
+    
+    async def create_memories_bulk(
+        self,
+        user_id: int,
+        items: List[Dict],
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
+    ) -> Dict:
+        """Create many memories with batched embeddings, few Qdrant upserts and one INSERT"""
+        results, valid = self._validate_items(items)
+        
+        signatures = self._signatures(items, valid)
+        duplicates = await self._find_duplicates(user_id, signatures)
+        valid = [i for i in valid if i not in duplicates]
+        
+        embed = generate_embedding and bool(valid) and self._embedding_enabled()
+        queue_embeddings = embed and self._is_async_mode(embedding_mode)
+        
+        vector_ids = {}
+        if embed and not queue_embeddings:
+            points = []
+            for indexes in self._embedding_slices(valid):
+                try:
+                    embeddings = await async_embedding_service.generate_embeddings_batch(
+                        [items[i]["content"] for i in indexes]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, indexes, e)
+                    continue
+                points.extend(self._make_points(user_id, items, indexes, embeddings))
+            
+            for chunk in self._upsert_chunks(points):
+                try:
+                    await self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=[point for _, point in chunk]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, [i for i, _ in chunk], e)
+                    continue
+                vector_ids.update((i, point.id) for i, point in chunk)
+        
+        if not valid:
+            return self._bulk_summary(results, items, duplicates)
+        
+        statuses = self._item_statuses(valid, vector_ids, embed, queue_embeddings)
+        rows = self._memory_rows(user_id, items, valid, vector_ids, statuses, signatures)
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                memory_ids = (await db.execute(self._bulk_insert_statement(), rows)).scalars().all()
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                await self._delete_vectors(list(vector_ids.values()))
+                for i in valid:
+                    results[i]["error"] = str(e)
+                return self._bulk_summary(results, items, duplicates)
+        
+        await search_cache.ainvalidate([user_id])
+        if queue_embeddings:
+            embedding_worker.notify()
+        
+        self._fill_bulk_results(results, items, valid, memory_ids, vector_ids, statuses)
+        return self._bulk_summary(results, items, duplicates)
+    
+    async def list_source_records(self, user_id: int, source: str) -> List[Dict]:
+        """memory_id, original_post_id, vector_id and meta_data of a source's memories (oldest first)"""
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self._source_records_statement(user_id, source))).all()
+            return [self._serialize_source_record(row) for row in rows]
+    
+    async def update_memories_bulk(
+        self,
+        user_id: int,
+        items: List[Dict],
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
+    ) -> Dict:
+        """Rewrite existing memories in place with one bulk UPDATE"""
+        results, valid = self._validate_updates(items)
+        
+        signatures = self._signatures(items, valid)
+        reembed = [i for i in valid if items[i].get("reembed", True)]
+        kept = [i for i in valid if i not in reembed and items[i].get("vector_id")]
+        
+        embed = generate_embedding and bool(reembed) and self._embedding_enabled()
+        queue_embeddings = embed and self._is_async_mode(embedding_mode)
+        
+        vector_ids = {}
+        if embed and not queue_embeddings:
+            point_ids = {i: items[i].get("vector_id") for i in reembed}
+            points = []
+            for indexes in self._embedding_slices(reembed):
+                try:
+                    embeddings = await async_embedding_service.generate_embeddings_batch(
+                        [items[i]["content"] for i in indexes]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, indexes, e)
+                    continue
+                points.extend(self._make_points(user_id, items, indexes, embeddings, point_ids))
+            
+            for chunk in self._upsert_chunks(points):
+                try:
+                    await self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=[point for _, point in chunk]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, [i for i, _ in chunk], e)
+                    continue
+                vector_ids.update((i, point.id) for i, point in chunk)
+        
+        if kept:
+            try:
+                await self.qdrant_client.batch_update_points(
+                    collection_name=self.collection_name,
+                    update_operations=self._payload_operations(user_id, items, kept)
+                )
+            except Exception as e:
+                self._mark_payload_error(results, kept, e)
+        
+        if not valid:
+            return self._update_summary(results)
+        
+        statuses = self._item_statuses(reembed, vector_ids, embed, queue_embeddings)
+        rows = self._update_rows(items, valid, vector_ids, statuses, signatures)
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(self._bulk_update_statement(user_id), rows)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                for i in valid:
+                    results[i]["error"] = str(e)
+                return self._update_summary(results)
+        
+        await self._delete_vectors(self._stale_vectors(items, statuses))
+        await search_cache.ainvalidate([user_id])
+        if queue_embeddings:
+            embedding_worker.notify()
+        
+        self._fill_update_results(results, items, valid, rows, vector_ids)
+        return self._update_summary(results)
+    
+    async def _find_duplicates(self, user_id: int, signatures: Dict[int, int]) -> Dict[int, Tuple[str, int]]:
+        """Near-duplicates among the signatures, of stored memories or of each other"""
+        if not dedup_service.enabled or not signatures:
+            return {}
+        
+        existing = []
+        async with AsyncSessionLocal() as db:
+            try:
+                existing = (await db.execute(self._duplicate_candidates_statement(user_id, signatures))).all()
+            except Exception as e:
+                print(f"Duplicate lookup skipped: {str(e)}")
+        
+        return dedup_service.find_duplicates(signatures, existing)
+    
+    async def get_embedding_status(self, memory_id: int, user_id: Optional[int] = None) -> Dict:
+        """Embedding status of a memory (for clients that need read-your-writes)"""
+        try:
+            query = select(Memory.embedding_status, Memory.vector_id).where(Memory.id == memory_id)
+            
+            if user_id:
+                query = query.where(Memory.user_id == user_id)
+            
+            async with AsyncSessionLocal() as db:
+                row = (await db.execute(query)).first()
+            
+            if not row:
+                return {"success": False, "error": "Memory not found"}
+            
+            return {
+                "success": True,
+                "memory_id": memory_id,
+                "embedding_status": row.embedding_status,
+                "vector_id": row.vector_id
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def search_memories(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        limit: int = 10,
+        source_filter: Optional[str] = None,
+        mode: str = "vector"
+    ) -> Dict:
+        """Search memories: "vector" (semantic), "lexical" (full-text) or "hybrid" (both, fused)"""
+        cached, cache_key = await search_cache.aget(user_id, query, limit, source_filter, mode)
+        if cached is not None:
+            return cached
+        
+        try:
+            if mode == "lexical":
+                memories = await self._lexical_search(query, user_id, limit, source_filter)
+            elif mode == "hybrid":
+                candidates = limit * self.HYBRID_OVERFETCH
+                vector_hits, lexical_hits = await asyncio.gather(
+                    self._vector_search(query, user_id, candidates, source_filter),
+                    self._lexical_search(query, user_id, candidates, source_filter),
+                    return_exceptions=True
+                )
+                # One failed retriever (e.g. embedding provider down) degrades to the other
+                if isinstance(vector_hits, Exception) and isinstance(lexical_hits, Exception):
+                    raise vector_hits
+                if isinstance(vector_hits, Exception):
+                    print(f"Hybrid search without vectors: {str(vector_hits)}")
+                    vector_hits = []
+                if isinstance(lexical_hits, Exception):
+                    print(f"Hybrid search without full-text: {str(lexical_hits)}")
+                    lexical_hits = []
+                memories = self._fuse_results([("vector", vector_hits), ("lexical", lexical_hits)], limit)
+            else:
+                memories = await self._vector_search(query, user_id, limit, source_filter)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        response = self._search_response(query, mode, memories)
+        await search_cache.aset(cache_key, response)
+        return response
+    
+    async def _vector_search(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        source_filter: Optional[str]
+    ) -> List[Dict]:
+        query_embedding = await async_embedding_service.generate_embedding(query, input_type="search_query")
+        
+        search_results = await self.qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embedding,
+            query_filter=self._search_filter(user_id, source_filter),
+            limit=limit
+        )
+        
+        return [self._format_hit(result) for result in search_results]
+    
+    async def _lexical_search(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        source_filter: Optional[str]
+    ) -> List[Dict]:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(self._lexical_statement(query, user_id, limit, source_filter))).all()
+        return [self._format_lexical_hit(memory, rank) for memory, rank in rows]
+    
+    async def get_memory_by_id(self, memory_id: int, user_id: Optional[int] = None) -> Dict:
+        """Get a specific memory by ID"""
+        try:
+            query = select(Memory).where(Memory.id == memory_id)
+            
+            if user_id:
+                query = query.where(Memory.user_id == user_id)
+            
+            async with AsyncSessionLocal() as db:
+                memory = (await db.execute(query)).scalars().first()
+            
+            if not memory:
+                return {"success": False, "error": "Memory not found"}
+            
+            return {"success": True, "memory": self._serialize_memory(memory)}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def list_memories(
+        self,
+        user_id: int,
+        source: Optional[str] = None,
+        limit: int = 50,
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        total_mode: str = "counter"
+    ) -> Dict:
+        """List memories for a user, newest first (see MemoryService.list_memories)"""
+        try:
+            async with AsyncSessionLocal() as db:
+                memories = (await db.execute(
+                    self._list_statement(user_id, source, limit, offset, cursor)
+                )).scalars().all()
+                
+                total = None
+                if total_mode != "none":
+                    total = (await db.execute(
+                        self._total_statement(user_id, source, total_mode)
+                    )).scalar_one()
+            
+            return self._list_page(memories, limit, total)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    async def delete_memory(self, memory_id: int, user_id: int) -> Dict:
+        """Delete a memory"""
+        async with AsyncSessionLocal() as db:
+            try:
+                memory = (await db.execute(
+                    select(Memory).where(Memory.id == memory_id, Memory.user_id == user_id)
+                )).scalars().first()
+                
+                if not memory:
+                    return {"success": False, "error": "Memory not found"}
+                
+                # Delete from Qdrant
+                if memory.vector_id:
+                    await self.qdrant_client.delete(
+                        collection_name=self.collection_name,
+                        points_selector=[memory.vector_id]
+                    )
+                
+                # Delete from PostgreSQL
+                await db.delete(memory)
+                await db.commit()
+                await search_cache.ainvalidate([user_id])
+                
+                return {"success": True, "message": "Memory deleted"}
+            except Exception as e:
+                await db.rollback()
+                return {"success": False, "error": str(e)}
+    
+    async def delete_memories(self, user_id: int, memory_ids: List[int]) -> Dict:
+        """Delete many of a user's memories and their vectors"""
+        if not memory_ids:
+            return {"success": True, "deleted": 0}
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                vector_ids = (await db.execute(self._delete_memories_statement(user_id, memory_ids))).scalars().all()
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                return {"success": False, "error": str(e)}
+        
+        await self._delete_vectors([vector_id for vector_id in vector_ids if vector_id])
+        await search_cache.ainvalidate([user_id])
+        
+        return {"success": True, "deleted": len(vector_ids)}
+    
+    async def _delete_vectors(self, vector_ids: List[str]):
+        """Best-effort removal of points no committed row refers to"""
+        if not vector_ids:
+            return
+        try:
+            await self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=vector_ids
+            )
+        except Exception as e:
+            print(f"Qdrant cleanup failed: {str(e)}")
+
+
+# Singleton instance
+async_memory_service = AsyncMemoryService()
@@ -1,152 +1,214 @@
-import json
+import codecs
 import csv
-from typing import Dict, List
-from datetime import datetime
-from io import StringIO
+import heapq
+import json
+import re
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+HistoryInput = Union[str, bytes, Iterable[Union[str, bytes]]]
 
 
 class BrowserHistoryService:
-    """Service for parsing browser history exports"""
+    """Service for parsing browser history exports
+    
+    Exports are parsed incrementally: JSON one array element at a time, CSV
+    one row at a time, from a string, a binary file or an iterator of chunks.
+    """
+    
+    # Bytes read from a file per step
+    READ_SIZE = 64 * 1024
+    
+    # Keys of the entry array in object-shaped exports (Google Takeout)
+    HISTORY_KEYS = ("Browser History",)
+    
+    # History databases: browser -> (table that identifies it, epoch of its
+    # microsecond timestamps, delta query). Both queries walk the visits table
+    # through its visit-time index, so only visits after the mark are read.
+    # new_visits counts those visits; visit_count is the URL's all-time total.
+    DATABASES = {
+        "chrome": ("urls", datetime(1601, 1, 1), """
+            SELECT u.url, u.title, u.visit_count, u.typed_count, MAX(v.visit_time) AS visited, COUNT(*) AS new_visits
+            FROM visits v JOIN urls u ON u.id = v.url
+            WHERE v.visit_time > ?
+            GROUP BY u.id
+            ORDER BY visited
+        """),
+        "firefox": ("moz_places", datetime(1970, 1, 1), """
+            SELECT p.url, p.title, p.visit_count, p.typed, MAX(v.visit_date) AS visited, COUNT(*) AS new_visits
+            FROM moz_historyvisits v JOIN moz_places p ON p.id = v.place_id
+            WHERE v.visit_date > ?
+            GROUP BY p.id
+            ORDER BY visited
+        """)
+    }
+    
+    # Upper bound on memory-mapped reads of a history database
+    MMAP_SIZE = 256 * 1024 * 1024
     
     def __init__(self):
-        pass
+        # browser_type -> (source label, export format, entry normalizer)
+        self.browsers: Dict[str, Tuple[str, str, Callable[[Dict], Dict]]] = {
+            "chrome": ("Chrome", "json", self._chrome_entry),
+            "firefox": ("Firefox", "json", self._firefox_entry),
+            "safari": ("Safari", "csv", self._safari_entry)
+        }
     
-    def parse_chrome_history(self, file_content: str) -> Dict:
+    def parse_chrome_history(self, file_content: HistoryInput) -> Dict:
         """Parse Chrome history export (JSON format)"""
-        try:
-            data = json.loads(file_content)
-            
-            if isinstance(data, dict) and "Browser History" in data:
-                history = data["Browser History"]
-            elif isinstance(data, list):
-                history = data
-            else:
-                history = [data]
-            
-            parsed_entries = []
-            for entry in history:
-                parsed_entries.append({
-                    "url": entry.get("url", ""),
-                    "title": entry.get("title", ""),
-                    "visit_count": entry.get("visit_count", 1),
-                    "last_visit_time": entry.get("last_visit_time", ""),
-                    "typed_count": entry.get("typed_count", 0)
-                })
-            
-            return {
-                "success": True,
-                "count": len(parsed_entries),
-                "data": parsed_entries,
-                "source": "Chrome"
-            }
-        except Exception as e:
-            return {"success": False, "error": f"Chrome history parsing failed: {str(e)}"}
+        return self.parse_history(file_content, "chrome")
     
-    def parse_firefox_history(self, file_content: str) -> Dict:
+    def parse_firefox_history(self, file_content: HistoryInput) -> Dict:
         """Parse Firefox history export (JSON format)"""
-        try:
-            data = json.loads(file_content)
-            
-            parsed_entries = []
-            for entry in data:
-                parsed_entries.append({
-                    "url": entry.get("url", ""),
-                    "title": entry.get("title", ""),
-                    "visit_count": entry.get("visitCount", 1),
-                    "last_visit_time": entry.get("lastVisitTime", ""),
-                    "typed_count": 0
-                })
-            
-            return {
-                "success": True,
-                "count": len(parsed_entries),
-                "data": parsed_entries,
-                "source": "Firefox"
-            }
-        except Exception as e:
-            return {"success": False, "error": f"Firefox history parsing failed: {str(e)}"}
+        return self.parse_history(file_content, "firefox")
     
-    def parse_safari_history(self, file_content: str) -> Dict:
+    def parse_safari_history(self, file_content: HistoryInput) -> Dict:
         """Parse Safari history export (CSV format)"""
+        return self.parse_history(file_content, "safari")
+    
+    def parse_generic_history(self, file_content: HistoryInput, format_type: str = "json") -> Dict:
+        """Parse browser history in generic format"""
+        return self.parse_history(file_content, "generic", format_type)
+    
+    def parse_history(
+        self,
+        file_content: HistoryInput,
+        browser_type: str,
+        format_type: str = "json",
+        include_entries: bool = True,
+        stats: Optional["DomainStats"] = None
+    ) -> Dict:
+        """Parse an export into one response dict
+        
+        With include_entries=False only the running totals are kept, so memory
+        does not grow with the number of entries. Pass stats to keep the domain
+        aggregate (e.g. for ingestion) after the call.
+        """
+        events = self.iter_history_events(file_content, browser_type, format_type, stats)
+        return self._collect(events, include_entries)
+    
+    def parse_history_database(
+        self,
+        database: Union[str, BinaryIO],
+        browser_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        include_entries: bool = True,
+        stats: Optional["DomainStats"] = None
+    ) -> Dict:
+        """Read a Chrome History or Firefox places.sqlite file into one response dict
+        
+        Only URLs visited after the cursor (a previous response's "cursor") are
+        returned; store the new cursor to make the next import a delta.
+        """
+        events = self.iter_database_events(database, browser_type, cursor, stats)
+        return self._collect(events, include_entries)
+    
+    def iter_history_events(
+        self,
+        file_content: HistoryInput,
+        browser_type: str,
+        format_type: str = "json",
+        stats: Optional["DomainStats"] = None
+    ) -> Iterator[Dict]:
+        """Yield {"type": "entry", ...} per history entry, then one "summary" event
+        
+        Domain totals are accumulated as entries go by. A parsing failure ends
+        the stream with an {"type": "error"} event instead of the summary.
+        """
+        stats = stats if stats is not None else DomainStats()
+        
+        if browser_type in self.browsers:
+            source, format_type, normalize = self.browsers[browser_type]
+        elif format_type in ("json", "csv"):
+            source, normalize = f"Generic {format_type.upper()}", self._generic_entry
+        else:
+            yield {"type": "error", "error": f"Unsupported format: {format_type}"}
+            return
+        
         try:
-            csv_file = StringIO(file_content)
-            reader = csv.DictReader(csv_file)
-            
-            parsed_entries = []
-            for row in reader:
-                parsed_entries.append({
-                    "url": row.get("URL", ""),
-                    "title": row.get("Title", ""),
-                    "visit_count": int(row.get("Visit Count", 1)),
-                    "last_visit_time": row.get("Last Visit", ""),
-                    "typed_count": 0
-                })
+            chunks = self._text_chunks(file_content)
+            if format_type == "csv":
+                records = csv.DictReader(self._lines(chunks))
+            else:
+                records = self._iter_json_records(chunks)
             
-            return {
-                "success": True,
-                "count": len(parsed_entries),
-                "data": parsed_entries,
-                "source": "Safari"
-            }
+            for record in records:
+                entry = normalize(record)
+                stats.add(entry)
+                yield {"type": "entry", **entry}
         except Exception as e:
-            return {"success": False, "error": f"Safari history parsing failed: {str(e)}"}
+            yield {"type": "error", "error": f"{source} history parsing failed: {str(e)}"}
+            return
+        
+        yield {
+            "type": "summary",
+            "source": source,
+            "count": stats.entries,
+            "domain_count": len(stats.domains),
+            "top_domains": stats.top_domains()
+        }
     
-    def parse_generic_history(self, file_content: str, format_type: str = "json") -> Dict:
-        """Parse browser history in generic format"""
+    def iter_database_events(
+        self,
+        database: Union[str, BinaryIO],
+        browser_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        stats: Optional["DomainStats"] = None
+    ) -> Iterator[Dict]:
+        """Yield {"type": "entry", ...} per URL visited after the cursor, then a "summary"
+        
+        database is a path or a binary file (copied to a temporary file, since
+        SQLite needs one). It is opened read-only and immutable, with mmap
+        reads. The browser is detected from the schema unless given. A cursor
+        is "<browser>:<last visit timestamp>"; one from another browser is
+        ignored. The summary carries the cursor to resume from next time.
+        Domain totals count the visits after the cursor (new_visits), so the
+        totals of successive imports add up.
+        """
+        stats = stats if stats is not None else DomainStats()
+        
         try:
-            if format_type == "json":
-                data = json.loads(file_content)
+            with self._open_database(database) as connection:
+                browser = browser_type or self._detect_browser(connection)
+                if browser not in self.DATABASES:
+                    yield {"type": "error", "error": "Not a Chrome or Firefox history database"}
+                    return
                 
-                if isinstance(data, list):
-                    parsed_entries = []
-                    for entry in data:
-                        # Handle different possible field names
-                        url = entry.get("url") or entry.get("URL") or entry.get("uri")
-                        title = entry.get("title") or entry.get("Title") or entry.get("name")
-                        
-                        parsed_entries.append({
-                            "url": url or "",
-                            "title": title or "",
-                            "visit_count": entry.get("visit_count", entry.get("visitCount", 1)),
-                            "last_visit_time": entry.get("last_visit_time", entry.get("lastVisitTime", entry.get("timestamp", ""))),
-                            "typed_count": entry.get("typed_count", 0)
-                        })
-                    
-                    return {
-                        "success": True,
-                        "count": len(parsed_entries),
-                        "data": parsed_entries,
-                        "source": "Generic JSON"
-                    }
-            
-            elif format_type == "csv":
-                csv_file = StringIO(file_content)
-                reader = csv.DictReader(csv_file)
+                _, epoch, query = self.DATABASES[browser]
+                since = self._cursor_position(cursor, browser)
+                high_water_mark = since
                 
-                parsed_entries = []
-                for row in reader:
-                    # Handle different possible column names
-                    url = row.get("url") or row.get("URL") or row.get("uri")
-                    title = row.get("title") or row.get("Title") or row.get("name")
-                    
-                    parsed_entries.append({
+                for url, title, visit_count, typed_count, visited, new_visits in connection.execute(query, (since,)):
+                    entry = {
                         "url": url or "",
                         "title": title or "",
-                        "visit_count": int(row.get("visit_count", row.get("visitCount", 1))),
-                        "last_visit_time": row.get("last_visit_time", row.get("lastVisitTime", row.get("timestamp", ""))),
-                        "typed_count": int(row.get("typed_count", 0))
-                    })
-                
-                return {
-                    "success": True,
-                    "count": len(parsed_entries),
-                    "data": parsed_entries,
-                    "source": "Generic CSV"
-                }
-            
-            return {"success": False, "error": f"Unsupported format: {format_type}"}
+                        "visit_count": visit_count or 1,
+                        "new_visits": new_visits,
+                        "last_visit_time": (epoch + timedelta(microseconds=visited)).isoformat() + "Z",
+                        "typed_count": typed_count or 0
+                    }
+                    stats.add(entry)
+                    high_water_mark = visited
+                    yield {"type": "entry", **entry}
         except Exception as e:
-            return {"success": False, "error": f"Generic history parsing failed: {str(e)}"}
+            yield {"type": "error", "error": f"History database import failed: {str(e)}"}
+            return
+        
+        yield {
+            "type": "summary",
+            "source": self.browsers[browser][0],
+            "count": stats.entries,
+            "domain_count": len(stats.domains),
+            "top_domains": stats.top_domains(),
+            "incremental": since > 0,
+            "cursor": f"{browser}:{high_water_mark}"
+        }
     
     def filter_history_by_date(self, entries: List[Dict], start_date: str = None, end_date: str = None) -> List[Dict]:
         """Filter history entries by date range"""
@@ -161,29 +223,384 @@ class BrowserHistoryService:
         
         return filtered
     
-    def group_by_domain(self, entries: List[Dict]) -> Dict:
-        """Group history entries by domain"""
-        from urllib.parse import urlparse
-        
-        domains = {}
+    def group_by_domain(self, entries: Iterable[Dict]) -> Dict:
+        """Count history entries per domain (entries may be any iterable, e.g. a parser)"""
+        stats = DomainStats()
         for entry in entries:
-            try:
-                parsed_url = urlparse(entry["url"])
-                domain = parsed_url.netloc or parsed_url.path
-                
-                if domain not in domains:
-                    domains[domain] = []
-                
-                domains[domain].append(entry)
-            except:
-                continue
+            stats.add(entry)
         
         return {
             "success": True,
-            "domain_count": len(domains),
-            "domains": {domain: len(entries) for domain, entries in domains.items()},
-            "grouped_data": domains
+            "domain_count": len(stats.domains),
+            "domains": {domain: totals["entries"] for domain, totals in stats.domains.items()}
+        }
+    
+    def _collect(self, events: Iterator[Dict], include_entries: bool) -> Dict:
+        """Turn an event stream into a response dict (entries kept only if asked)"""
+        entries = []
+        summary = None
+        
+        for event in events:
+            if event["type"] == "entry":
+                if include_entries:
+                    event.pop("type")
+                    entries.append(event)
+            else:
+                summary = event
+        
+        if summary["type"] == "error":
+            return {"success": False, "error": summary["error"]}
+        
+        summary.pop("type")
+        result = {"success": True, **summary}
+        if include_entries:
+            result["data"] = entries
+        
+        return result
+    
+    # History databases
+    
+    @contextmanager
+    def _open_database(self, database: Union[str, BinaryIO]) -> Iterator[sqlite3.Connection]:
+        copy = None
+        if isinstance(database, str):
+            path = database
+        else:
+            copy = tempfile.NamedTemporaryFile(suffix=".sqlite")
+            database.seek(0)
+            shutil.copyfileobj(database, copy, self.READ_SIZE)
+            copy.flush()
+            path = copy.name
+        
+        # immutable: no locks, no journal/WAL lookups (the file is a snapshot)
+        uri = Path(path).resolve().as_uri() + "?mode=ro&immutable=1"
+        connection = sqlite3.connect(uri, uri=True)
+        try:
+            connection.execute(f"PRAGMA mmap_size = {self.MMAP_SIZE}")
+            yield connection
+        finally:
+            connection.close()
+            if copy:
+                copy.close()
+    
+    def _detect_browser(self, connection: sqlite3.Connection) -> Optional[str]:
+        tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for browser, (marker_table, _, _) in self.DATABASES.items():
+            if marker_table in tables:
+                return browser
+        return None
+    
+    @staticmethod
+    def _cursor_position(cursor: Optional[str], browser: str) -> int:
+        """Last visit timestamp stored in a cursor (0: read everything)"""
+        cursor_browser, _, position = (cursor or "").partition(":")
+        if cursor_browser != browser or not position.isdigit():
+            return 0
+        return int(position)
+    
+    # Entry normalizers (one per export flavour)
+    
+    def _chrome_entry(self, entry: Dict) -> Dict:
+        return {
+            "url": entry.get("url", ""),
+            "title": entry.get("title", ""),
+            "visit_count": entry.get("visit_count", 1),
+            "last_visit_time": entry.get("last_visit_time", ""),
+            "typed_count": entry.get("typed_count", 0)
+        }
+    
+    def _firefox_entry(self, entry: Dict) -> Dict:
+        return {
+            "url": entry.get("url", ""),
+            "title": entry.get("title", ""),
+            "visit_count": entry.get("visitCount", 1),
+            "last_visit_time": entry.get("lastVisitTime", ""),
+            "typed_count": 0
+        }
+    
+    def _safari_entry(self, row: Dict) -> Dict:
+        return {
+            "url": row.get("URL", ""),
+            "title": row.get("Title", ""),
+            "visit_count": int(row.get("Visit Count", 1)),
+            "last_visit_time": row.get("Last Visit", ""),
+            "typed_count": 0
+        }
+    
+    def _generic_entry(self, entry: Dict) -> Dict:
+        # Handle different possible field names
+        url = entry.get("url") or entry.get("URL") or entry.get("uri")
+        title = entry.get("title") or entry.get("Title") or entry.get("name")
+        
+        return {
+            "url": url or "",
+            "title": title or "",
+            "visit_count": int(entry.get("visit_count", entry.get("visitCount", 1))),
+            "last_visit_time": entry.get("last_visit_time", entry.get("lastVisitTime", entry.get("timestamp", ""))),
+            "typed_count": int(entry.get("typed_count", 0))
         }
+    
+    # Incremental input handling
+    
+    def _text_chunks(self, file_content: HistoryInput) -> Iterator[str]:
+        """Decoded text of a string, bytes, binary file or iterator of chunks"""
+        if isinstance(file_content, str):
+            yield file_content
+            return
+        
+        if isinstance(file_content, bytes):
+            chunks = [file_content]
+        elif hasattr(file_content, "read"):
+            handle = file_content
+            chunks = iter(lambda: handle.read(self.READ_SIZE), b"")
+        else:
+            chunks = file_content
+        
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        for chunk in chunks:
+            yield chunk if isinstance(chunk, str) else decoder.decode(chunk)
+        yield decoder.decode(b"", final=True)
+    
+    def _lines(self, chunks: Iterable[str]) -> Iterator[str]:
+        """Re-split text chunks into lines for the csv module"""
+        buffer = ""
+        for chunk in chunks:
+            buffer += chunk
+            *lines, buffer = buffer.split("\n")
+            for line in lines:
+                yield line + "\n"
+        
+        if buffer:
+            yield buffer
+    
+    def _iter_json_records(self, chunks: Iterable[str]) -> Iterator:
+        """Records of a JSON export, decoded one at a time
+        
+        A top-level array yields its elements; a top-level object yields the
+        elements of its HISTORY_KEYS array, or itself if it has none.
+        """
+        stream = JsonStream(chunks)
+        
+        if stream.peek() != "{":
+            yield from stream.iter_array()
+            stream.expect_end()
+            return
+        
+        stream.expect("{")
+        fields = {}
+        found = False
+        
+        while stream.peek() != "}":
+            key = stream.value()
+            stream.expect(":")
+            if key in self.HISTORY_KEYS and stream.peek() == "[":
+                yield from stream.iter_array()
+                found = True
+            else:
+                fields[key] = stream.value()
+            
+            if stream.peek() != ",":
+                break
+            stream.expect(",")
+        
+        stream.expect("}")
+        stream.expect_end()
+        if not found:
+            yield fields
+
+
+class JsonStream:
+    """Pull parser over chunks of JSON text
+    
+    Containers are walked by hand and each element is decoded with
+    JSONDecoder.raw_decode, so only the current element (plus one read
+    chunk) is ever held in memory.
+    """
+    
+    WHITESPACE = re.compile(r"\s*")
+    
+    # An element this large without decoding is treated as malformed input
+    MAX_VALUE_CHARS = 16 * 1024 * 1024
+    
+    def __init__(self, chunks: Iterable[str]):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+    
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at the end of input)"""
+        while True:
+            self._pos = self.WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"expected {char!r} but found {found or 'end of input'!r}")
+        self._pos += 1
+    
+    def expect_end(self):
+        found = self.peek()
+        if found:
+            raise ValueError(f"unexpected {found!r} after the end of the document")
+    
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof or len(self._buffer) - self._pos > self.MAX_VALUE_CHARS:
+                    raise
+            self._fill()
+    
+    def iter_array(self) -> Iterator:
+        """Elements of the array starting at the current position"""
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        
+        while True:
+            yield self.value()
+            if self.peek() != ",":
+                break
+            self._pos += 1
+        
+        self.expect("]")
+    
+    def _fill(self) -> bool:
+        """Append the next chunk, dropping what has been consumed"""
+        chunk = next(self._chunks, None) if not self._eof else None
+        if chunk is None:
+            self._eof = True
+            return False
+        
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+
+class DomainStats:
+    """Per-domain totals accumulated one history entry at a time
+    
+    Only counters and a few top pages per domain are kept, never the entries.
+    """
+    
+    TOP_PAGES = 5
+    
+    def __init__(self):
+        self.entries = 0
+        self.domains: Dict[str, Dict] = {}
+    
+    def add(self, entry: Dict):
+        self.entries += 1
+        try:
+            parsed_url = urlparse(entry["url"])
+        except Exception:
+            return
+        domain = parsed_url.netloc or parsed_url.path
+        
+        totals = self.domains.get(domain)
+        if totals is None:
+            totals = self.domains[domain] = {"entries": 0, "visits": 0, "top_pages": []}
+        
+        visits = self._visits(entry)
+        totals["entries"] += 1
+        totals["visits"] += visits
+        
+        # Min-heap of (visits, url, title) holding the most visited pages;
+        # exports with one entry per visit repeat URLs, so keep each URL once
+        top_pages = totals["top_pages"]
+        page = (visits, entry["url"], entry.get("title") or "")
+        for position, (seen_visits, url, _) in enumerate(top_pages):
+            if url == page[1]:
+                if visits > seen_visits:
+                    top_pages[position] = page
+                    heapq.heapify(top_pages)
+                return
+        
+        if len(top_pages) < self.TOP_PAGES:
+            heapq.heappush(top_pages, page)
+        else:
+            heapq.heappushpop(top_pages, page)
+    
+    def top_domains(self, limit: int = 20) -> List[Dict]:
+        """Most visited domains with their totals"""
+        ranked = heapq.nlargest(limit, self.domains.items(), key=lambda item: item[1]["visits"])
+        return [
+            {"domain": domain, "entries": totals["entries"], "visits": totals["visits"]}
+            for domain, totals in ranked
+        ]
+    
+    def add_stored(self, domain: str, meta_data: Dict):
+        """Fold in the totals a previous import stored for a domain seen again
+        
+        Visits add up (delta imports count only new visits); pages keep their
+        summed visits and the TOP_PAGES most visited remain.
+        """
+        totals = self.domains.get(domain)
+        if totals is None:
+            return
+        totals["entries"] += meta_data.get("entries", 0)
+        totals["visits"] += meta_data.get("visits", 0)
+        
+        pages = {url: (visits, title) for visits, url, title in totals["top_pages"]}
+        for visits, url, title in meta_data.get("top_pages", []):
+            seen_visits, seen_title = pages.get(url, (0, title))
+            pages[url] = (seen_visits + visits, seen_title or title)
+        totals["top_pages"] = heapq.nlargest(
+            self.TOP_PAGES,
+            ((visits, url, title) for url, (visits, title) in pages.items())
+        )
+        heapq.heapify(totals["top_pages"])
+    
+    def memory_items(self, source: str, limit: int, meta_data: Optional[Dict] = None) -> List[Dict]:
+        """create_memories_bulk items: one memory per domain, most visited first"""
+        items = []
+        for ranked in self.top_domains(limit):
+            domain = ranked["domain"]
+            pages = sorted(self.domains[domain]["top_pages"], reverse=True)
+            lines = [f"- {title or url} ({url}) - {visits} visits" for visits, url, title in pages]
+            
+            items.append({
+                "content": (
+                    f"Browsing history ({source}): {domain}\n"
+                    f"Visited {ranked['visits']} times in {ranked['entries']} history entries\n"
+                    "Most visited pages:\n" + "\n".join(lines)
+                ),
+                "source": "browser_history",
+                "category": "browsing",
+                "meta_data": {
+                    "browser": source,
+                    "domain": domain,
+                    "entries": ranked["entries"],
+                    "visits": ranked["visits"],
+                    "top_pages": [list(page) for page in pages],
+                    **(meta_data or {})
+                },
+                "original_post_id": domain,
+                "original_url": pages[0][1] if pages else None
+            })
+        
+        return items
+    
+    @staticmethod
+    def _visits(entry: Dict) -> int:
+        try:
+            return int(entry.get("new_visits") or entry.get("visit_count") or 1)
+        except (TypeError, ValueError):
+            return 1
 
 
 # Singleton instance
@@ -0,0 +1,183 @@
+import math
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+from app.config import settings
+
+Span = Tuple[int, int]
+
+
+class ChunkingService:
+    """Structure-aware, token-budgeted text chunker
+    
+    Makes one left-to-right pass over sentence and paragraph boundaries and
+    greedily packs sentences into chunks of at most max_tokens (estimated).
+    Chunks are (start, end) offsets into the original text, so nothing is
+    copied or re-joined until a caller slices one out. A chunk prefers to end
+    at a paragraph break, then at a sentence end; a sentence over budget is
+    split at whitespace, and a single over-long "word" by characters.
+    """
+    
+    # Input limits (tokens) of the embedding models; chunks always fit in one call
+    EMBEDDING_INPUT_TOKENS = {
+        "openai": 8191,
+        "cohere": 512,
+        "local": None
+    }
+    
+    # Sentence end (. ! ? plus closing quotes/brackets) and the whitespace after it, or a blank line
+    BOUNDARY = re.compile(r'(?<=[.!?])["\'”’)\]]*\s+|\n\s*\n')
+    WORD = re.compile(r'\S+\s*')
+    
+    # Token estimate = UTF-8 bytes / 3: overestimates English (~4.5 bytes/token)
+    # and is about right for CJK, so estimated budgets are never exceeded in practice
+    BYTES_PER_TOKEN = 3
+    
+    # Close a chunk at a paragraph break once it is this full
+    PARAGRAPH_FILL = 0.6
+    
+    def __init__(self, max_tokens: int, overlap_tokens: int = 0):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+    
+    def estimate_tokens(self, text: str) -> int:
+        """Fast upper-bound style token estimate"""
+        size = len(text) if text.isascii() else len(text.encode("utf-8"))
+        return math.ceil(size / self.BYTES_PER_TOKEN)
+    
+    def chunk_spans(self, text: str) -> List[Span]:
+        """(start, end) offsets of each chunk"""
+        return list(self.iter_spans(text))
+    
+    def chunk_text(self, text: str) -> List[str]:
+        """Chunks as strings"""
+        return [text[start:end] for start, end in self.iter_spans(text)]
+    
+    def iter_spans(self, text: str) -> Iterator[Span]:
+        """Yield chunk spans in order; consecutive chunks overlap by up to overlap_tokens"""
+        units: List[Tuple[int, int, int]] = []
+        tokens = 0
+        fresh = False  # whether the pending chunk has units not yet emitted
+        
+        for start, end, unit_tokens, paragraph_end in self._iter_units(text):
+            if units and tokens + unit_tokens > self.max_tokens:
+                span = self._span(text, units)
+                if span:
+                    yield span
+                units, tokens = self._overlap(units)
+                while units and tokens + unit_tokens > self.max_tokens:
+                    tokens -= units.pop(0)[2]
+            
+            units.append((start, end, unit_tokens))
+            tokens += unit_tokens
+            fresh = True
+            
+            if paragraph_end and tokens >= self.max_tokens * self.PARAGRAPH_FILL:
+                span = self._span(text, units)
+                if span:
+                    yield span
+                units, tokens = self._overlap(units)
+                fresh = False
+        
+        if units and fresh:
+            span = self._span(text, units)
+            if span:
+                yield span
+    
+    def iter_stream(self, pieces: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+        """Chunk streamed text; yields (start, end, chunk) with offsets into the whole stream
+        
+        Only a window of a few chunks is buffered: whenever it fills up, every
+        chunk but the last (which may still grow) is emitted and dropped.
+        """
+        window_chars = self.max_tokens * self.BYTES_PER_TOKEN * 8
+        buffer = ""
+        base = 0
+        
+        for piece in pieces:
+            buffer += piece
+            if len(buffer) < window_chars:
+                continue
+            
+            spans = self.chunk_spans(buffer)
+            for start, end in spans[:-1]:
+                yield base + start, base + end, buffer[start:end]
+            
+            keep = spans[-1][0] if spans else len(buffer)
+            buffer = buffer[keep:]
+            base += keep
+        
+        for start, end in self.iter_spans(buffer):
+            yield base + start, base + end, buffer[start:end]
+    
+    def _iter_units(self, text: str) -> Iterator[Tuple[int, int, int, bool]]:
+        """Sentences as (start, end, tokens, ends_paragraph), none over budget"""
+        position = 0
+        for match in self.BOUNDARY.finditer(text):
+            yield from self._fit(text, position, match.end(), match.group().count("\n") >= 2)
+            position = match.end()
+        
+        if position < len(text):
+            yield from self._fit(text, position, len(text), True)
+    
+    def _fit(self, text: str, start: int, end: int, paragraph_end: bool) -> Iterator[Tuple[int, int, int, bool]]:
+        tokens = self.estimate_tokens(text[start:end])
+        if tokens <= self.max_tokens:
+            yield start, end, tokens, paragraph_end
+            return
+        
+        # Over budget: pack whole words, then cut over-long words by characters
+        piece_start = start
+        piece_tokens = 0
+        for match in self.WORD.finditer(text, start, end):
+            word_tokens = self.estimate_tokens(match.group())
+            if piece_tokens and piece_tokens + word_tokens > self.max_tokens:
+                yield piece_start, match.start(), piece_tokens, False
+                piece_start, piece_tokens = match.start(), 0
+            
+            if word_tokens > self.max_tokens:
+                # 4 bytes is the widest UTF-8 character
+                step = self.max_tokens * self.BYTES_PER_TOKEN // 4
+                for cut in range(match.start(), match.end(), step):
+                    cut_end = min(cut + step, match.end())
+                    yield cut, cut_end, self.estimate_tokens(text[cut:cut_end]), False
+                piece_start, piece_tokens = match.end(), 0
+            else:
+                piece_tokens += word_tokens
+        
+        if piece_start < end:
+            yield piece_start, end, self.estimate_tokens(text[piece_start:end]), paragraph_end
+    
+    def _overlap(self, units: List[Tuple[int, int, int]]) -> Tuple[List[Tuple[int, int, int]], int]:
+        """Trailing units (up to overlap_tokens) carried into the next chunk"""
+        carried = []
+        tokens = 0
+        for unit in reversed(units):
+            if tokens + unit[2] > self.overlap_tokens:
+                break
+            carried.insert(0, unit)
+            tokens += unit[2]
+        return carried, tokens
+    
+    @staticmethod
+    def _span(text: str, units: List[Tuple[int, int, int]]) -> Optional[Span]:
+        """Span of the units with surrounding whitespace trimmed (None if blank)"""
+        start, end = units[0][0], units[-1][1]
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return (start, end) if start < end else None
+
+
+def _max_chunk_tokens() -> int:
+    provider_limit = ChunkingService.EMBEDDING_INPUT_TOKENS.get(settings.EMBEDDING_PROVIDER)
+    if provider_limit is None:
+        return settings.CHUNK_MAX_TOKENS
+    return min(settings.CHUNK_MAX_TOKENS, provider_limit)
+
+
+# Singleton instance
+chunking_service = ChunkingService(
+    max_tokens=_max_chunk_tokens(),
+    overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+)
@@ -0,0 +1,121 @@
+import hashlib
+import re
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import or_, literal_column
+from app.config import settings
+from app.models.memory import SIMHASH_BANDS, SIMHASH_BAND_BITS, simhash_band_sql
+
+
+class DedupService:
+    """Near-duplicate detection with 64-bit SimHash signatures
+    
+    Each text is reduced to overlapping word shingles; every shingle hash votes
+    on each of the 64 bits and the majority wins. Similar texts get signatures
+    a few bits apart. Two signatures within max_distance bits (max_distance <
+    number of bands) agree exactly on at least one 16-bit band, so the
+    candidates for an item are the rows matching any of its bands, which the
+    per-band expression indexes find directly; the exact distance is then
+    checked in Python.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    SHINGLE_SIZE = 3
+    
+    BAND_MASK = (1 << SIMHASH_BAND_BITS) - 1
+    
+    def __init__(self, max_distance: int, enabled: bool = True):
+        # The band lookup only guarantees recall below one differing bit per band
+        self.max_distance = max(0, min(max_distance, SIMHASH_BANDS - 1))
+        self.enabled = enabled
+    
+    def simhash(self, text: str) -> int:
+        """Signed 64-bit SimHash (fits a Postgres BIGINT)"""
+        tokens = self.TOKEN_PATTERN.findall(text.lower())
+        if len(tokens) >= self.SHINGLE_SIZE:
+            shingles = [
+                " ".join(tokens[i:i + self.SHINGLE_SIZE])
+                for i in range(len(tokens) - self.SHINGLE_SIZE + 1)
+            ]
+        else:
+            shingles = [" ".join(tokens) or text.strip()]
+        
+        digests = b"".join(
+            hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest()
+            for shingle in shingles
+        )
+        votes = np.unpackbits(np.frombuffer(digests, dtype=np.uint8)).reshape(-1, 64).sum(axis=0)
+        bits = np.packbits(votes * 2 > len(shingles))
+        return int.from_bytes(bits.tobytes(), "big", signed=True)
+    
+    def bands(self, signature: int) -> List[int]:
+        """The signature's bands, in the same order as simhash_band_sql"""
+        return [
+            (signature >> (band * SIMHASH_BAND_BITS)) & self.BAND_MASK
+            for band in range(SIMHASH_BANDS)
+        ]
+    
+    @staticmethod
+    def distance(a: int, b: int) -> int:
+        """Hamming distance between two signatures"""
+        return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count("1")
+    
+    def candidate_clause(self, signatures: Iterable[int]):
+        """WHERE clause matching rows that share any band with any signature"""
+        values = [set() for _ in range(SIMHASH_BANDS)]
+        for signature in signatures:
+            for band, value in enumerate(self.bands(signature)):
+                values[band].add(value)
+        
+        return or_(*(
+            literal_column(simhash_band_sql(band)).in_(sorted(values[band]))
+            for band in range(SIMHASH_BANDS)
+        ))
+    
+    def find_duplicates(
+        self,
+        signatures: Dict[int, int],
+        existing: Iterable[Tuple[int, int]]
+    ) -> Dict[int, Tuple[str, int]]:
+        """Match new items against stored rows and against earlier items of the batch
+        
+        signatures maps item index -> signature (in input order); existing holds
+        (memory_id, signature) candidates. Returns item index -> ("memory",
+        memory_id) or ("item", index of the earlier item it duplicates).
+        """
+        buckets: Dict[Tuple[int, int], List[Tuple[str, int, int]]] = {}
+        
+        def add(kind: str, key: int, signature: int):
+            for band, value in enumerate(self.bands(signature)):
+                buckets.setdefault((band, value), []).append((kind, key, signature))
+        
+        for memory_id, signature in existing:
+            if signature is not None:
+                add("memory", memory_id, signature)
+        
+        duplicates = {}
+        for index, signature in signatures.items():
+            match = self._closest(buckets, signature)
+            if match:
+                duplicates[index] = match
+            else:
+                add("item", index, signature)
+        
+        return duplicates
+    
+    def _closest(self, buckets: Dict, signature: int) -> Optional[Tuple[str, int]]:
+        best = None
+        best_distance = self.max_distance + 1
+        for band, value in enumerate(self.bands(signature)):
+            for kind, key, other in buckets.get((band, value), ()):
+                distance = self.distance(signature, other)
+                if distance < best_distance:
+                    best, best_distance = (kind, key), distance
+        return best
+
+
+# Singleton instance
+dedup_service = DedupService(
+    max_distance=settings.DEDUP_MAX_DISTANCE,
+    enabled=settings.DEDUP_ENABLED
+)
@@ -0,0 +1,215 @@
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List
+from app.config import settings
+from app.utils.redis_client import redis_client
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU in front of a shared Redis tier.
+    
+    Keys are content-addressed on (provider, model, input_type, sha256(text)),
+    so the same text always maps to the same vector regardless of who asked.
+    """
+    
+    KEY_PREFIX = "emb:v1"
+    
+    def __init__(self, max_items: int, ttl_seconds: int, enabled: bool = True):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._local: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "local_hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "batch_duplicates": 0
+        }
+    
+    def make_key(self, provider: str, model: str, input_type: str, text: str) -> str:
+        """Build the cache key for a text"""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{self.KEY_PREFIX}:{provider}:{model}:{input_type}:{digest}"
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Look up keys in the LRU, then Redis; returns only the keys found"""
+        if not self.enabled:
+            return {}
+        
+        found, remaining = self._get_local(keys)
+        if remaining:
+            shared = self._get_shared(remaining)
+            self._merge_shared(found, remaining, shared)
+        
+        return found
+    
+    async def aget_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        """Async get_many: the Redis tier is read without blocking the event loop"""
+        if not self.enabled:
+            return {}
+        
+        found, remaining = self._get_local(keys)
+        if remaining:
+            shared = await self._aget_shared(remaining)
+            self._merge_shared(found, remaining, shared)
+        
+        return found
+    
+    def set_many(self, vectors: Dict[str, List[float]]):
+        """Store freshly generated vectors in both tiers"""
+        if not self.enabled or not vectors:
+            return
+        
+        self._set_local(vectors)
+        self._set_shared(vectors)
+    
+    async def aset_many(self, vectors: Dict[str, List[float]]):
+        """Async set_many"""
+        if not self.enabled or not vectors:
+            return
+        
+        self._set_local(vectors)
+        await self._aset_shared(vectors)
+    
+    def record_batch_duplicates(self, count: int):
+        """Track texts served from another entry of the same batch"""
+        if count:
+            with self._lock:
+                self._stats["batch_duplicates"] += count
+    
+    def get_stats(self) -> Dict:
+        """Hit/miss counters and current LRU occupancy"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["local_size"] = len(self._local)
+        
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["enabled"] = self.enabled
+        stats["max_items"] = self.max_items
+        stats["hit_rate"] = (stats["local_hits"] + stats["redis_hits"]) / lookups if lookups else 0.0
+        return stats
+    
+    def clear(self):
+        """Drop the in-process tier and reset counters"""
+        with self._lock:
+            self._local.clear()
+            for name in self._stats:
+                self._stats[name] = 0
+    
+    def _get_local(self, keys: Iterable[str]):
+        found = {}
+        remaining = []
+        
+        with self._lock:
+            for key in keys:
+                vector = self._local.get(key)
+                if vector is not None:
+                    self._local.move_to_end(key)
+                    found[key] = vector
+                else:
+                    remaining.append(key)
+            self._stats["local_hits"] += len(found)
+        
+        return found, remaining
+    
+    def _merge_shared(self, found: Dict, remaining: List[str], shared: Dict[str, List[float]]):
+        if shared:
+            self._set_local(shared)
+            found.update(shared)
+        with self._lock:
+            self._stats["redis_hits"] += len(shared)
+            self._stats["misses"] += len(remaining) - len(shared)
+    
+    def _set_local(self, vectors: Dict[str, List[float]]):
+        with self._lock:
+            for key, vector in vectors.items():
+                self._local[key] = vector
+                self._local.move_to_end(key)
+            while len(self._local) > self.max_items:
+                self._local.popitem(last=False)
+    
+    def _get_shared(self, keys: List[str]) -> Dict[str, List[float]]:
+        client = redis_client.get()
+        if client is None:
+            return {}
+        
+        try:
+            values = client.mget(keys)
+        except Exception as e:
+            print(f"Embedding cache read failed: {str(e)}")
+            redis_client.reset()
+            return {}
+        
+        return {
+            key: self._unpack(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+    
+    def _set_shared(self, vectors: Dict[str, List[float]]):
+        client = redis_client.get()
+        if client is None:
+            return
+        
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, vector in vectors.items():
+                pipe.set(key, self._pack(vector), ex=self.ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            print(f"Embedding cache write failed: {str(e)}")
+            redis_client.reset()
+    
+    async def _aget_shared(self, keys: List[str]) -> Dict[str, List[float]]:
+        client = await redis_client.get_async()
+        if client is None:
+            return {}
+        
+        try:
+            values = await client.mget(keys)
+        except Exception as e:
+            print(f"Embedding cache read failed: {str(e)}")
+            redis_client.reset()
+            return {}
+        
+        return {
+            key: self._unpack(value)
+            for key, value in zip(keys, values)
+            if value is not None
+        }
+    
+    async def _aset_shared(self, vectors: Dict[str, List[float]]):
+        client = await redis_client.get_async()
+        if client is None:
+            return
+        
+        try:
+            pipe = client.pipeline(transaction=False)
+            for key, vector in vectors.items():
+                pipe.set(key, self._pack(vector), ex=self.ttl_seconds)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Embedding cache write failed: {str(e)}")
+            redis_client.reset()
+    
+    @staticmethod
+    def _pack(vector: List[float]) -> bytes:
+        # float32 is what the vector store keeps anyway; 4x smaller than JSON
+        return array("f", vector).tobytes()
+    
+    @staticmethod
+    def _unpack(value: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(value)
+        return vector.tolist()
+
+
+# Singleton instance
+embedding_cache = EmbeddingCache(
+    max_items=settings.EMBEDDING_CACHE_MAX_ITEMS,
+    ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+    enabled=settings.EMBEDDING_CACHE_ENABLED
+)
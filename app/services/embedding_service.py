@@ -1,14 +1,24 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 import cohere
 from typing import List, Dict
 from app.config import settings
+from app.services.embedding_cache import embedding_cache
+from app.services.local_embedding import HashingEmbedder
 
 
 class EmbeddingService:
-    """Service for generating embeddings using OpenAI or Cohere"""
+    """Service for generating embeddings using OpenAI, Cohere or the offline local embedder"""
+    
+    # Max texts per embed request accepted by each provider
+    MAX_BATCH_SIZE = {
+        "openai": 2048,
+        "cohere": 96,
+        "local": 4096
+    }
     
     def __init__(self):
         self.provider = settings.EMBEDDING_PROVIDER
+        self.model = ""
         
         if self.provider == "openai":
             self.openai_client = OpenAI(api_key=settings.OPENAI_API_KEY)
@@ -16,53 +26,82 @@ class EmbeddingService:
         elif self.provider == "cohere":
             self.cohere_client = cohere.Client(settings.COHERE_API_KEY)
             self.model = settings.COHERE_EMBEDDING_MODEL
+        elif self.provider == "local":
+            self.local_embedder = HashingEmbedder(settings.LOCAL_EMBEDDING_DIMENSION)
+            self.model = f"hashing-{settings.LOCAL_EMBEDDING_DIMENSION}"
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str, input_type: str = "search_document") -> List[float]:
         """Generate embedding for a single text"""
         try:
-            if self.provider == "openai":
-                response = self.openai_client.embeddings.create(
-                    input=text,
-                    model=self.model
-                )
-                return response.data[0].embedding
-            
-            elif self.provider == "cohere":
-                response = self.cohere_client.embed(
-                    texts=[text],
-                    model=self.model,
-                    input_type="search_document"
-                )
-                return response.embeddings[0]
-            
-            else:
-                raise Exception(f"Unknown embedding provider: {self.provider}")
+            return self._embed_with_cache([text], input_type)[0]
         except Exception as e:
             raise Exception(f"Embedding generation failed: {str(e)}")
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    def generate_embeddings_batch(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
         """Generate embeddings for multiple texts"""
         try:
-            if self.provider == "openai":
-                response = self.openai_client.embeddings.create(
-                    input=texts,
-                    model=self.model
-                )
-                return [item.embedding for item in response.data]
-            
-            elif self.provider == "cohere":
-                response = self.cohere_client.embed(
-                    texts=texts,
-                    model=self.model,
-                    input_type="search_document"
-                )
-                return response.embeddings
-            
-            else:
-                raise Exception(f"Unknown embedding provider: {self.provider}")
+            return self._embed_with_cache(texts, input_type)
         except Exception as e:
             raise Exception(f"Batch embedding generation failed: {str(e)}")
     
+    def get_max_batch_size(self) -> int:
+        """Largest number of texts the provider accepts in one request"""
+        return self.MAX_BATCH_SIZE.get(self.provider, 96)
+    
+    def get_cache_stats(self) -> Dict:
+        """Embedding cache hit/miss counters"""
+        return embedding_cache.get_stats()
+    
+    def _embed_with_cache(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Serve texts from the cache and only send unseen, unique texts to the provider"""
+        if not texts:
+            return []
+        
+        # Computing local vectors is cheaper than a cache round trip
+        if self.provider == "local":
+            return self._embed(texts, input_type)
+        
+        keys = [
+            embedding_cache.make_key(self.provider, self.model, input_type, text)
+            for text in texts
+        ]
+        
+        # Identical texts in one batch share a key and are embedded once
+        unique = dict(zip(keys, texts))
+        embedding_cache.record_batch_duplicates(len(keys) - len(unique))
+        
+        vectors = embedding_cache.get_many(unique.keys())
+        missing = {key: text for key, text in unique.items() if key not in vectors}
+        
+        if missing:
+            generated = dict(zip(missing.keys(), self._embed(list(missing.values()), input_type)))
+            embedding_cache.set_many(generated)
+            vectors.update(generated)
+        
+        return [vectors[key] for key in keys]
+    
+    def _embed(self, texts: List[str], input_type: str) -> List[List[float]]:
+        """Call the configured provider (no caching)"""
+        if self.provider == "openai":
+            response = self.openai_client.embeddings.create(
+                input=texts,
+                model=self.model
+            )
+            return [item.embedding for item in response.data]
+        
+        elif self.provider == "cohere":
+            response = self.cohere_client.embed(
+                texts=texts,
+                model=self.model,
+                input_type=input_type
+            )
+            return response.embeddings
+        
+        elif self.provider == "local":
+            return self.local_embedder.encode(texts).tolist()
+        
+        raise Exception(f"Unknown embedding provider: {self.provider}")
+    
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings for this model"""
         if self.provider == "openai":
@@ -82,8 +121,102 @@ class EmbeddingService:
                 return 1024
             return 1024
         
+        elif self.provider == "local":
+            return self.local_embedder.dimension
+        
         return 1536  # default
 
 
-# Singleton instance
+class AsyncEmbeddingService(EmbeddingService):
+    """EmbeddingService variant whose provider and cache calls are awaitable
+    
+    Uses the async OpenAI/Cohere clients so a slow provider call only suspends
+    the request waiting on it, not the whole event loop.
+    """
+    
+    def __init__(self):
+        self.provider = settings.EMBEDDING_PROVIDER
+        self.model = ""
+        
+        if self.provider == "openai":
+            self.openai_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+            self.model = settings.EMBEDDING_MODEL
+        elif self.provider == "cohere":
+            self.cohere_client = cohere.AsyncClient(settings.COHERE_API_KEY)
+            self.model = settings.COHERE_EMBEDDING_MODEL
+        elif self.provider == "local":
+            self.local_embedder = HashingEmbedder(settings.LOCAL_EMBEDDING_DIMENSION)
+            self.model = f"hashing-{settings.LOCAL_EMBEDDING_DIMENSION}"
+    
+    async def generate_embedding(self, text: str, input_type: str = "search_document") -> List[float]:
+        """Generate embedding for a single text"""
+        try:
+            return (await self._embed_with_cache([text], input_type))[0]
+        except Exception as e:
+            raise Exception(f"Embedding generation failed: {str(e)}")
+    
+    async def generate_embeddings_batch(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
+        """Generate embeddings for multiple texts"""
+        try:
+            return await self._embed_with_cache(texts, input_type)
+        except Exception as e:
+            raise Exception(f"Batch embedding generation failed: {str(e)}")
+    
+    async def close(self):
+        """Close the provider HTTP sessions"""
+        if self.provider == "openai":
+            await self.openai_client.close()
+        elif self.provider == "cohere":
+            await self.cohere_client.close()
+    
+    async def _embed_with_cache(self, texts: List[str], input_type: str) -> List[List[float]]:
+        if not texts:
+            return []
+        
+        if self.provider == "local":
+            return await self._embed(texts, input_type)
+        
+        keys = [
+            embedding_cache.make_key(self.provider, self.model, input_type, text)
+            for text in texts
+        ]
+        
+        unique = dict(zip(keys, texts))
+        embedding_cache.record_batch_duplicates(len(keys) - len(unique))
+        
+        vectors = await embedding_cache.aget_many(unique.keys())
+        missing = {key: text for key, text in unique.items() if key not in vectors}
+        
+        if missing:
+            generated = dict(zip(missing.keys(), await self._embed(list(missing.values()), input_type)))
+            await embedding_cache.aset_many(generated)
+            vectors.update(generated)
+        
+        return [vectors[key] for key in keys]
+    
+    async def _embed(self, texts: List[str], input_type: str) -> List[List[float]]:
+        if self.provider == "openai":
+            response = await self.openai_client.embeddings.create(
+                input=texts,
+                model=self.model
+            )
+            return [item.embedding for item in response.data]
+        
+        elif self.provider == "cohere":
+            response = await self.cohere_client.embed(
+                texts=texts,
+                model=self.model,
+                input_type=input_type
+            )
+            return response.embeddings
+        
+        elif self.provider == "local":
+            # Pure NumPy, sub-millisecond for typical batches; no need to offload
+            return self.local_embedder.encode(texts).tolist()
+        
+        raise Exception(f"Unknown embedding provider: {self.provider}")
+
+
+# Singleton instances
 embedding_service = EmbeddingService()
+async_embedding_service = AsyncEmbeddingService()
@@ -0,0 +1,62 @@
+import threading
+from typing import Optional
+from app.config import settings
+from app.services.embedding_service import embedding_service
+
+
+class EmbeddingWorker:
+    """Background thread that drains memories queued with embedding_status='pending'
+    
+    The queue is the memories table itself (see MemoryService.process_pending_embeddings),
+    so pending work survives restarts and is shared by every app process.
+    """
+    
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def batch_size(self) -> int:
+        return min(settings.EMBEDDING_WORKER_BATCH_SIZE, embedding_service.get_max_batch_size())
+    
+    def start(self):
+        """Start the worker thread (no-op if already running)"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-worker", daemon=True)
+        self._thread.start()
+        print("✅ Embedding worker started")
+    
+    def stop(self, timeout: float = 5.0):
+        """Ask the worker to finish its current batch and exit"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+    
+    def notify(self):
+        """Wake the worker up because new pending rows were committed"""
+        self._wakeup.set()
+    
+    def _run(self):
+        from app.services.memory_service import memory_service
+        
+        while not self._stopping.is_set():
+            try:
+                processed = memory_service.process_pending_embeddings(self.batch_size)
+            except Exception as e:
+                print(f"Embedding worker error: {str(e)}")
+                processed = 0
+            
+            # Keep draining while batches come back full, otherwise wait for work
+            if processed < self.batch_size:
+                self._wakeup.wait(timeout=settings.EMBEDDING_WORKER_POLL_SECONDS)
+                self._wakeup.clear()
+
+
+# Singleton instance
+embedding_worker = EmbeddingWorker()
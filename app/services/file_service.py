@@ -1,9 +1,31 @@
 import os
+import time
+import codecs
+import shutil
+import tempfile
+import multiprocessing
 import PyPDF2
 import docx
-from typing import Dict, List
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 from io import BytesIO
+from app.services.chunking_service import chunking_service
+
+
+def _extract_pdf_pages(path: str, start: int, end: int) -> List[Tuple[str, float]]:
+    """Process-pool task: open the PDF independently and extract pages [start, end)
+    
+    Returns (text, milliseconds) per page.
+    """
+    pdf_reader = PyPDF2.PdfReader(path)
+    pages = []
+    for page_num in range(start, end):
+        started = time.perf_counter()
+        text = pdf_reader.pages[page_num].extract_text()
+        pages.append((text, (time.perf_counter() - started) * 1000))
+    return pages
 
 
 class FileService:
@@ -12,8 +34,24 @@ class FileService:
     ALLOWED_EXTENSIONS = {'.txt', '.pdf', '.doc', '.docx'}
     MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
     
+    # Streaming extraction
+    READ_BLOCK_SIZE = 64 * 1024
+    TEXT_ENCODINGS = ('utf-8', 'latin-1', 'cp1252', 'iso-8859-1')
+    TEXT_PREVIEW_CHARS = 1000
+    
+    # Parallel PDF extraction: page ranges are spread over a process pool
+    PDF_WORKERS = min(os.cpu_count() or 1, 8)
+    PDF_PARALLEL_MIN_PAGES = 16
+    PDF_MIN_PAGES_PER_WORKER = 8
+    
     def __init__(self):
-        pass
+        self._pdf_executor: Optional[ProcessPoolExecutor] = None
+    
+    def shutdown(self):
+        """Stop the PDF worker processes (on app shutdown)"""
+        if self._pdf_executor is not None:
+            self._pdf_executor.shutdown(wait=False, cancel_futures=True)
+            self._pdf_executor = None
     
     def validate_file(self, filename: str, file_size: int) -> Dict:
         """Validate file extension and size"""
@@ -33,77 +71,174 @@ class FileService:
         
         return {"valid": True}
     
-    def extract_text_from_txt(self, file_content: bytes) -> Dict:
+    def extract_text_from_txt(self, file_content: Union[bytes, BinaryIO]) -> Dict:
         """Extract text from TXT file"""
-        try:
-            text = file_content.decode('utf-8')
-            return {
-                "success": True,
-                "text": text,
-                "word_count": len(text.split())
-            }
-        except UnicodeDecodeError:
-            # Try different encodings
-            for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
-                try:
-                    text = file_content.decode(encoding)
-                    return {
-                        "success": True,
-                        "text": text,
-                        "word_count": len(text.split())
-                    }
-                except:
-                    continue
-            
+        fileobj = self._as_file(file_content)
+        encoding = self._detect_encoding(fileobj)
+        if encoding is None:
             return {"success": False, "error": "Could not decode text file"}
+        
+        text = "".join(self.iter_text_from_txt(fileobj, encoding))
+        return {
+            "success": True,
+            "text": text,
+            "word_count": len(text.split())
+        }
     
-    def extract_text_from_pdf(self, file_content: bytes) -> Dict:
+    def extract_text_from_pdf(self, file_content: Union[bytes, BinaryIO]) -> Dict:
         """Extract text from PDF file"""
         try:
-            pdf_file = BytesIO(file_content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text_parts = []
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
-                text_parts.append(page.extract_text())
-            
-            full_text = "\n".join(text_parts)
+            stats = {}
+            full_text = "\n".join(self.iter_text_from_pdf(self._as_file(file_content), stats))
             
             return {
                 "success": True,
                 "text": full_text,
-                "page_count": len(pdf_reader.pages),
+                "page_count": stats["page_count"],
+                "page_timings_ms": stats["page_timings_ms"],
+                "extraction_workers": stats["extraction_workers"],
                 "word_count": len(full_text.split())
             }
         except Exception as e:
             return {"success": False, "error": f"PDF extraction failed: {str(e)}"}
     
-    def extract_text_from_docx(self, file_content: bytes) -> Dict:
+    def extract_text_from_docx(self, file_content: Union[bytes, BinaryIO]) -> Dict:
         """Extract text from DOCX file"""
         try:
-            doc_file = BytesIO(file_content)
-            doc = docx.Document(doc_file)
-            
-            text_parts = []
-            for paragraph in doc.paragraphs:
-                text_parts.append(paragraph.text)
-            
-            full_text = "\n".join(text_parts)
+            stats = {}
+            full_text = "\n".join(self.iter_text_from_docx(self._as_file(file_content), stats))
             
             return {
                 "success": True,
                 "text": full_text,
-                "paragraph_count": len(doc.paragraphs),
+                "paragraph_count": stats["paragraph_count"],
                 "word_count": len(full_text.split())
             }
         except Exception as e:
             return {"success": False, "error": f"DOCX extraction failed: {str(e)}"}
     
-    def process_file(self, filename: str, file_content: bytes) -> Dict:
+    # Streaming extraction: extractors read from a file handle and yield text
+    # pieces (a decoded block, a page, a paragraph) instead of one big string.
+    
+    def iter_text_from_txt(self, fileobj: BinaryIO, encoding: str) -> Iterator[str]:
+        """Decode a text file block by block"""
+        decoder = codecs.getincrementaldecoder(encoding)()
+        fileobj.seek(0)
+        for block in iter(lambda: fileobj.read(self.READ_BLOCK_SIZE), b""):
+            text = decoder.decode(block)
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    
+    def iter_text_from_pdf(self, fileobj: BinaryIO, stats: Dict) -> Iterator[str]:
+        """Yield the text of each PDF page, in order
+        
+        Large documents are split into contiguous page ranges extracted in
+        parallel by the process pool; small ones (or single-core hosts) are
+        read on this thread. stats gets page_count, page_timings_ms and
+        extraction_workers.
+        """
+        fileobj.seek(0)
+        pdf_reader = PyPDF2.PdfReader(fileobj)
+        page_count = len(pdf_reader.pages)
+        workers = min(self.PDF_WORKERS, page_count // self.PDF_MIN_PAGES_PER_WORKER or 1)
+        
+        stats["page_count"] = page_count
+        stats["page_timings_ms"] = timings = []
+        
+        if page_count < self.PDF_PARALLEL_MIN_PAGES or workers < 2:
+            stats["extraction_workers"] = 1
+            for page in pdf_reader.pages:
+                started = time.perf_counter()
+                text = page.extract_text()
+                timings.append(round((time.perf_counter() - started) * 1000, 2))
+                yield text
+            return
+        
+        stats["extraction_workers"] = workers
+        path, is_temporary = self._pdf_path(fileobj)
+        try:
+            range_size = -(-page_count // workers)
+            executor = self._get_pdf_executor()
+            futures = [
+                executor.submit(_extract_pdf_pages, path, start, min(start + range_size, page_count))
+                for start in range(0, page_count, range_size)
+            ]
+            
+            # Ranges are consumed in submission order, so pages come out in order
+            for future in futures:
+                for text, elapsed_ms in future.result():
+                    timings.append(round(elapsed_ms, 2))
+                    yield text
+        except BrokenProcessPool:
+            self._pdf_executor = None
+            raise
+        finally:
+            if is_temporary:
+                os.unlink(path)
+    
+    def _get_pdf_executor(self) -> ProcessPoolExecutor:
+        if self._pdf_executor is None:
+            # spawn: forking a process that runs threads (embedding worker, event loop) is unsafe
+            self._pdf_executor = ProcessPoolExecutor(
+                max_workers=self.PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pdf_executor
+    
+    @staticmethod
+    def _pdf_path(fileobj: BinaryIO) -> Tuple[str, bool]:
+        """A path the workers can open: the file's own, or a temp copy of the handle"""
+        name = getattr(fileobj, "name", None)
+        if isinstance(name, str) and os.path.isfile(name):
+            return name, False
+        
+        fileobj.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            shutil.copyfileobj(fileobj, tmp)
+        return tmp.name, True
+    
+    def iter_text_from_docx(self, fileobj: BinaryIO, stats: Dict) -> Iterator[str]:
+        """Yield DOCX paragraphs (python-docx parses the document XML as a whole)"""
+        fileobj.seek(0)
+        doc = docx.Document(fileobj)
+        stats["paragraph_count"] = len(doc.paragraphs)
+        for paragraph in doc.paragraphs:
+            yield paragraph.text
+    
+    def _detect_encoding(self, fileobj: BinaryIO) -> Optional[str]:
+        """First encoding in TEXT_ENCODINGS that decodes the whole file (validated block by block)"""
+        for encoding in self.TEXT_ENCODINGS:
+            decoder = codecs.getincrementaldecoder(encoding)()
+            fileobj.seek(0)
+            try:
+                for block in iter(lambda: fileobj.read(self.READ_BLOCK_SIZE), b""):
+                    decoder.decode(block)
+                decoder.decode(b"", final=True)
+                return encoding
+            except UnicodeDecodeError:
+                continue
+        return None
+    
+    @staticmethod
+    def _as_file(file_content: Union[bytes, BinaryIO]) -> BinaryIO:
+        return BytesIO(file_content) if isinstance(file_content, (bytes, bytearray)) else file_content
+    
+    @staticmethod
+    def _file_size(fileobj: BinaryIO) -> int:
+        fileobj.seek(0, os.SEEK_END)
+        size = fileobj.tell()
+        fileobj.seek(0)
+        return size
+    
+    def process_file(self, filename: str, file_content: Union[bytes, BinaryIO]) -> Dict:
         """Process uploaded file and extract text"""
+        fileobj = self._as_file(file_content)
+        
         # Validate
-        validation = self.validate_file(filename, len(file_content))
+        validation = self.validate_file(filename, self._file_size(fileobj))
         if not validation["valid"]:
             return validation
         
@@ -111,11 +246,11 @@ class FileService:
         ext = os.path.splitext(filename)[1].lower()
         
         if ext == '.txt':
-            result = self.extract_text_from_txt(file_content)
+            result = self.extract_text_from_txt(fileobj)
         elif ext == '.pdf':
-            result = self.extract_text_from_pdf(file_content)
+            result = self.extract_text_from_pdf(fileobj)
         elif ext in ['.doc', '.docx']:
-            result = self.extract_text_from_docx(file_content)
+            result = self.extract_text_from_docx(fileobj)
         else:
             return {"success": False, "error": f"Unsupported file type: {ext}"}
         
@@ -126,17 +261,102 @@ class FileService:
         
         return result
     
-    def chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """Split text into overlapping chunks for embedding"""
-        words = text.split()
-        chunks = []
+    def process_upload(
+        self,
+        filename: str,
+        fileobj: BinaryIO,
+        file_size: Optional[int] = None,
+        preview_chunks: int = 3,
+        include_text: bool = False
+    ) -> Dict:
+        """Extract and chunk an uploaded file straight from its (spooled) file handle
         
-        for i in range(0, len(words), chunk_size - overlap):
-            chunk = " ".join(words[i:i + chunk_size])
-            if chunk:
-                chunks.append(chunk)
+        Text flows page by page / block by block into the chunker, so memory use
+        is bounded by one chunk window rather than the document size. Only a
+        text preview and the first preview_chunks chunks are kept unless
+        include_text is set.
+        """
+        if file_size is None:
+            file_size = self._file_size(fileobj)
+        
+        validation = self.validate_file(filename, file_size)
+        if not validation["valid"]:
+            return validation
         
-        return chunks
+        ext = os.path.splitext(filename)[1].lower()
+        stats = {}
+        
+        try:
+            if ext == '.txt':
+                encoding = self._detect_encoding(fileobj)
+                if encoding is None:
+                    return {"success": False, "error": "Could not decode text file"}
+                stats["encoding"] = encoding
+                pieces = self.iter_text_from_txt(fileobj, encoding)
+            elif ext == '.pdf':
+                pieces = self._separated(self.iter_text_from_pdf(fileobj, stats))
+            elif ext in ['.doc', '.docx']:
+                pieces = self._separated(self.iter_text_from_docx(fileobj, stats))
+            else:
+                return {"success": False, "error": f"Unsupported file type: {ext}"}
+            
+            text_parts = []
+            preview_parts = []
+            preview_length = 0
+            word_count = 0
+            
+            def tap(pieces: Iterable[str]) -> Iterator[str]:
+                nonlocal preview_length, word_count
+                joins_previous = False
+                for piece in pieces:
+                    if not piece:
+                        continue
+                    if include_text:
+                        text_parts.append(piece)
+                    if preview_length < self.TEXT_PREVIEW_CHARS:
+                        preview_parts.append(piece[:self.TEXT_PREVIEW_CHARS - preview_length])
+                        preview_length += len(preview_parts[-1])
+                    
+                    # A word cut across two pieces is counted once
+                    word_count += len(piece.split()) - (joins_previous and not piece[0].isspace())
+                    joins_previous = not piece[-1].isspace()
+                    yield piece
+            
+            chunks = []
+            chunk_count = 0
+            for start, end, chunk in chunking_service.iter_stream(tap(pieces)):
+                if chunk_count < preview_chunks:
+                    chunks.append({"start": start, "end": end, "text": chunk})
+                chunk_count += 1
+        except Exception as e:
+            return {"success": False, "error": f"{ext[1:].upper()} extraction failed: {str(e)}"}
+        
+        result = {
+            "success": True,
+            "text_preview": "".join(preview_parts),
+            "word_count": word_count,
+            "chunk_count": chunk_count,
+            "chunk_max_tokens": chunking_service.max_tokens,
+            "chunks": chunks,
+            "filename": filename,
+            "file_type": ext,
+            "file_size": file_size,
+            "processed_at": datetime.utcnow().isoformat()
+        }
+        result.update(stats)
+        if include_text:
+            result["text"] = "".join(text_parts)
+        return result
+    
+    @staticmethod
+    def _separated(pieces: Iterable[str]) -> Iterator[str]:
+        """Join pages/paragraphs with newlines, as the whole-text extractors do"""
+        for i, piece in enumerate(pieces):
+            yield piece if i == 0 else "\n" + piece
+    
+    def chunk_text(self, text: str) -> List[str]:
+        """Split text into token-budgeted chunks for embedding (see ChunkingService)"""
+        return chunking_service.chunk_text(text)
 
 
 # Singleton instance
@@ -1,11 +1,16 @@
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
-from typing import Dict, List, Optional
+from googleapiclient.errors import HttpError
+from typing import Callable, Dict, List, Optional, Tuple
 import base64
+import time
 from email.mime.text import MIMEText
-from datetime import datetime
+from datetime import datetime, timezone
 from app.config import settings
+from app.services.sync_cursor_service import sync_cursor_service
+from app.utils.http_client import http_clients
+from app.utils.rate_limiter import rate_limiter
 
 
 class GmailService:
@@ -16,6 +21,29 @@ class GmailService:
         'https://www.googleapis.com/auth/gmail.metadata'
     ]
     
+    # Calls per batch HTTP request (the API accepts 100; above 50 it starts rate limiting)
+    BATCH_SIZE = 50
+    
+    # Headers requested with format='metadata' (all _parse_email reads)
+    METADATA_HEADERS = ['Subject', 'From', 'Date']
+    
+    # Messages fetched and stored per step of a sync
+    SYNC_CHUNK = 100
+    
+    # Added messages a sync ignores
+    SKIPPED_LABELS = {'DRAFT', 'SPAM', 'TRASH'}
+    
+    # Longest email body stored in a memory
+    MAX_BODY_CHARS = 8000
+    
+    # fetch_messages error of a message deleted since it was listed (not retried)
+    NOT_FOUND_ERROR = "Message not found"
+    
+    # Quota units per call, paced by the rate limiter (Gmail allows 250 units/s per user)
+    QUOTA_UNITS = {"get": 5, "list": 5, "history": 2, "profile": 1}
+    
+    TOKEN_URI = "https://oauth2.googleapis.com/token"
+    
     def __init__(self):
         self.redirect_uri = getattr(settings, 'GMAIL_REDIRECT_URI', 'http://localhost:8000/oauth/gmail/callback')
     
@@ -34,11 +62,9 @@ class GmailService:
             f"&state={state}"
         )
     
-    def exchange_code_for_token(self, code: str) -> Dict:
+    async def exchange_code_for_token(self, code: str) -> Dict:
         """Exchange authorization code for access token"""
         try:
-            import requests
-            
             client_id = getattr(settings, 'GMAIL_CLIENT_ID', '')
             client_secret = getattr(settings, 'GMAIL_CLIENT_SECRET', '')
             
@@ -50,8 +76,8 @@ class GmailService:
                 "grant_type": "authorization_code"
             }
             
-            response = requests.post(
-                "https://oauth2.googleapis.com/token",
+            response = await http_clients.get("google").post(
+                self.TOKEN_URI,
                 data=data
             )
             
@@ -72,9 +98,35 @@ class GmailService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def get_gmail_service(self, access_token: str):
+    def get_credentials(
+        self,
+        access_token: str,
+        refresh_token: Optional[str] = None,
+        expires_at: Optional[datetime] = None
+    ) -> Credentials:
+        """OAuth credentials for an access token
+        
+        With a refresh_token, google-auth gets a new access token once the
+        old one expires (or the API answers 401) and the call goes through.
+        """
+        if not refresh_token:
+            return Credentials(token=access_token)
+        
+        if expires_at is not None and expires_at.tzinfo is not None:
+            # google-auth compares expiry with naive UTC
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri=self.TOKEN_URI,
+            client_id=settings.GMAIL_CLIENT_ID,
+            client_secret=settings.GMAIL_CLIENT_SECRET,
+            expiry=expires_at
+        )
+    
+    def get_gmail_service(self, access_token: str, credentials: Optional[Credentials] = None):
         """Create Gmail API service instance"""
-        credentials = Credentials(token=access_token)
+        credentials = credentials or Credentials(token=access_token)
         service = build('gmail', 'v1', credentials=credentials)
         return service
     
@@ -82,7 +134,11 @@ class GmailService:
         """Get Gmail user profile"""
         try:
             service = self.get_gmail_service(access_token)
-            profile = service.users().getProfile(userId='me').execute()
+            profile = self._execute(
+                service.users().getProfile(userId='me'),
+                rate_limiter.account_key(access_token),
+                self.QUOTA_UNITS["profile"]
+            )
             
             return {
                 "success": True,
@@ -96,17 +152,28 @@ class GmailService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def get_recent_emails(self, access_token: str, max_results: int = 10, query: str = "") -> Dict:
-        """Get recent emails from Gmail"""
+    def get_recent_emails(
+        self,
+        access_token: str,
+        max_results: int = 10,
+        query: str = "",
+        message_format: str = "full"
+    ) -> Dict:
+        """Get recent emails from Gmail
+        
+        message_format "metadata" fetches only the Subject/From/Date headers
+        and the snippet (no bodies), which is much smaller per message.
+        """
         try:
             service = self.get_gmail_service(access_token)
+            account = rate_limiter.account_key(access_token)
             
             # List messages
-            results = service.users().messages().list(
-                userId='me',
-                maxResults=max_results,
-                q=query
-            ).execute()
+            results = self._execute(
+                service.users().messages().list(userId='me', maxResults=max_results, q=query),
+                account,
+                self.QUOTA_UNITS["list"]
+            )
             
             messages = results.get('messages', [])
             
@@ -118,29 +185,319 @@ class GmailService:
                     "message": "No emails found"
                 }
             
-            emails = []
-            for msg in messages:
-                # Get full message details
-                message = service.users().messages().get(
-                    userId='me',
-                    id=msg['id'],
-                    format='full'
-                ).execute()
-                
-                email_data = self._parse_email(message)
-                emails.append(email_data)
+            fetched, errors = self.fetch_messages(
+                service,
+                [msg['id'] for msg in messages],
+                message_format,
+                account
+            )
+            emails = [self._parse_email(message) for message in fetched]
             
-            return {
+            result = {
                 "success": True,
                 "count": len(emails),
                 "data": emails
             }
+            if errors:
+                result["errors"] = errors
+            return result
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def search_emails(self, access_token: str, query: str, max_results: int = 50) -> Dict:
+    def search_emails(self, access_token: str, query: str, max_results: int = 50, message_format: str = "full") -> Dict:
         """Search emails with specific query"""
-        return self.get_recent_emails(access_token, max_results, query)
+        return self.get_recent_emails(access_token, max_results, query, message_format)
+    
+    def sync_to_memory(
+        self,
+        access_token: str,
+        user_id: int,
+        max_messages: int = 500,
+        message_format: str = "full",
+        full_resync: bool = False,
+        progress: Optional[Callable[[Dict], None]] = None,
+        refresh_token: Optional[str] = None,
+        token_expires_at: Optional[datetime] = None,
+        on_token_refresh: Optional[Callable[[str, Optional[datetime]], None]] = None
+    ) -> Dict:
+        """Store mail received since the last sync as memories
+        
+        The first sync lists the newest max_messages messages. Later syncs ask
+        users.history.list for the messages added since the stored historyId,
+        so they cost O(new mail) rather than O(mailbox); if that history has
+        expired, the sync starts over with a listing. Messages are fetched in
+        batches, paced by the account's quota, and stored SYNC_CHUNK at a
+        time. The historyId only advances when everything fetched was stored;
+        messages whose fetch failed are kept in the cursor state and fetched
+        again by the next sync. Runs in a worker thread (the Google client blocks); progress, if given,
+        is called with the running counts after each chunk.
+        
+        With a refresh_token an expired access token is renewed during the
+        sync; on_token_refresh, if given, then receives the new token and its
+        expiry so the caller can store them.
+        """
+        from app.services.memory_service import memory_service
+        
+        credentials = self.get_credentials(access_token, refresh_token, token_expires_at)
+        try:
+            service = self.get_gmail_service(access_token, credentials)
+            account = rate_limiter.account_key(access_token)
+            profile = self._execute(service.users().getProfile(userId='me'), account, self.QUOTA_UNITS["profile"])
+            account_id = profile.get("emailAddress") or ""
+            saved = None if full_resync else sync_cursor_service.get(user_id, "gmail", account_id)
+            
+            # Failed fetches of the previous sync
+            retry_ids = saved["state"].get("retry_ids", []) if saved else []
+            
+            message_ids = None
+            if saved and saved["cursor"]:
+                message_ids, history_id = self._added_since(service, account, saved["cursor"])
+            incremental = message_ids is not None
+            if not incremental:
+                # Taken before listing, so mail arriving meanwhile is picked up next time
+                history_id = profile.get("historyId")
+                message_ids = self._list_message_ids(service, account, max_messages)
+            message_ids = list(dict.fromkeys(retry_ids + message_ids))
+            
+            saved_count = deduplicated = 0
+            fetch_errors = {}
+            errors = []
+            
+            for start in range(0, len(message_ids), self.SYNC_CHUNK):
+                fetched, failed = self.fetch_messages(
+                    service,
+                    message_ids[start:start + self.SYNC_CHUNK],
+                    message_format,
+                    account
+                )
+                fetch_errors.update(failed)
+                if not fetched:
+                    continue
+                
+                bulk_result = memory_service.create_memories_bulk(
+                    user_id=user_id,
+                    items=[self._memory_item(message) for message in fetched],
+                    generate_embedding=True
+                )
+                saved_count += bulk_result["created"]
+                deduplicated += bulk_result["deduplicated"]
+                errors.extend(r["error"] for r in bulk_result["results"] if r.get("error"))
+                
+                if progress:
+                    progress({
+                        "emails_total": len(message_ids),
+                        "emails_processed": min(start + self.SYNC_CHUNK, len(message_ids)),
+                        "memories_saved": saved_count
+                    })
+            
+            failed_ids = [
+                message_id for message_id, error in fetch_errors.items()
+                if error != self.NOT_FOUND_ERROR
+            ]
+            if history_id and not errors:
+                sync_cursor_service.save(
+                    user_id,
+                    "gmail",
+                    account_id,
+                    str(history_id),
+                    {"email": account_id, "retry_ids": failed_ids}
+                )
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        finally:
+            if on_token_refresh and credentials.token != access_token:
+                on_token_refresh(
+                    credentials.token,
+                    credentials.expiry.replace(tzinfo=timezone.utc) if credentials.expiry else None
+                )
+        
+        return {
+            "success": True,
+            "email": account_id,
+            "incremental": incremental,
+            "history_id": history_id,
+            "emails_fetched": len(message_ids) - len(fetch_errors),
+            "memories_saved": saved_count,
+            "duplicates_skipped": deduplicated,
+            "fetch_errors": fetch_errors if fetch_errors else None,
+            "retries_pending": len(failed_ids),
+            "errors": errors if errors else None,
+            "message": f"Successfully synced {saved_count} emails to memory!"
+        }
+    
+    def fetch_messages(
+        self,
+        service,
+        message_ids: List[str],
+        message_format: str = "full",
+        account: str = ""
+    ) -> Tuple[List[Dict], Dict[str, str]]:
+        """Get many messages with batch HTTP requests, BATCH_SIZE per round trip
+        
+        Returns the messages in input order plus {message_id: error} for the
+        ones that failed (a failed call does not fail its whole batch). Calls
+        the batch endpoint rate limited are retried after a backoff.
+        """
+        message_ids = list(dict.fromkeys(message_ids))
+        fetched = {}
+        errors = {}
+        limited = {}
+        
+        def collect(request_id, response, exception):
+            if exception is None:
+                fetched[request_id] = response
+            elif self._rate_limited(exception):
+                limited[request_id] = exception
+            elif isinstance(exception, HttpError) and exception.resp.status == 404:
+                errors[request_id] = self.NOT_FOUND_ERROR
+            else:
+                errors[request_id] = str(exception)
+        
+        pending = message_ids
+        attempt = 0
+        while pending:
+            for start in range(0, len(pending), self.BATCH_SIZE):
+                chunk = pending[start:start + self.BATCH_SIZE]
+                batch = service.new_batch_http_request(callback=collect)
+                for message_id in chunk:
+                    batch.add(self._get_message_request(service, message_id, message_format), request_id=message_id)
+                self._execute(batch, account, self.QUOTA_UNITS["get"] * len(chunk))
+            
+            if not limited:
+                break
+            
+            last_error = list(limited.values())[-1]
+            delay = rate_limiter.retry_delay(attempt, rate_limiter.observe("gmail", account, 429, last_error.resp))
+            if delay is None:
+                errors.update((message_id, str(error)) for message_id, error in limited.items())
+                break
+            time.sleep(delay)
+            pending, limited = list(limited), {}
+            attempt += 1
+        
+        return [fetched[message_id] for message_id in message_ids if message_id in fetched], errors
+    
+    def _added_since(self, service, account: str, start_history_id: str) -> Tuple[Optional[List[str]], Optional[str]]:
+        """IDs of messages added after start_history_id, and the mailbox's latest historyId
+        
+        Returns (None, None) when the start id is too old for the history API.
+        """
+        message_ids = []
+        history_id = start_history_id
+        page_token = None
+        
+        try:
+            while True:
+                response = self._execute(
+                    service.users().history().list(
+                        userId='me',
+                        startHistoryId=start_history_id,
+                        historyTypes=['messageAdded'],
+                        maxResults=500,
+                        pageToken=page_token
+                    ),
+                    account,
+                    self.QUOTA_UNITS["history"]
+                )
+                history_id = response.get('historyId', history_id)
+                
+                for record in response.get('history', []):
+                    for added in record.get('messagesAdded', []):
+                        message = added.get('message', {})
+                        if not self.SKIPPED_LABELS.intersection(message.get('labelIds', [])):
+                            message_ids.append(message['id'])
+                
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as e:
+            if e.resp.status == 404:
+                return None, None
+            raise
+        
+        return list(dict.fromkeys(message_ids)), history_id
+    
+    def _list_message_ids(self, service, account: str, max_messages: int) -> List[str]:
+        """IDs of the newest max_messages messages"""
+        message_ids = []
+        page_token = None
+        
+        while len(message_ids) < max_messages:
+            response = self._execute(
+                service.users().messages().list(
+                    userId='me',
+                    maxResults=min(500, max_messages - len(message_ids)),
+                    pageToken=page_token
+                ),
+                account,
+                self.QUOTA_UNITS["list"]
+            )
+            message_ids.extend(msg['id'] for msg in response.get('messages', []))
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return message_ids[:max_messages]
+    
+    def _execute(self, request, account: str, units: int):
+        """Execute an API (or batch) request within the account's quota, retrying when rate limited"""
+        attempt = 0
+        while True:
+            rate_limiter.acquire("gmail", account, units)
+            try:
+                response = request.execute()
+            except HttpError as e:
+                if not self._rate_limited(e):
+                    raise
+                delay = rate_limiter.retry_delay(attempt, rate_limiter.observe("gmail", account, 429, e.resp))
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            rate_limiter.observe("gmail", account, 200)
+            return response
+    
+    @staticmethod
+    def _rate_limited(error: Exception) -> bool:
+        """A 429, or the 403 Gmail answers with (user)RateLimitExceeded"""
+        if not isinstance(error, HttpError):
+            return False
+        if error.resp.status == 429:
+            return True
+        return error.resp.status == 403 and b"ratelimitexceeded" in (error.content or b"").lower()
+    
+    def _memory_item(self, message: Dict) -> Dict:
+        email = self._parse_email(message)
+        body = (email["body"] or email["snippet"])[:self.MAX_BODY_CHARS]
+        internal_date = message.get('internalDate')
+        
+        return {
+            "content": f"Email: {email['subject']}\nFrom: {email['from']}\nDate: {email['date']}\n\n{body}",
+            "source": "gmail",
+            "category": "email",
+            "meta_data": {
+                "thread_id": email["thread_id"],
+                "from": email["from"],
+                "subject": email["subject"],
+                "labels": email["labels"]
+            },
+            "original_post_id": email["id"],
+            "original_url": f"https://mail.google.com/mail/u/0/#all/{email['id']}",
+            "source_timestamp": datetime.utcfromtimestamp(int(internal_date) / 1000) if internal_date else None
+        }
+    
+    def _get_message_request(self, service, message_id: str, message_format: str):
+        if message_format == "metadata":
+            return service.users().messages().get(
+                userId='me',
+                id=message_id,
+                format='metadata',
+                metadataHeaders=self.METADATA_HEADERS
+            )
+        return service.users().messages().get(userId='me', id=message_id, format=message_format)
     
     def _parse_email(self, message: Dict) -> Dict:
         """Parse email message data"""
@@ -1,6 +1,7 @@
-import requests
 from typing import Dict, Optional
 from app.config import settings
+from app.utils.http_client import http_clients
+from app.utils.rate_limiter import rate_limiter
 
 
 class LinkedInService:
@@ -10,7 +11,7 @@ class LinkedInService:
         self.client_secret = settings.LINKEDIN_CLIENT_SECRET
         self.redirect_uri = "http://localhost:8000/oauth/linkedin/callback"
         self.base_url = "https://api.linkedin.com/v2"
-        
+    
     def get_oauth_url(self, state: str = "random_state_string") -> str:
         """Generate LinkedIn OAuth authorization URL"""
         scopes = "openid profile email"
@@ -24,7 +25,19 @@ class LinkedInService:
         )
         return auth_url
     
-    def exchange_code_for_token(self, code: str) -> Dict:
+    async def _get(self, access_token: str, url: str, headers: Dict, params: Optional[Dict] = None):
+        """GET through the token's rate-limit bucket (rate-limited calls are retried)"""
+        return await rate_limiter.arequest(
+            http_clients.get("linkedin"),
+            "linkedin",
+            rate_limiter.account_key(access_token),
+            "GET",
+            url,
+            headers=headers,
+            params=params
+        )
+    
+    async def exchange_code_for_token(self, code: str) -> Dict:
         """Exchange authorization code for access token"""
         try:
             token_url = "https://www.linkedin.com/oauth/v2/accessToken"
@@ -36,7 +49,7 @@ class LinkedInService:
                 "client_secret": self.client_secret
             }
             
-            response = requests.post(token_url, data=data)
+            response = await http_clients.get("linkedin").post(token_url, data=data)
             
             if response.status_code == 200:
                 token_data = response.json()
@@ -54,7 +67,7 @@ class LinkedInService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def get_user_profile(self, access_token: str) -> Dict:
+    async def get_user_profile(self, access_token: str) -> Dict:
         """Get user's LinkedIn profile information using OpenID Connect"""
         try:
             headers = {
@@ -64,7 +77,7 @@ class LinkedInService:
             
             # Use OpenID Connect userinfo endpoint
             profile_url = "https://api.linkedin.com/v2/userinfo"
-            profile_response = requests.get(profile_url, headers=headers)
+            profile_response = await self._get(access_token, profile_url, headers)
             
             if profile_response.status_code != 200:
                 return {
@@ -90,7 +103,7 @@ class LinkedInService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def get_user_posts(self, access_token: str, count: int = 10) -> Dict:
+    async def get_user_posts(self, access_token: str, count: int = 10) -> Dict:
         """Get user's LinkedIn posts"""
         try:
             headers = {
@@ -101,7 +114,7 @@ class LinkedInService:
             
             # First get user's person URN
             profile_url = f"{self.base_url}/me"
-            profile_response = requests.get(profile_url, headers=headers)
+            profile_response = await self._get(access_token, profile_url, headers)
             
             if profile_response.status_code != 200:
                 return {"success": False, "error": "Could not get user profile"}
@@ -117,7 +130,7 @@ class LinkedInService:
                 "count": count
             }
             
-            posts_response = requests.get(posts_url, headers=headers, params=params)
+            posts_response = await self._get(access_token, posts_url, headers, params)
             
             if posts_response.status_code == 200:
                 posts_data = posts_response.json()
@@ -149,7 +162,68 @@ class LinkedInService:
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
+    
+    async def sync_to_memory(self, access_token: str, user_id: int) -> Dict:
+        """Save the user's LinkedIn profile as a memory
+        
+        The memory is keyed by the profile's sub, so later syncs (scheduled
+        ones included) update it in place instead of adding another.
+        """
+        from app.services.async_memory_service import async_memory_service
+        
+        # Fetch profile
+        result = await self.get_user_profile(access_token)
+        
+        if not result.get("success"):
+            return result
+        
+        profile = result.get("data", {})
+        if not profile.get("sub"):
+            return {"success": False, "error": "LinkedIn profile has no sub"}
+        
+        # Create structured content
+        content = f"""LinkedIn Profile:
+Name: {profile.get('name', 'N/A')}
+Email: {profile.get('email', 'N/A')}
+Profile: {profile.get('sub', 'N/A')}
+"""
 
+        item = {
+            "content": content,
+            "source": "linkedin",
+            "category": "profile",
+            "meta_data": profile,
+            "original_post_id": profile["sub"],
+            "original_url": "https://www.linkedin.com/in/me"
+        }
+        
+        try:
+            stored = None
+            for record in await async_memory_service.list_source_records(user_id, "linkedin"):
+                if record["original_post_id"] == profile["sub"]:
+                    # Newest wins
+                    stored = record
+            
+            if stored is None:
+                memory_result = await async_memory_service.create_memory(user_id=user_id, **item)
+            else:
+                update_result = await async_memory_service.update_memories_bulk(
+                    user_id=user_id,
+                    items=[{**item, "memory_id": stored["memory_id"], "vector_id": stored["vector_id"], "reembed": False}]
+                )
+                memory_result = update_result["results"][0]
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        saved = bool(memory_result.get("success"))
+        return {
+            "success": saved,
+            "profile_saved": saved,
+            "profile_updated": saved and stored is not None,
+            "memory_id": memory_result.get("memory_id"),
+            "error": memory_result.get("error"),
+            "message": "LinkedIn profile synced to memory!" if saved else "LinkedIn profile was not saved"
+        }
 
 # Singleton instance
 linkedin_service = LinkedInService()
@@ -0,0 +1,93 @@
+import re
+import zlib
+import numpy as np
+from functools import lru_cache
+from itertools import chain
+from typing import List, Tuple
+
+
+@lru_cache(maxsize=65536)
+def _word_hashes(word: str) -> Tuple[int, Tuple[int, ...]]:
+    """CRC32 of a word and of its character trigrams (vocabularies repeat, so cache)"""
+    padded = f"<{word}>"
+    trigrams = tuple(
+        zlib.crc32(padded[i:i + 3].encode("utf-8"))
+        for i in range(len(padded) - 2)
+    )
+    return zlib.crc32(word.encode("utf-8")), trigrams
+
+
+class HashingEmbedder:
+    """Offline embedder: signed feature hashing of word and character n-grams
+    
+    Each text is turned into word unigrams, word bigrams and character trigrams,
+    hashed into a fixed number of buckets (the sign comes from the top hash bit
+    to cancel collisions on average), log-scaled and L2 normalised. Everything
+    after tokenisation is vectorised over the whole batch with NumPy, so it
+    needs no network, no model files and no API key.
+    """
+    
+    TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+    
+    # Relative weight of each feature family
+    WORD_WEIGHT = 1.0
+    BIGRAM_WEIGHT = 0.7
+    CHAR_WEIGHT = 0.3
+    
+    # Seeds that keep the three feature families in different hash spaces
+    BIGRAM_SEED = np.uint64(0x9E3779B1)
+    CHAR_SEED = np.uint32(0x85EBCA6B)
+    
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+    
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), dimension) float32 matrix"""
+        words = []
+        word_rows = []
+        for row, text in enumerate(texts):
+            tokens = self.TOKEN_PATTERN.findall(text.lower())
+            words.extend(tokens)
+            word_rows.extend([row] * len(tokens))
+        
+        features = [_word_hashes(word) for word in words]
+        word_rows = np.asarray(word_rows, dtype=np.int64)
+        
+        # Unigrams
+        word_h = np.fromiter((h for h, _ in features), dtype=np.uint32, count=len(features))
+        
+        # Bigrams: combine neighbouring word hashes that belong to the same text
+        same_text = word_rows[1:] == word_rows[:-1]
+        bigram_h = (
+            (word_h[:-1].astype(np.uint64) * self.BIGRAM_SEED) ^ word_h[1:].astype(np.uint64)
+        ).astype(np.uint32)[same_text]
+        bigram_rows = word_rows[1:][same_text]
+        
+        # Character trigrams
+        lengths = np.fromiter((len(t) for _, t in features), dtype=np.int64, count=len(features))
+        char_h = np.fromiter(chain.from_iterable(t for _, t in features), dtype=np.uint32, count=int(lengths.sum()))
+        char_h ^= self.CHAR_SEED
+        char_rows = np.repeat(word_rows, lengths)
+        
+        hashes = np.concatenate([word_h, bigram_h, char_h])
+        rows = np.concatenate([word_rows, bigram_rows, char_rows])
+        weights = np.concatenate([
+            np.full(len(word_h), self.WORD_WEIGHT),
+            np.full(len(bigram_h), self.BIGRAM_WEIGHT),
+            np.full(len(char_h), self.CHAR_WEIGHT)
+        ])
+        
+        signs = np.where(hashes & np.uint32(1 << 31), -1.0, 1.0)
+        cells = rows * self.dimension + (hashes % self.dimension)
+        matrix = np.bincount(
+            cells,
+            weights=signs * weights,
+            minlength=len(texts) * self.dimension
+        ).reshape(len(texts), self.dimension)
+        
+        # Sublinear term frequency, then unit length so cosine == dot product
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        
+        return (matrix / norms).astype(np.float32)
@@ -1,38 +1,671 @@
+import base64
+import calendar
+import json
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict, Optional
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PayloadSchemaType, HnswConfigDiff,
+    Filter, IsEmptyCondition, PayloadField, SetPayload, SetPayloadOperation
+)
+from sqlalchemy import insert, select, update, delete, func, tuple_
+from typing import List, Dict, Optional, Tuple
 from uuid import uuid4
 from app.config import settings
 from app.services.embedding_service import embedding_service
+from app.services.embedding_worker import embedding_worker
+from app.services.search_cache import search_cache
+from app.services.dedup_service import dedup_service
+from app.services.vector_store import create_vector_client
 from app.database import SessionLocal
 from app.models.memory import Memory
+from app.models.memory_count import MemoryCount
 from datetime import datetime
 
 
-class MemoryService:
+class MemoryServiceBase:
+    """Helpers shared by the sync MemoryService and the AsyncMemoryService"""
+    
+    # Points per Qdrant upsert request in bulk writes
+    UPSERT_BATCH_SIZE = 256
+    
+    collection_name = settings.QDRANT_COLLECTION_NAME
+    
+    # Payload fields used in search filters; source_timestamp is stored as epoch seconds
+    PAYLOAD_INDEXES = {
+        "user_id": PayloadSchemaType.INTEGER,
+        "source": PayloadSchemaType.KEYWORD,
+        "category": PayloadSchemaType.KEYWORD,
+        "source_timestamp": PayloadSchemaType.INTEGER
+    }
+    
+    # Reciprocal-rank fusion constant and per-retriever candidates for hybrid search
+    RRF_K = 60
+    HYBRID_OVERFETCH = 3
+    
+    def _vector_params(self) -> VectorParams:
+        return VectorParams(size=embedding_service.get_embedding_dimension(), distance=Distance.COSINE)
+    
+    def _is_async_mode(self, embedding_mode: Optional[str]) -> bool:
+        return (embedding_mode or settings.EMBEDDING_MODE) == "async"
+    
+    def _embedding_enabled(self) -> bool:
+        """Whether an API key is configured for the embedding provider"""
+        if settings.EMBEDDING_PROVIDER == "local":
+            return True
+        api_key = settings.COHERE_API_KEY if settings.EMBEDDING_PROVIDER == "cohere" else settings.OPENAI_API_KEY
+        return bool(api_key) and not api_key.startswith("your-")
+    
+    def _build_payload(
+        self,
+        user_id: int,
+        content: str,
+        source: str,
+        category: Optional[str],
+        original_post_id: Optional[str],
+        original_url: Optional[str],
+        source_timestamp: Optional[datetime] = None
+    ) -> Dict:
+        """Qdrant payload stored alongside each vector"""
+        return {
+            "user_id": user_id,
+            "content": content,
+            "source": source,
+            "category": category,
+            "original_post_id": original_post_id,
+            "original_url": original_url,
+            "source_timestamp": self._epoch_seconds(source_timestamp)
+        }
+    
+    @staticmethod
+    def _epoch_seconds(timestamp: Optional[datetime]) -> Optional[int]:
+        # Naive datetimes are UTC throughout the app (datetime.utcnow())
+        return calendar.timegm(timestamp.utctimetuple()) if timestamp else None
+    
+    def _search_filter(self, user_id: Optional[int], source_filter: Optional[str]) -> Optional[Dict]:
+        if not user_id and not source_filter:
+            return None
+        
+        must_conditions = []
+        if user_id:
+            must_conditions.append({"key": "user_id", "match": {"value": user_id}})
+        if source_filter:
+            must_conditions.append({"key": "source", "match": {"value": source_filter}})
+        
+        return {"must": must_conditions}
+    
+    def _format_hit(self, result) -> Dict:
+        return {
+            "id": result.id,
+            "score": result.score,
+            "content": result.payload.get("content", ""),
+            "source": result.payload.get("source", ""),
+            "category": result.payload.get("category", ""),
+            "original_url": result.payload.get("original_url")
+        }
+    
+    def _lexical_statement(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        source_filter: Optional[str]
+    ):
+        """Full-text query over the generated content_tsv column (GIN indexed)"""
+        tsquery = func.websearch_to_tsquery("english", query)
+        rank = func.ts_rank_cd(Memory.content_tsv, tsquery)
+        
+        statement = select(Memory, rank.label("rank")).where(Memory.content_tsv.op("@@")(tsquery))
+        if user_id:
+            statement = statement.where(Memory.user_id == user_id)
+        if source_filter:
+            statement = statement.where(Memory.source == source_filter)
+        
+        return statement.order_by(rank.desc(), Memory.id.desc()).limit(limit)
+    
+    def _format_lexical_hit(self, memory: Memory, rank: float) -> Dict:
+        # "id" matches vector hits (the point id) so hybrid fusion can join on it
+        return {
+            "id": memory.vector_id or memory.id,
+            "memory_id": memory.id,
+            "score": float(rank),
+            "content": memory.content,
+            "source": memory.source,
+            "category": memory.category,
+            "original_url": memory.original_url
+        }
+    
+    def _fuse_results(self, ranked_lists: List[Tuple[str, List[Dict]]], limit: int) -> List[Dict]:
+        """Reciprocal-rank fusion: score = sum of 1 / (RRF_K + rank) over the lists a hit is in"""
+        fused = {}
+        for name, hits in ranked_lists:
+            for rank, hit in enumerate(hits, start=1):
+                entry = fused.setdefault(str(hit["id"]), {"score": 0.0, "matched_by": []})
+                entry.update({key: value for key, value in hit.items() if key != "score"})
+                entry["score"] += 1.0 / (self.RRF_K + rank)
+                entry["matched_by"].append(name)
+        
+        return sorted(fused.values(), key=lambda hit: hit["score"], reverse=True)[:limit]
+    
+    def _search_response(self, query: str, mode: str, memories: List[Dict]) -> Dict:
+        return {
+            "success": True,
+            "query": query,
+            "mode": mode,
+            "count": len(memories),
+            "results": memories
+        }
+    
+    def _serialize_memory(self, memory: Memory) -> Dict:
+        return {
+            "id": memory.id,
+            "content": memory.content,
+            "source": memory.source,
+            "category": memory.category,
+            "created_at": memory.created_at.isoformat(),
+            "source_timestamp": memory.source_timestamp.isoformat() if memory.source_timestamp else None,
+            "original_url": memory.original_url,
+            "meta_data": memory.meta_data,
+            "vector_id": memory.vector_id,
+            "embedding_status": memory.embedding_status
+        }
+    
+    def _serialize_list_item(self, memory: Memory) -> Dict:
+        return {
+            "id": memory.id,
+            "content": memory.content[:200] + "..." if len(memory.content) > 200 else memory.content,
+            "source": memory.source,
+            "category": memory.category,
+            "created_at": memory.created_at.isoformat()
+        }
+    
+    # Listing
+    
+    def _list_statement(
+        self,
+        user_id: int,
+        source: Optional[str],
+        limit: int,
+        offset: int,
+        cursor: Optional[str]
+    ):
+        """Newest-first page; a cursor seeks past the last row seen instead of using OFFSET"""
+        statement = select(Memory).where(Memory.user_id == user_id)
+        if source:
+            statement = statement.where(Memory.source == source)
+        
+        if cursor:
+            created_at, memory_id = self._decode_cursor(cursor)
+            statement = statement.where(tuple_(Memory.created_at, Memory.id) < tuple_(created_at, memory_id))
+        elif offset:
+            statement = statement.offset(offset)
+        
+        # One extra row tells whether there is a next page
+        return statement.order_by(Memory.created_at.desc(), Memory.id.desc()).limit(limit + 1)
+    
+    def _total_statement(self, user_id: int, source: Optional[str], total_mode: str):
+        """Total from the trigger-maintained memory_counts table, or an exact COUNT(*)"""
+        if total_mode == "exact":
+            statement = select(func.count()).select_from(Memory).where(Memory.user_id == user_id)
+            if source:
+                statement = statement.where(Memory.source == source)
+            return statement
+        
+        statement = select(func.coalesce(func.sum(MemoryCount.count), 0)).where(MemoryCount.user_id == user_id)
+        if source:
+            statement = statement.where(MemoryCount.source == source)
+        return statement
+    
+    def _list_page(self, memories: List[Memory], limit: int, total: Optional[int]) -> Dict:
+        page = memories[:limit]
+        return {
+            "success": True,
+            "total": total,
+            "count": len(page),
+            "next_cursor": self._encode_cursor(page[-1]) if len(memories) > limit else None,
+            "memories": [self._serialize_list_item(m) for m in page]
+        }
+    
+    @staticmethod
+    def _encode_cursor(memory: Memory) -> str:
+        raw = json.dumps([memory.created_at.isoformat(), memory.id])
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            created_at, memory_id = json.loads(raw)
+            return datetime.fromisoformat(created_at), int(memory_id)
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+    
+    def _preview(self, content: str) -> str:
+        return content[:100] + "..." if len(content) > 100 else content
+    
+    # Bulk ingestion building blocks
+    
+    def _validate_items(self, items: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        """Per-item result stubs plus the indexes of items that can be stored"""
+        results = [{"index": i, "success": False} for i in range(len(items))]
+        valid = []
+        
+        for i, item in enumerate(items):
+            if not item.get("content") or not item.get("source"):
+                results[i]["error"] = "content and source are required"
+            else:
+                valid.append(i)
+        
+        return results, valid
+    
+    def _signatures(self, items: List[Dict], indexes: List[int]) -> Dict[int, int]:
+        """SimHash of each item's content, keyed by item index"""
+        return {i: dedup_service.simhash(items[i]["content"]) for i in indexes}
+    
+    def _duplicate_candidates_statement(self, user_id: int, signatures: Dict[int, int]):
+        """The user's memories sharing a SimHash band with any of the signatures"""
+        return select(Memory.id, Memory.content_simhash).where(
+            Memory.user_id == user_id,
+            dedup_service.candidate_clause(signatures.values())
+        )
+    
+    def _duplicate_response(self, memory_id: int, content: str) -> Dict:
+        return {
+            "success": True,
+            "deduplicated": True,
+            "memory_id": memory_id,
+            "duplicate_of": memory_id,
+            "vector_id": None,
+            "embedding_generated": False,
+            "content_preview": self._preview(content)
+        }
+    
+    def _mark_duplicates(self, results: List[Dict], items: List[Dict], duplicates: Dict[int, Tuple[str, int]]):
+        """Point skipped items at the memory they duplicate (an existing row or a stored batch item)"""
+        for i, (kind, key) in duplicates.items():
+            memory_id = key if kind == "memory" else results[key].get("memory_id")
+            if memory_id is None:
+                results[i]["error"] = results[key].get("error", "duplicate of an item that was not stored")
+                continue
+            results[i].update(self._duplicate_response(memory_id, items[i]["content"]))
+    
+    def _embedding_slices(self, indexes: List[int]) -> List[List[int]]:
+        """Split item indexes into provider-sized embedding requests"""
+        batch_size = embedding_service.get_max_batch_size()
+        return [indexes[start:start + batch_size] for start in range(0, len(indexes), batch_size)]
+    
+    def _make_points(
+        self,
+        user_id: int,
+        items: List[Dict],
+        indexes: List[int],
+        embeddings: List[List[float]],
+        point_ids: Optional[Dict[int, str]] = None
+    ) -> List[Tuple[int, PointStruct]]:
+        """Points for embedded items; ids found in point_ids are overwritten in place"""
+        point_ids = point_ids or {}
+        now = datetime.utcnow()
+        return [
+            (i, PointStruct(
+                id=point_ids.get(i) or str(uuid4()),
+                vector=embedding,
+                payload=self._build_payload(
+                    user_id,
+                    items[i]["content"],
+                    items[i]["source"],
+                    items[i].get("category"),
+                    items[i].get("original_post_id"),
+                    items[i].get("original_url"),
+                    items[i].get("source_timestamp") or now
+                )
+            ))
+            for i, embedding in zip(indexes, embeddings)
+        ]
+    
+    def _upsert_chunks(self, points: List[Tuple[int, PointStruct]]) -> List[List[Tuple[int, PointStruct]]]:
+        size = self.UPSERT_BATCH_SIZE
+        return [points[start:start + size] for start in range(0, len(points), size)]
+    
+    def _mark_embedding_error(self, results: List[Dict], indexes: List[int], error: Exception):
+        print(f"Embedding generation skipped: {str(error)}")
+        for i in indexes:
+            results[i]["embedding_error"] = str(error)
+    
+    def _item_statuses(
+        self,
+        valid: List[int],
+        vector_ids: Dict[int, str],
+        embed: bool,
+        queue_embeddings: bool
+    ) -> Dict[int, str]:
+        statuses = {}
+        for i in valid:
+            if i in vector_ids:
+                statuses[i] = "ready"
+            elif queue_embeddings:
+                statuses[i] = "pending"
+            elif embed:
+                statuses[i] = "failed"
+            else:
+                statuses[i] = "skipped"
+        return statuses
+    
+    def _memory_rows(
+        self,
+        user_id: int,
+        items: List[Dict],
+        valid: List[int],
+        vector_ids: Dict[int, str],
+        statuses: Dict[int, str],
+        signatures: Dict[int, int]
+    ) -> List[Dict]:
+        """Parameter sets for the multi-row INSERT"""
+        now = datetime.utcnow()
+        return [
+            {
+                "user_id": user_id,
+                "content": items[i]["content"],
+                "source": items[i]["source"],
+                "category": items[i].get("category") or "general",
+                "meta_data": items[i].get("meta_data") or {},
+                "original_post_id": items[i].get("original_post_id"),
+                "original_url": items[i].get("original_url"),
+                "vector_id": vector_ids.get(i),
+                "embedding_status": statuses[i],
+                "content_simhash": signatures[i],
+                "source_timestamp": items[i].get("source_timestamp") or now
+            }
+            for i in valid
+        ]
+    
+    def _bulk_insert_statement(self):
+        return insert(Memory).returning(Memory.id, sort_by_parameter_order=True)
+    
+    def _fill_bulk_results(
+        self,
+        results: List[Dict],
+        items: List[Dict],
+        valid: List[int],
+        memory_ids: List[int],
+        vector_ids: Dict[int, str],
+        statuses: Dict[int, str]
+    ):
+        for i, memory_id in zip(valid, memory_ids):
+            vector_id = vector_ids.get(i)
+            results[i].update({
+                "success": True,
+                "memory_id": memory_id,
+                "vector_id": vector_id,
+                "embedding_generated": vector_id is not None,
+                "embedding_status": statuses[i],
+                "content_preview": self._preview(items[i]["content"])
+            })
+    
+    def _bulk_summary(self, results: List[Dict], items: List[Dict], duplicates: Dict[int, Tuple[str, int]]) -> Dict:
+        self._mark_duplicates(results, items, duplicates)
+        deduplicated = sum(1 for r in results if r.get("deduplicated"))
+        created = sum(1 for r in results if r["success"]) - deduplicated
+        return {
+            "success": True,
+            "total": len(results),
+            "created": created,
+            "deduplicated": deduplicated,
+            "failed": len(results) - created - deduplicated,
+            "embeddings_generated": sum(1 for r in results if r.get("embedding_generated")),
+            "results": results
+        }
+    
+    # Re-sync building blocks: memories keyed by their source's own id
+    
+    def _source_records_statement(self, user_id: int, source: str):
+        return select(
+            Memory.id, Memory.original_post_id, Memory.vector_id, Memory.meta_data
+        ).where(
+            Memory.user_id == user_id,
+            Memory.source == source,
+            Memory.original_post_id.isnot(None)
+        ).order_by(Memory.id)
+    
+    def _serialize_source_record(self, row) -> Dict:
+        return {
+            "memory_id": row.id,
+            "original_post_id": row.original_post_id,
+            "vector_id": row.vector_id,
+            "meta_data": row.meta_data or {}
+        }
+    
+    def _validate_updates(self, items: List[Dict]) -> Tuple[List[Dict], List[int]]:
+        results, valid = self._validate_items(items)
+        for i, item in enumerate(items):
+            results[i]["memory_id"] = item.get("memory_id")
+            if i in valid and not item.get("memory_id"):
+                results[i]["error"] = "memory_id is required"
+        return results, [i for i in valid if items[i].get("memory_id")]
+    
+    def _update_rows(
+        self,
+        items: List[Dict],
+        valid: List[int],
+        vector_ids: Dict[int, str],
+        statuses: Dict[int, str],
+        signatures: Dict[int, int]
+    ) -> List[Dict]:
+        """Parameter sets for the bulk UPDATE by primary key
+        
+        Items without a status kept their vector, so their vector_id and
+        embedding_status are left alone. A queued item keeps its vector_id: the
+        worker overwrites that point once the new embedding is ready.
+        """
+        rows = []
+        for i in valid:
+            item = items[i]
+            row = {
+                "id": item["memory_id"],
+                "content": item["content"],
+                "category": item.get("category") or "general",
+                "meta_data": item.get("meta_data") or {},
+                "original_url": item.get("original_url"),
+                "content_simhash": signatures[i]
+            }
+            if item.get("source_timestamp"):
+                row["source_timestamp"] = item["source_timestamp"]
+            if i in statuses:
+                kept = item.get("vector_id") if statuses[i] == "pending" else None
+                row["vector_id"] = vector_ids.get(i, kept)
+                row["embedding_status"] = statuses[i]
+            rows.append(row)
+        return rows
+    
+    def _stale_vectors(self, items: List[Dict], statuses: Dict[int, str]) -> List[str]:
+        """Old points of updated items that could not be re-embedded"""
+        return [
+            items[i]["vector_id"]
+            for i, status in statuses.items()
+            if status in ("failed", "skipped") and items[i].get("vector_id")
+        ]
+    
+    def _payload_operations(self, user_id: int, items: List[Dict], indexes: List[int]) -> List[SetPayloadOperation]:
+        """Refresh the payload of points whose vector is kept as is"""
+        operations = []
+        for i in indexes:
+            item = items[i]
+            payload = self._build_payload(
+                user_id,
+                item["content"],
+                item["source"],
+                item.get("category") or "general",
+                item.get("original_post_id"),
+                item.get("original_url"),
+                item.get("source_timestamp")
+            )
+            if payload["source_timestamp"] is None:
+                del payload["source_timestamp"]
+            operations.append(SetPayloadOperation(set_payload=SetPayload(
+                payload=payload,
+                points=[item["vector_id"]]
+            )))
+        return operations
+    
+    def _bulk_update_statement(self, user_id: int):
+        # Rows are matched by primary key; the user_id check rides along in the WHERE
+        return update(Memory).where(Memory.user_id == user_id).execution_options(synchronize_session=None)
+    
+    def _delete_memories_statement(self, user_id: int, memory_ids: List[int]):
+        return delete(Memory).where(
+            Memory.user_id == user_id,
+            Memory.id.in_(memory_ids)
+        ).returning(Memory.vector_id)
+    
+    def _mark_payload_error(self, results: List[Dict], indexes: List[int], error: Exception):
+        """Flag updates whose row was written but whose point kept its old payload"""
+        print(f"Qdrant payload update failed: {str(error)}")
+        for i in indexes:
+            results[i]["payload_error"] = str(error)
+    
+    def _fill_update_results(
+        self,
+        results: List[Dict],
+        items: List[Dict],
+        valid: List[int],
+        rows: List[Dict],
+        vector_ids: Dict[int, str]
+    ):
+        for i, row in zip(valid, rows):
+            results[i].update({
+                "success": True,
+                "vector_id": row.get("vector_id", items[i].get("vector_id")),
+                "embedding_generated": i in vector_ids,
+                "embedding_status": row.get("embedding_status"),
+                "content_preview": self._preview(items[i]["content"])
+            })
+    
+    def _update_summary(self, results: List[Dict]) -> Dict:
+        updated = sum(1 for r in results if r["success"])
+        return {
+            "success": True,
+            "total": len(results),
+            "updated": updated,
+            "failed": len(results) - updated,
+            "embeddings_generated": sum(1 for r in results if r.get("embedding_generated")),
+            "payload_errors": sum(1 for r in results if r.get("payload_error")),
+            "results": results
+        }
+
+
+class MemoryService(MemoryServiceBase):
     """Service for managing memories in PostgreSQL and Qdrant"""
     
     def __init__(self):
-        self.qdrant_client = QdrantClient(url=settings.QDRANT_URL)
-        self.collection_name = settings.QDRANT_COLLECTION_NAME
+        self.qdrant_client = create_vector_client()
         self._ensure_collection_exists()
     
     def _ensure_collection_exists(self):
-        """Create Qdrant collection if it doesn't exist"""
+        """Create the Qdrant collection if needed and bring its indexes up to date"""
         try:
             collections = self.qdrant_client.get_collections().collections
             collection_names = [c.name for c in collections]
             
             if self.collection_name not in collection_names:
-                dimension = embedding_service.get_embedding_dimension()
                 self.qdrant_client.create_collection(
                     collection_name=self.collection_name,
-                    vectors_config=VectorParams(size=dimension, distance=Distance.COSINE)
+                    vectors_config=self._vector_params(),
+                    hnsw_config=self._hnsw_config()
                 )
                 print(f"Created Qdrant collection: {self.collection_name}")
+            
+            self._migrate_collection()
         except Exception as e:
             print(f"Error ensuring collection exists: {str(e)}")
     
+    def _hnsw_config(self) -> Optional[HnswConfigDiff]:
+        """Multitenant HNSW: per-user subgraphs (payload_m) instead of one global graph (m=0)
+        
+        Every search is scoped to a user_id, so the global graph is never needed.
+        """
+        if not settings.QDRANT_TENANT_INDEXING:
+            return None
+        return HnswConfigDiff(payload_m=16, m=0)
+    
+    def _migrate_collection(self):
+        """Idempotently add missing payload indexes and the tenant HNSW config"""
+        if not isinstance(self.qdrant_client, QdrantClient):
+            return  # the embedded store keeps its own inverted indexes
+        
+        info = self.qdrant_client.get_collection(self.collection_name)
+        existing = info.payload_schema or {}
+        
+        for field_name, schema in self.PAYLOAD_INDEXES.items():
+            if field_name not in existing:
+                self.qdrant_client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=field_name,
+                    field_schema=schema
+                )
+                print(f"Created Qdrant payload index: {field_name}")
+        
+        hnsw_config = self._hnsw_config()
+        current = info.config.hnsw_config
+        if hnsw_config and (current.m, current.payload_m) != (hnsw_config.m, hnsw_config.payload_m):
+            self.qdrant_client.update_collection(
+                collection_name=self.collection_name,
+                hnsw_config=hnsw_config
+            )
+            print("Switched Qdrant collection to per-user HNSW indexing")
+    
+    def backfill_payload_timestamps(self, batch_size: int = 256) -> int:
+        """Add source_timestamp to points written before it was part of the payload
+        
+        Only points still missing the field are visited, so re-running is cheap.
+        Returns the number of points updated.
+        """
+        if not isinstance(self.qdrant_client, QdrantClient):
+            return 0
+        
+        missing = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key="source_timestamp"))])
+        updated = 0
+        offset = None
+        
+        while True:
+            points, offset = self.qdrant_client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=missing,
+                limit=batch_size,
+                offset=offset,
+                with_payload=False
+            )
+            if not points:
+                break
+            
+            db = SessionLocal()
+            try:
+                rows = (
+                    db.query(Memory.vector_id, Memory.source_timestamp, Memory.created_at)
+                    .filter(Memory.vector_id.in_([str(point.id) for point in points]))
+                    .all()
+                )
+            finally:
+                db.close()
+            
+            operations = [
+                SetPayloadOperation(set_payload=SetPayload(
+                    payload={"source_timestamp": self._epoch_seconds(row.source_timestamp or row.created_at)},
+                    points=[row.vector_id]
+                ))
+                for row in rows
+                if row.source_timestamp or row.created_at
+            ]
+            if operations:
+                self.qdrant_client.batch_update_points(
+                    collection_name=self.collection_name,
+                    update_operations=operations
+                )
+                updated += len(operations)
+            
+            if offset is None:
+                break
+        
+        if updated:
+            print(f"Backfilled source_timestamp on {updated} Qdrant points")
+        return updated
+    
     def create_memory(
         self,
         user_id: int,
@@ -43,42 +676,56 @@ class MemoryService:
         original_post_id: Optional[str] = None,
         original_url: Optional[str] = None,
         source_timestamp: Optional[datetime] = None,
-        generate_embedding: bool = False
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
     ) -> Dict:
-        """Create a new memory (embeddings optional)"""
+        """Create a new memory (embeddings optional)
+        
+        With embedding_mode "async" (or EMBEDDING_MODE=async) the row is committed
+        as pending and the embedding worker fills in the vector later. A near-
+        duplicate of an existing memory is not stored; the response then has
+        deduplicated=True and the id of that memory.
+        """
         try:
             db = SessionLocal()
             
+            signature = dedup_service.simhash(content)
+            duplicates = self._find_duplicates(user_id, {0: signature})
+            if duplicates:
+                return self._duplicate_response(duplicates[0][1], content)
+            
+            source_timestamp = source_timestamp or datetime.utcnow()
             vector_id = None
+            embedding_status = "skipped"
             
             # Only generate embedding if requested AND API key is configured
-            if generate_embedding:
-                api_key = settings.COHERE_API_KEY if settings.EMBEDDING_PROVIDER == "cohere" else settings.OPENAI_API_KEY
-                if api_key and not api_key.startswith("your-"):
-                    try:
-                        embedding = embedding_service.generate_embedding(content)
-                        vector_id = str(uuid4())
-                        
-                        # Store in Qdrant
-                        self.qdrant_client.upsert(
-                            collection_name=self.collection_name,
-                            points=[
-                                PointStruct(
-                                    id=vector_id,
-                                    vector=embedding,
-                                    payload={
-                                        "user_id": user_id,
-                                        "content": content,
-                                        "source": source,
-                                        "category": category,
-                                        "original_post_id": original_post_id,
-                                        "original_url": original_url
-                                    }
+            if generate_embedding and self._embedding_enabled():
+                # Async mode: commit now, the embedding worker picks it up
+                embedding_status = "pending"
+            
+            if embedding_status == "pending" and not self._is_async_mode(embedding_mode):
+                try:
+                    embedding = embedding_service.generate_embedding(content)
+                    vector_id = str(uuid4())
+                    
+                    # Store in Qdrant
+                    self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=[
+                            PointStruct(
+                                id=vector_id,
+                                vector=embedding,
+                                payload=self._build_payload(
+                                    user_id, content, source, category, original_post_id, original_url, source_timestamp
                                 )
-                            ]
-                        )
-                    except Exception as e:
-                        print(f"Embedding generation skipped: {str(e)}")
+                            )
+                        ]
+                    )
+                    embedding_status = "ready"
+                except Exception as e:
+                    vector_id = None
+                    embedding_status = "failed"
+                    print(f"Embedding generation skipped: {str(e)}")
             
             # Store in PostgreSQL (always happens)
             memory = Memory(
@@ -90,19 +737,26 @@ class MemoryService:
                 original_post_id=original_post_id,
                 original_url=original_url,
                 vector_id=vector_id,
-                source_timestamp=source_timestamp or datetime.utcnow()
+                embedding_status=embedding_status,
+                content_simhash=signature,
+                source_timestamp=source_timestamp
             )
             
             db.add(memory)
             db.commit()
             db.refresh(memory)
+            search_cache.invalidate([user_id])
+            
+            if embedding_status == "pending":
+                embedding_worker.notify()
             
             return {
                 "success": True,
                 "memory_id": memory.id,
                 "vector_id": vector_id,
                 "embedding_generated": vector_id is not None,
-                "content_preview": content[:100] + "..." if len(content) > 100 else content
+                "embedding_status": embedding_status,
+                "content_preview": self._preview(content)
             }
         except Exception as e:
             db.rollback()
@@ -110,57 +764,394 @@ class MemoryService:
         finally:
             db.close()
     
-    def search_memories(
+    def create_memories_bulk(
         self,
-        query: str,
-        user_id: Optional[int] = None,
-        limit: int = 10,
-        source_filter: Optional[str] = None
+        user_id: int,
+        items: List[Dict],
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
+    ) -> Dict:
+        """Create many memories with batched embeddings, few Qdrant upserts and one INSERT
+        
+        Each item is a dict with the same fields as create_memory (content, source,
+        category, meta_data, original_post_id, original_url, source_timestamp).
+        Results are returned per item, in input order. Near-duplicates (of stored
+        memories or of earlier items) are dropped before any embedding call.
+        """
+        results, valid = self._validate_items(items)
+        
+        signatures = self._signatures(items, valid)
+        duplicates = self._find_duplicates(user_id, signatures)
+        valid = [i for i in valid if i not in duplicates]
+        
+        embed = generate_embedding and bool(valid) and self._embedding_enabled()
+        queue_embeddings = embed and self._is_async_mode(embedding_mode)
+        
+        # Embed in provider-sized slices, then write all points in a few upserts
+        vector_ids = {}
+        if embed and not queue_embeddings:
+            points = []
+            for indexes in self._embedding_slices(valid):
+                try:
+                    embeddings = embedding_service.generate_embeddings_batch(
+                        [items[i]["content"] for i in indexes]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, indexes, e)
+                    continue
+                points.extend(self._make_points(user_id, items, indexes, embeddings))
+            
+            for chunk in self._upsert_chunks(points):
+                try:
+                    self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=[point for _, point in chunk]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, [i for i, _ in chunk], e)
+                    continue
+                vector_ids.update((i, point.id) for i, point in chunk)
+        
+        if not valid:
+            return self._bulk_summary(results, items, duplicates)
+        
+        # Store in PostgreSQL with one multi-row INSERT ... RETURNING
+        statuses = self._item_statuses(valid, vector_ids, embed, queue_embeddings)
+        rows = self._memory_rows(user_id, items, valid, vector_ids, statuses, signatures)
+        
+        db = SessionLocal()
+        try:
+            memory_ids = db.execute(self._bulk_insert_statement(), rows).scalars().all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            self._delete_vectors(list(vector_ids.values()))
+            for i in valid:
+                results[i]["error"] = str(e)
+            return self._bulk_summary(results, items, duplicates)
+        finally:
+            db.close()
+        
+        search_cache.invalidate([user_id])
+        if queue_embeddings:
+            embedding_worker.notify()
+        
+        self._fill_bulk_results(results, items, valid, memory_ids, vector_ids, statuses)
+        return self._bulk_summary(results, items, duplicates)
+    
+    def list_source_records(self, user_id: int, source: str) -> List[Dict]:
+        """memory_id, original_post_id, vector_id and meta_data of a source's memories (oldest first)"""
+        db = SessionLocal()
+        try:
+            rows = db.execute(self._source_records_statement(user_id, source)).all()
+            return [self._serialize_source_record(row) for row in rows]
+        finally:
+            db.close()
+    
+    def update_memories_bulk(
+        self,
+        user_id: int,
+        items: List[Dict],
+        generate_embedding: bool = False,
+        embedding_mode: Optional[str] = None
     ) -> Dict:
-        """Semantic search for memories"""
+        """Rewrite existing memories in place with one bulk UPDATE
+        
+        Items carry the create_memories_bulk fields plus "memory_id" and the
+        memory's current "vector_id". Re-embedded items overwrite their existing
+        Qdrant point; items with "reembed": False keep their vector and only
+        get their payload refreshed.
+        """
+        results, valid = self._validate_updates(items)
+        
+        signatures = self._signatures(items, valid)
+        reembed = [i for i in valid if items[i].get("reembed", True)]
+        kept = [i for i in valid if i not in reembed and items[i].get("vector_id")]
+        
+        embed = generate_embedding and bool(reembed) and self._embedding_enabled()
+        queue_embeddings = embed and self._is_async_mode(embedding_mode)
+        
+        vector_ids = {}
+        if embed and not queue_embeddings:
+            point_ids = {i: items[i].get("vector_id") for i in reembed}
+            points = []
+            for indexes in self._embedding_slices(reembed):
+                try:
+                    embeddings = embedding_service.generate_embeddings_batch(
+                        [items[i]["content"] for i in indexes]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, indexes, e)
+                    continue
+                points.extend(self._make_points(user_id, items, indexes, embeddings, point_ids))
+            
+            for chunk in self._upsert_chunks(points):
+                try:
+                    self.qdrant_client.upsert(
+                        collection_name=self.collection_name,
+                        points=[point for _, point in chunk]
+                    )
+                except Exception as e:
+                    self._mark_embedding_error(results, [i for i, _ in chunk], e)
+                    continue
+                vector_ids.update((i, point.id) for i, point in chunk)
+        
+        if kept:
+            try:
+                self.qdrant_client.batch_update_points(
+                    collection_name=self.collection_name,
+                    update_operations=self._payload_operations(user_id, items, kept)
+                )
+            except Exception as e:
+                self._mark_payload_error(results, kept, e)
+        
+        if not valid:
+            return self._update_summary(results)
+        
+        statuses = self._item_statuses(reembed, vector_ids, embed, queue_embeddings)
+        rows = self._update_rows(items, valid, vector_ids, statuses, signatures)
+        
+        db = SessionLocal()
         try:
-            # Generate query embedding
-            query_embedding = embedding_service.generate_embedding(query)
-            
-            # Build filter
-            search_filter = None
-            if user_id or source_filter:
-                must_conditions = []
-                if user_id:
-                    must_conditions.append({"key": "user_id", "match": {"value": user_id}})
-                if source_filter:
-                    must_conditions.append({"key": "source", "match": {"value": source_filter}})
+            db.execute(self._bulk_update_statement(user_id), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            for i in valid:
+                results[i]["error"] = str(e)
+            return self._update_summary(results)
+        finally:
+            db.close()
+        
+        self._delete_vectors(self._stale_vectors(items, statuses))
+        search_cache.invalidate([user_id])
+        if queue_embeddings:
+            embedding_worker.notify()
+        
+        self._fill_update_results(results, items, valid, rows, vector_ids)
+        return self._update_summary(results)
+    
+    def _find_duplicates(self, user_id: int, signatures: Dict[int, int]) -> Dict[int, Tuple[str, int]]:
+        """Near-duplicates among the signatures, of stored memories or of each other"""
+        if not dedup_service.enabled or not signatures:
+            return {}
+        
+        existing = []
+        db = SessionLocal()
+        try:
+            existing = db.execute(self._duplicate_candidates_statement(user_id, signatures)).all()
+        except Exception as e:
+            print(f"Duplicate lookup skipped: {str(e)}")
+        finally:
+            db.close()
+        
+        return dedup_service.find_duplicates(signatures, existing)
+    
+    def backfill_simhashes(self, batch_size: int = 500) -> int:
+        """Compute content_simhash for memories stored before it existed
+        
+        Only rows still missing it are visited, so re-running is cheap.
+        Returns the number of rows updated.
+        """
+        updated = 0
+        last_id = 0
+        
+        while True:
+            db = SessionLocal()
+            try:
+                rows = db.execute(
+                    select(Memory.id, Memory.content)
+                    .where(Memory.content_simhash.is_(None), Memory.id > last_id)
+                    .order_by(Memory.id)
+                    .limit(batch_size)
+                ).all()
+                if not rows:
+                    break
                 
-                search_filter = {"must": must_conditions}
+                db.execute(update(Memory), [
+                    {"id": row.id, "content_simhash": dedup_service.simhash(row.content)}
+                    for row in rows
+                ])
+                db.commit()
+            finally:
+                db.close()
             
-            # Search in Qdrant
-            search_results = self.qdrant_client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                query_filter=search_filter,
-                limit=limit
+            updated += len(rows)
+            last_id = rows[-1].id
+        
+        if updated:
+            print(f"Backfilled content_simhash on {updated} memories")
+        return updated
+    
+    def process_pending_embeddings(self, batch_size: int) -> int:
+        """Embed one batch of pending memories; returns how many became ready
+        
+        Rows are claimed with FOR UPDATE SKIP LOCKED so several workers (or
+        several app processes) can drain the queue without double work.
+        """
+        db = SessionLocal()
+        try:
+            memories = (
+                db.query(Memory)
+                .filter(Memory.embedding_status == "pending")
+                .order_by(Memory.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
             )
             
-            # Format results
-            memories = []
-            for result in search_results:
-                memories.append({
-                    "id": result.id,
-                    "score": result.score,
-                    "content": result.payload.get("content", ""),
-                    "source": result.payload.get("source", ""),
-                    "category": result.payload.get("category", ""),
-                    "original_url": result.payload.get("original_url")
-                })
+            if not memories:
+                return 0
+            
+            try:
+                embeddings = embedding_service.generate_embeddings_batch(
+                    [memory.content for memory in memories]
+                )
+                points = [
+                    PointStruct(
+                        id=memory.vector_id or str(uuid4()),
+                        vector=embedding,
+                        payload=self._build_payload(
+                            memory.user_id,
+                            memory.content,
+                            memory.source,
+                            memory.category,
+                            memory.original_post_id,
+                            memory.original_url,
+                            memory.source_timestamp
+                        )
+                    )
+                    for memory, embedding in zip(memories, embeddings)
+                ]
+                self.qdrant_client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
+            except Exception as e:
+                print(f"Pending embeddings failed: {str(e)}")
+                for memory in memories:
+                    memory.embedding_attempts = (memory.embedding_attempts or 0) + 1
+                    if memory.embedding_attempts >= settings.EMBEDDING_WORKER_MAX_ATTEMPTS:
+                        memory.embedding_status = "failed"
+                db.commit()
+                return 0
+            
+            for memory, point in zip(memories, points):
+                memory.vector_id = point.id
+                memory.embedding_status = "ready"
+            db.commit()
+            
+            # Newly searchable vectors change these users' vector results
+            search_cache.invalidate(memory.user_id for memory in memories)
+            
+            return len(memories)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def get_embedding_status(self, memory_id: int, user_id: Optional[int] = None) -> Dict:
+        """Embedding status of a memory (for clients that need read-your-writes)"""
+        try:
+            db = SessionLocal()
+            query = db.query(Memory.embedding_status, Memory.vector_id).filter(Memory.id == memory_id)
+            
+            if user_id:
+                query = query.filter(Memory.user_id == user_id)
+            
+            row = query.first()
+            
+            if not row:
+                return {"success": False, "error": "Memory not found"}
             
             return {
                 "success": True,
-                "query": query,
-                "count": len(memories),
-                "results": memories
+                "memory_id": memory_id,
+                "embedding_status": row.embedding_status,
+                "vector_id": row.vector_id
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
+        finally:
+            db.close()
+    
+    def _delete_vectors(self, vector_ids: List[str]):
+        """Best-effort removal of points no committed row refers to"""
+        if not vector_ids:
+            return
+        try:
+            self.qdrant_client.delete(
+                collection_name=self.collection_name,
+                points_selector=vector_ids
+            )
+        except Exception as e:
+            print(f"Qdrant cleanup failed: {str(e)}")
+    
+    def search_memories(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        limit: int = 10,
+        source_filter: Optional[str] = None,
+        mode: str = "vector"
+    ) -> Dict:
+        """Search memories: "vector" (semantic), "lexical" (full-text) or "hybrid" (both, fused)"""
+        cached, cache_key = search_cache.get(user_id, query, limit, source_filter, mode)
+        if cached is not None:
+            return cached
+        
+        try:
+            if mode == "lexical":
+                memories = self._lexical_search(query, user_id, limit, source_filter)
+            elif mode == "hybrid":
+                candidates = limit * self.HYBRID_OVERFETCH
+                memories = self._fuse_results([
+                    ("vector", self._vector_search(query, user_id, candidates, source_filter)),
+                    ("lexical", self._lexical_search(query, user_id, candidates, source_filter))
+                ], limit)
+            else:
+                memories = self._vector_search(query, user_id, limit, source_filter)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        response = self._search_response(query, mode, memories)
+        search_cache.set(cache_key, response)
+        return response
+    
+    def _vector_search(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        source_filter: Optional[str]
+    ) -> List[Dict]:
+        # Generate query embedding
+        query_embedding = embedding_service.generate_embedding(query, input_type="search_query")
+        
+        # Search in Qdrant
+        search_results = self.qdrant_client.search(
+            collection_name=self.collection_name,
+            query_vector=query_embedding,
+            query_filter=self._search_filter(user_id, source_filter),
+            limit=limit
+        )
+        
+        return [self._format_hit(result) for result in search_results]
+    
+    def _lexical_search(
+        self,
+        query: str,
+        user_id: Optional[int],
+        limit: int,
+        source_filter: Optional[str]
+    ) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            rows = db.execute(self._lexical_statement(query, user_id, limit, source_filter)).all()
+            return [self._format_lexical_hit(memory, rank) for memory, rank in rows]
+        finally:
+            db.close()
     
     def get_memory_by_id(self, memory_id: int, user_id: Optional[int] = None) -> Dict:
         """Get a specific memory by ID"""
@@ -176,19 +1167,7 @@ class MemoryService:
             if not memory:
                 return {"success": False, "error": "Memory not found"}
             
-            return {
-                "success": True,
-                "memory": {
-                    "id": memory.id,
-                    "content": memory.content,
-                    "source": memory.source,
-                    "category": memory.category,
-                    "created_at": memory.created_at.isoformat(),
-                    "source_timestamp": memory.source_timestamp.isoformat() if memory.source_timestamp else None,
-                    "original_url": memory.original_url,
-                    "meta_data": memory.meta_data
-                }
-            }
+            return {"success": True, "memory": self._serialize_memory(memory)}
         except Exception as e:
             return {"success": False, "error": str(e)}
         finally:
@@ -199,34 +1178,25 @@ class MemoryService:
         user_id: int,
         source: Optional[str] = None,
         limit: int = 50,
-        offset: int = 0
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        total_mode: str = "counter"
     ) -> Dict:
-        """List memories for a user"""
+        """List memories for a user, newest first
+        
+        Pass next_cursor back as cursor to get the following page. offset still
+        works for older clients but gets slower the deeper it goes. total_mode is
+        "counter" (memory_counts table), "exact" (COUNT(*)) or "none".
+        """
         try:
             db = SessionLocal()
-            query = db.query(Memory).filter(Memory.user_id == user_id)
-            
-            if source:
-                query = query.filter(Memory.source == source)
+            memories = db.execute(self._list_statement(user_id, source, limit, offset, cursor)).scalars().all()
             
-            total = query.count()
-            memories = query.order_by(Memory.created_at.desc()).limit(limit).offset(offset).all()
+            total = None
+            if total_mode != "none":
+                total = db.execute(self._total_statement(user_id, source, total_mode)).scalar_one()
             
-            return {
-                "success": True,
-                "total": total,
-                "count": len(memories),
-                "memories": [
-                    {
-                        "id": m.id,
-                        "content": m.content[:200] + "..." if len(m.content) > 200 else m.content,
-                        "source": m.source,
-                        "category": m.category,
-                        "created_at": m.created_at.isoformat()
-                    }
-                    for m in memories
-                ]
-            }
+            return self._list_page(memories, limit, total)
         except Exception as e:
             return {"success": False, "error": str(e)}
         finally:
@@ -254,6 +1224,7 @@ class MemoryService:
             # Delete from PostgreSQL
             db.delete(memory)
             db.commit()
+            search_cache.invalidate([user_id])
             
             return {"success": True, "message": "Memory deleted"}
         except Exception as e:
@@ -261,6 +1232,26 @@ class MemoryService:
             return {"success": False, "error": str(e)}
         finally:
             db.close()
+    
+    def delete_memories(self, user_id: int, memory_ids: List[int]) -> Dict:
+        """Delete many of a user's memories and their vectors"""
+        if not memory_ids:
+            return {"success": True, "deleted": 0}
+        
+        db = SessionLocal()
+        try:
+            vector_ids = db.execute(self._delete_memories_statement(user_id, memory_ids)).scalars().all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            return {"success": False, "error": str(e)}
+        finally:
+            db.close()
+        
+        self._delete_vectors([vector_id for vector_id in vector_ids if vector_id])
+        search_cache.invalidate([user_id])
+        
+        return {"success": True, "deleted": len(vector_ids)}
 
 
 # Singleton instance
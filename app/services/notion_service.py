@@ -1,12 +1,28 @@
-import requests
-from typing import Dict, List, Optional
-from datetime import datetime
+import asyncio
+import hashlib
+import httpx
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+from datetime import datetime, timezone
 from app.config import settings
+from app.utils.http_client import http_clients
+from app.utils.rate_limiter import rate_limiter
 
 
 class NotionService:
     """Service for integrating with Notion API"""
     
+    # Largest page_size the API accepts for search and block children
+    PAGE_SIZE = 100
+    
+    # Block types that are separate pages (crawled on their own, not inlined)
+    CHILD_PAGE_TYPES = {"child_page", "child_database"}
+    
+    # Nesting depth followed inside a page
+    MAX_DEPTH = 8
+    
+    # Pages stored per create_memories_bulk call during a sync
+    SYNC_BATCH_SIZE = 50
+    
     def __init__(self):
         self.base_url = "https://api.notion.com/v1"
         self.version = "2022-06-28"
@@ -33,7 +49,7 @@ class NotionService:
             f"&state={state}"
         )
     
-    def exchange_code_for_token(self, code: str) -> Dict:
+    async def exchange_code_for_token(self, code: str) -> Dict:
         """Exchange authorization code for access token"""
         try:
             client_id = getattr(settings, 'NOTION_CLIENT_ID', '')
@@ -52,8 +68,8 @@ class NotionService:
                 "code": code
                 # 'redirect_uri' omitted as workaround
             }
-            response = requests.post(
-                "https://api.notion.com/v1/oauth/token",
+            response = await http_clients.get("notion").post(
+                f"{self.base_url}/oauth/token",
                 headers=headers,
                 json=data
             )
@@ -73,7 +89,7 @@ class NotionService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def search_pages(self, access_token: str, query: str = "", page_size: int = 100) -> Dict:
+    async def search_pages(self, access_token: str, query: str = "", page_size: int = 100) -> Dict:
         """Search for pages in Notion workspace"""
         try:
             headers = self.get_headers(access_token)
@@ -85,7 +101,11 @@ class NotionService:
             if query:
                 data["query"] = query
             
-            response = requests.post(
+            response = await rate_limiter.arequest(
+                http_clients.get("notion"),
+                "notion",
+                rate_limiter.account_key(access_token),
+                "POST",
                 f"{self.base_url}/search",
                 headers=headers,
                 json=data
@@ -97,13 +117,7 @@ class NotionService:
                 
                 for result in results.get("results", []):
                     if result.get("object") == "page":
-                        pages.append({
-                            "id": result.get("id"),
-                            "title": self._extract_title(result),
-                            "created_time": result.get("created_time"),
-                            "last_edited_time": result.get("last_edited_time"),
-                            "url": result.get("url")
-                        })
+                        pages.append(self._page_summary(result))
                 
                 return {
                     "success": True,
@@ -119,43 +133,310 @@ class NotionService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
-    def get_page_content(self, access_token: str, page_id: str) -> Dict:
-        """Get content blocks from a Notion page"""
+    async def get_bot_user(self, access_token: str) -> Dict:
+        """The integration's bot user for a token, with its workspace"""
         try:
-            headers = self.get_headers(access_token)
-            
-            response = requests.get(
-                f"{self.base_url}/blocks/{page_id}/children",
-                headers=headers
+            response = await rate_limiter.arequest(
+                http_clients.get("notion"),
+                "notion",
+                rate_limiter.account_key(access_token),
+                "GET",
+                f"{self.base_url}/users/me",
+                headers=self.get_headers(access_token)
             )
             
             if response.status_code == 200:
-                blocks = response.json().get("results", [])
-                content_parts = []
-                
-                for block in blocks:
-                    text = self._extract_text_from_block(block)
-                    if text:
-                        content_parts.append(text)
-                
-                full_content = "\n".join(content_parts)
-                
+                user = response.json()
+                bot = user.get("bot") or {}
                 return {
                     "success": True,
-                    "page_id": page_id,
-                    "content": full_content,
-                    "block_count": len(blocks),
-                    "word_count": len(full_content.split())
+                    "data": {
+                        "id": user.get("id"),
+                        "workspace_id": self.workspace_key(user),
+                        "workspace_name": bot.get("workspace_name"),
+                        "owner": bot.get("owner")
+                    }
                 }
             
             return {
                 "success": False,
-                "error": f"Failed to fetch page: {response.status_code}",
+                "error": f"Failed to get bot user: {response.status_code}",
                 "details": response.text
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    @staticmethod
+    def workspace_key(user: Dict) -> str:
+        """Id of the workspace a bot user belongs to
+        
+        Newer API versions return bot.workspace_id; otherwise the bot's own id
+        stands in, as each workspace an integration is added to gets its own bot.
+        """
+        return (user.get("bot") or {}).get("workspace_id") or user.get("id")
+    
+    async def aget_page_content(self, access_token: str, page_id: str) -> Dict:
+        """Get the text of every block of a Notion page, nested blocks included"""
+        try:
+            crawler = self._crawler(access_token)
+            lines, block_count = await crawler.block_lines(page_id)
+        except httpx.HTTPStatusError as e:
+            return {
+                "success": False,
+                "error": f"Failed to fetch page: {e.response.status_code}",
+                "details": e.response.text
+            }
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        full_content = "\n".join(lines)
+        return {
+            "success": True,
+            "page_id": page_id,
+            "content": full_content,
+            "block_count": block_count,
+            "word_count": len(full_content.split())
+        }
+    
+    async def sync_to_memory(
+        self,
+        access_token: str,
+        user_id: int,
+        max_pages: int = 500,
+        progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Bring the user's Notion memories in line with the workspace
+        
+        One paginated search lists every page with its last_edited_time, which
+        is compared with what the previous sync stored. Only new and edited
+        pages are downloaded (concurrently, capped by NOTION_MAX_CONCURRENCY).
+        Edited pages update their memory and Qdrant point in place, and are
+        only re-embedded when their text hash changed. Memories of pages the
+        search no longer returns are deleted, unless max_pages cut it short.
+        progress, if given, is called with the running counts after each batch.
+        
+        Memories are tagged with the token's workspace, so syncing one
+        workspace leaves the user's other workspaces alone. Untagged memories
+        from before are matched by page id and tagged when updated, but never
+        deleted as missing, since they may belong to another workspace.
+        """
+        from app.services.async_memory_service import async_memory_service
+        
+        saved_count = updated_count = reembedded = deduplicated = 0
+        errors = []
+        
+        try:
+            bot = await self.get_bot_user(access_token)
+            if not bot.get("success"):
+                return bot
+            workspace_id = bot["data"]["workspace_id"]
+            
+            stored, stale_ids = self._index_records([
+                record for record in await async_memory_service.list_source_records(user_id, "notion")
+                if record["meta_data"].get("workspace_id") in (workspace_id, None)
+            ])
+            
+            crawler = self._crawler(access_token)
+            pages = await crawler.search_pages(max_pages)
+            changed = [
+                page for page in pages
+                if page["id"] not in stored
+                or stored[page["id"]]["meta_data"].get("last_edited_time") != page.get("last_edited_time")
+            ]
+            
+            processed = 0
+            async for fetched, page_errors in self._fetch_contents(crawler, changed):
+                processed += len(fetched) + len(page_errors)
+                errors.extend(page_errors)
+                new_items, updates = self._diff_pages(fetched, stored, workspace_id)
+                
+                if new_items:
+                    bulk_result = await async_memory_service.create_memories_bulk(
+                        user_id=user_id,
+                        items=new_items,
+                        generate_embedding=True
+                    )
+                    saved_count += bulk_result["created"]
+                    deduplicated += bulk_result["deduplicated"]
+                    errors.extend(r["error"] for r in bulk_result["results"] if r.get("error"))
+                
+                if updates:
+                    update_result = await async_memory_service.update_memories_bulk(
+                        user_id=user_id,
+                        items=updates,
+                        generate_embedding=True
+                    )
+                    updated_count += update_result["updated"]
+                    reembedded += update_result["embeddings_generated"]
+                    errors.extend(
+                        r.get("error") or f"Vector payload not refreshed: {r['payload_error']}"
+                        for r in update_result["results"]
+                        if r.get("error") or r.get("payload_error")
+                    )
+                
+                if progress:
+                    progress({
+                        "pages_found": len(pages),
+                        "pages_to_fetch": len(changed),
+                        "pages_processed": processed,
+                        "memories_saved": saved_count,
+                        "memories_updated": updated_count
+                    })
+            
+            search_complete = not crawler.truncated
+            
+            # Notion's search omits archived and unshared pages
+            page_ids = {page["id"] for page in pages}
+            removed_ids = list(stale_ids)
+            if search_complete:
+                removed_ids.extend(
+                    record["memory_id"] for page_id, record in stored.items()
+                    if page_id not in page_ids and record["meta_data"].get("workspace_id") == workspace_id
+                )
+            delete_result = await async_memory_service.delete_memories(user_id, removed_ids)
+            if not delete_result["success"]:
+                errors.append(delete_result["error"])
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        return {
+            "success": True,
+            "pages_found": len(pages),
+            "pages_fetched": len(changed),
+            "pages_unchanged": len(pages) - len(changed),
+            "memories_saved": saved_count,
+            "memories_updated": updated_count,
+            "memories_reembedded": reembedded,
+            "memories_deleted": delete_result.get("deleted", 0),
+            "duplicates_skipped": deduplicated,
+            "errors": errors if errors else None,
+            "message": f"Synced Notion: {saved_count} new, {updated_count} updated, {len(pages) - len(changed)} unchanged"
+        }
+    
+    async def _fetch_contents(
+        self,
+        crawler: "NotionCrawler",
+        pages: List[Dict],
+        batch_size: int = SYNC_BATCH_SIZE
+    ) -> AsyncIterator[Tuple[List[Dict], List[str]]]:
+        tasks = [asyncio.create_task(crawler.page_with_content(page)) for page in pages]
+        
+        try:
+            batch, errors = [], []
+            for task in asyncio.as_completed(tasks):
+                try:
+                    batch.append(await task)
+                except Exception as e:
+                    errors.append(f"Failed to fetch page: {str(e)}")
+                
+                if len(batch) >= batch_size:
+                    yield batch, errors
+                    batch, errors = [], []
+            
+            if batch or errors:
+                yield batch, errors
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    def _index_records(self, records: List[Dict]) -> Tuple[Dict[str, Dict], List[int]]:
+        """Stored memories by page id, plus older extra memories of the same page
+        
+        Syncs before change tracking created a new memory per page each time;
+        the newest one is kept and updated, the rest are removed.
+        """
+        stored = {}
+        stale_ids = []
+        for record in records:
+            previous = stored.get(record["original_post_id"])
+            if previous:
+                stale_ids.append(previous["memory_id"])
+            stored[record["original_post_id"]] = record
+        return stored, stale_ids
+    
+    def _diff_pages(
+        self,
+        pages: List[Dict],
+        stored: Dict[str, Dict],
+        workspace_id: str
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """Split fetched pages into new memory items and in-place updates"""
+        new_items, updates = [], []
+        for page in pages:
+            item = self._memory_item(page, workspace_id)
+            record = stored.get(page["id"])
+            if record is None:
+                new_items.append(item)
+                continue
+            
+            updates.append({
+                **item,
+                "memory_id": record["memory_id"],
+                "vector_id": record["vector_id"],
+                "reembed": record["meta_data"].get("content_hash") != item["meta_data"]["content_hash"]
+            })
+        return new_items, updates
+    
+    def _crawler(self, access_token: str) -> "NotionCrawler":
+        return NotionCrawler(
+            self,
+            http_clients.get("notion"),
+            access_token,
+            settings.NOTION_MAX_CONCURRENCY
+        )
+    
+    def _memory_item(self, page: Dict, workspace_id: str) -> Dict:
+        full_content = f"""Notion Page: {page.get('title', 'Untitled')}
+
+{page.get('content', '')}
+
+---
+Created: {page.get('created_time', 'N/A')}
+Last Edited: {page.get('last_edited_time', 'N/A')}
+"""
+
+        return {
+            "content": full_content,
+            "source": "notion",
+            "category": "document",
+            "meta_data": {
+                "page_id": page["id"],
+                "workspace_id": workspace_id,
+                "title": page.get("title"),
+                "created_time": page.get("created_time"),
+                "last_edited_time": page.get("last_edited_time"),
+                "content_hash": self._content_hash(page)
+            },
+            "original_post_id": page["id"],
+            "original_url": page.get("url"),
+            "source_timestamp": self._parse_time(page.get("last_edited_time"))
+        }
+    
+    def _content_hash(self, page: Dict) -> str:
+        """Hash of what gets embedded, minus the timestamps (edits can leave the text unchanged)"""
+        text = f"{page.get('title', 'Untitled')}\n{page.get('content', '')}"
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def _parse_time(value: Optional[str]) -> Optional[datetime]:
+        """Notion ISO timestamp as a naive UTC datetime"""
+        if not value:
+            return None
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    def _page_summary(self, result: Dict) -> Dict:
+        return {
+            "id": result.get("id"),
+            "title": self._extract_title(result),
+            "created_time": result.get("created_time"),
+            "last_edited_time": result.get("last_edited_time"),
+            "url": result.get("url")
+        }
+    
     def _extract_title(self, page: Dict) -> str:
         """Extract title from page object"""
         properties = page.get("properties", {})
@@ -185,5 +466,124 @@ class NotionService:
         return ""
 
 
+class NotionCrawler:
+    """One crawl: paginated, recursive and concurrent Notion reads
+    
+    Requests go over the shared, pooled Notion client with this user's token.
+    Every request goes through one semaphore, so however many pages and
+    nested blocks are being walked at once, at most max_concurrency requests
+    are in flight, and through the token's rate-limit bucket, which paces
+    them and pauses the whole crawl for the Retry-After of a 429.
+    """
+    
+    def __init__(self, service: NotionService, client: httpx.AsyncClient, access_token: str, max_concurrency: int):
+        self.service = service
+        self._client = client
+        self._headers = service.get_headers(access_token)
+        self._account = rate_limiter.account_key(access_token)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Set when search_pages stopped at max_pages with more pages left
+        self.truncated = False
+    
+    async def search_pages(self, max_pages: int) -> List[Dict]:
+        """Summaries of up to max_pages pages, following next_cursor"""
+        pages = []
+        cursor = None
+        
+        while len(pages) < max_pages:
+            body = {"page_size": NotionService.PAGE_SIZE, "filter": {"property": "object", "value": "page"}}
+            if cursor:
+                body["start_cursor"] = cursor
+            data = await self._request("POST", "/search", json=body)
+            
+            pages.extend(
+                self.service._page_summary(result)
+                for result in data.get("results", [])
+                if result.get("object") == "page"
+            )
+            
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                break
+        
+        self.truncated = len(pages) > max_pages or (len(pages) == max_pages and bool(cursor))
+        return pages[:max_pages]
+    
+    async def page_with_content(self, page: Dict) -> Dict:
+        lines, block_count = await self.block_lines(page["id"])
+        return {**page, "content": "\n".join(lines), "block_count": block_count}
+    
+    async def block_lines(self, block_id: str, depth: int = 0) -> Tuple[List[str], int]:
+        """Text lines of a block's children, nested children indented below their parent
+        
+        Siblings' subtrees are fetched concurrently. Returns (lines, block count).
+        """
+        blocks = await self._children(block_id)
+        
+        nested = [
+            block for block in blocks
+            if block.get("has_children")
+            and block.get("type") not in NotionService.CHILD_PAGE_TYPES
+            and depth < NotionService.MAX_DEPTH
+        ]
+        subtrees = dict(zip(
+            (block["id"] for block in nested),
+            await asyncio.gather(*(self.block_lines(block["id"], depth + 1) for block in nested))
+        ))
+        
+        lines = []
+        block_count = len(blocks)
+        for block in blocks:
+            text = self.service._extract_text_from_block(block)
+            if text:
+                lines.append("  " * depth + text)
+            if block["id"] in subtrees:
+                child_lines, child_count = subtrees[block["id"]]
+                lines.extend(child_lines)
+                block_count += child_count
+        
+        return lines, block_count
+    
+    async def _children(self, block_id: str) -> List[Dict]:
+        """All child blocks, following next_cursor"""
+        blocks = []
+        cursor = None
+        
+        while True:
+            params = {"page_size": NotionService.PAGE_SIZE}
+            if cursor:
+                params["start_cursor"] = cursor
+            data = await self._request("GET", f"/blocks/{block_id}/children", params=params)
+            blocks.extend(data.get("results", []))
+            
+            cursor = data.get("next_cursor")
+            if not data.get("has_more") or not cursor:
+                return blocks
+    
+    async def _request(self, method: str, url: str, **kwargs) -> Dict:
+        attempt = 0
+        while True:
+            await rate_limiter.aacquire("notion", self._account)
+            async with self._semaphore:
+                response = await self._client.request(
+                    method,
+                    f"{self.service.base_url}{url}",
+                    headers=self._headers,
+                    **kwargs
+                )
+            retry_after = rate_limiter.observe("notion", self._account, response.status_code, response.headers)
+            
+            delay = None
+            if response.status_code in rate_limiter.RETRY_STATUSES:
+                delay = rate_limiter.retry_delay(attempt, retry_after)
+            if delay is None:
+                response.raise_for_status()
+                return response.json()
+            
+            # Wait outside the semaphore so other requests keep going
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
 # Singleton instance
 notion_service = NotionService()
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+from app.config import settings
+from app.utils.redis_client import redis_client
+
+
+class SearchCache:
+    """Redis cache of /memory/search responses with write-aware invalidation
+    
+    Each user has a generation counter that every write to their memories
+    increments. Result keys embed the generation they were computed at, so a
+    write makes all older entries unreachable at once; they then expire by TTL.
+    """
+    
+    KEY_PREFIX = "search:v1"
+    GENERATION_PREFIX = "search:gen"
+    
+    def __init__(self, ttl_seconds: int, enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "invalidations": 0
+        }
+    
+    def make_key(
+        self,
+        user_id: int,
+        generation: int,
+        query: str,
+        limit: int,
+        source_filter: Optional[str],
+        mode: str
+    ) -> str:
+        """Build the result key; queries differing only in case/whitespace share it"""
+        normalized = " ".join(query.lower().split())
+        digest = hashlib.sha256(
+            json.dumps([normalized, limit, source_filter, mode]).encode("utf-8")
+        ).hexdigest()
+        return f"{self.KEY_PREFIX}:{user_id}:{generation}:{digest}"
+    
+    def get(self, user_id: Optional[int], *params) -> Tuple[Optional[Dict], Optional[str]]:
+        """Return (cached response or None, key to store a fresh response under)
+        
+        params are (query, limit, source_filter, mode). The key is None when the
+        cache is off, Redis is down or the search is not scoped to one user.
+        """
+        client = self._client(user_id)
+        if client is None:
+            return None, None
+        
+        try:
+            generation = int(client.get(self._generation_key(user_id)) or 0)
+            key = self.make_key(user_id, generation, *params)
+            value = client.get(key)
+        except Exception as e:
+            print(f"Search cache read failed: {str(e)}")
+            redis_client.reset()
+            return None, None
+        
+        return self._record_lookup(value), key
+    
+    async def aget(self, user_id: Optional[int], *params) -> Tuple[Optional[Dict], Optional[str]]:
+        """Async get()"""
+        client = await self._aclient(user_id)
+        if client is None:
+            return None, None
+        
+        try:
+            generation = int(await client.get(self._generation_key(user_id)) or 0)
+            key = self.make_key(user_id, generation, *params)
+            value = await client.get(key)
+        except Exception as e:
+            print(f"Search cache read failed: {str(e)}")
+            redis_client.reset()
+            return None, None
+        
+        return self._record_lookup(value), key
+    
+    def set(self, key: Optional[str], response: Dict):
+        """Store a successful search response under the key get() returned"""
+        if not key or not response.get("success"):
+            return
+        
+        client = redis_client.get()
+        if client is None:
+            return
+        
+        try:
+            client.set(key, json.dumps(response), ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"Search cache write failed: {str(e)}")
+            redis_client.reset()
+    
+    async def aset(self, key: Optional[str], response: Dict):
+        """Async set()"""
+        if not key or not response.get("success"):
+            return
+        
+        client = await redis_client.get_async()
+        if client is None:
+            return
+        
+        try:
+            await client.set(key, json.dumps(response), ex=self.ttl_seconds)
+        except Exception as e:
+            print(f"Search cache write failed: {str(e)}")
+            redis_client.reset()
+    
+    def invalidate(self, user_ids: Iterable[int]):
+        """Bump the generation of users whose memories changed"""
+        user_ids = set(user_ids)
+        if not self.enabled or not user_ids:
+            return
+        
+        client = redis_client.get()
+        if client is None:
+            return
+        
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.incr(self._generation_key(user_id))
+            pipe.execute()
+        except Exception as e:
+            print(f"Search cache invalidation failed: {str(e)}")
+            redis_client.reset()
+            return
+        
+        with self._lock:
+            self._stats["invalidations"] += len(user_ids)
+    
+    async def ainvalidate(self, user_ids: Iterable[int]):
+        """Async invalidate()"""
+        user_ids = set(user_ids)
+        if not self.enabled or not user_ids:
+            return
+        
+        client = await redis_client.get_async()
+        if client is None:
+            return
+        
+        try:
+            pipe = client.pipeline(transaction=False)
+            for user_id in user_ids:
+                pipe.incr(self._generation_key(user_id))
+            await pipe.execute()
+        except Exception as e:
+            print(f"Search cache invalidation failed: {str(e)}")
+            redis_client.reset()
+            return
+        
+        with self._lock:
+            self._stats["invalidations"] += len(user_ids)
+    
+    def get_stats(self) -> Dict:
+        """Hit/miss counters for this process"""
+        with self._lock:
+            stats = dict(self._stats)
+        
+        lookups = stats["hits"] + stats["misses"]
+        stats["enabled"] = self.enabled
+        stats["ttl_seconds"] = self.ttl_seconds
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+    
+    def _generation_key(self, user_id: int) -> str:
+        return f"{self.GENERATION_PREFIX}:{user_id}"
+    
+    def _client(self, user_id: Optional[int]):
+        if not self.enabled or not user_id:
+            return None
+        client = redis_client.get()
+        if client is None:
+            self._bypass()
+        return client
+    
+    async def _aclient(self, user_id: Optional[int]):
+        if not self.enabled or not user_id:
+            return None
+        client = await redis_client.get_async()
+        if client is None:
+            self._bypass()
+        return client
+    
+    def _bypass(self):
+        with self._lock:
+            self._stats["bypassed"] += 1
+    
+    def _record_lookup(self, value: Optional[bytes]) -> Optional[Dict]:
+        with self._lock:
+            self._stats["hits" if value is not None else "misses"] += 1
+        return json.loads(value) if value is not None else None
+
+
+# Singleton instance
+search_cache = SearchCache(
+    ttl_seconds=settings.SEARCH_CACHE_TTL_SECONDS,
+    enabled=settings.SEARCH_CACHE_ENABLED
+)
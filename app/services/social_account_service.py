@@ -0,0 +1,147 @@
+from sqlalchemy import select, delete
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional
+from app.database import AsyncSessionLocal
+from app.models.social_account import SocialAccount
+from app.models.sync_job import SyncJob
+from app.services.sync_job_service import sync_job_service
+
+
+class SocialAccountService:
+    """Connected accounts (social_accounts), which background syncs run for"""
+    
+    async def list_accounts(self, user_id: int) -> List[Dict]:
+        """The user's accounts with their latest sync job (tokens are never returned)"""
+        latest_jobs = (
+            select(SyncJob)
+            .where(SyncJob.user_id == user_id)
+            .distinct(SyncJob.social_account_id)
+            .order_by(SyncJob.social_account_id, SyncJob.id.desc())
+        )
+        
+        async with AsyncSessionLocal() as db:
+            accounts = (await db.execute(
+                select(SocialAccount).where(SocialAccount.user_id == user_id).order_by(SocialAccount.id)
+            )).scalars().all()
+            jobs = {job.social_account_id: job for job in (await db.execute(latest_jobs)).scalars().all()}
+            return [self._serialize(account, jobs.get(account.id)) for account in accounts]
+    
+    async def connect(self, user_id: int, platform: str, credentials: Dict) -> Dict:
+        """Store (or refresh) the user's account on a platform
+        
+        The token is checked against the platform and identifies the account,
+        so reconnecting the same account updates its row instead of adding one.
+        """
+        if platform not in sync_job_service.PLATFORMS:
+            return {"success": False, "error": f"Unsupported platform: {platform}"}
+        
+        access_token = credentials.get("access_token") or ""
+        if not access_token:
+            return {"success": False, "error": "access_token is required"}
+        
+        identity = await self._identify(platform, access_token)
+        if not identity.get("success"):
+            return identity
+        
+        platform_user_id = credentials.get("platform_user_id") or identity["platform_user_id"]
+        values = {
+            "access_token": access_token,
+            "token_expires_at": None,
+            "platform_username": credentials.get("platform_username") or identity.get("platform_username"),
+            "profile_data": credentials.get("profile_data") or identity.get("profile_data") or {},
+            "is_active": True
+        }
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                account = (await db.execute(
+                    select(SocialAccount).where(
+                        SocialAccount.user_id == user_id,
+                        SocialAccount.platform == platform,
+                        SocialAccount.platform_user_id == platform_user_id
+                    )
+                )).scalars().first()
+                
+                if account is None:
+                    account = SocialAccount(user_id=user_id, platform=platform, platform_user_id=platform_user_id)
+                    db.add(account)
+                for key, value in values.items():
+                    setattr(account, key, value)
+                # Google only hands out a refresh token on first consent, so keep the stored one
+                if credentials.get("refresh_token"):
+                    account.refresh_token = credentials["refresh_token"]
+                
+                await db.commit()
+                await db.refresh(account)
+                return {"success": True, "account": self._serialize(account)}
+            except Exception as e:
+                await db.rollback()
+                return {"success": False, "error": str(e)}
+    
+    async def disconnect(self, user_id: int, platform: str) -> int:
+        """Delete the user's accounts on a platform (their sync jobs go with them); returns how many"""
+        async with AsyncSessionLocal() as db:
+            try:
+                result = await db.execute(
+                    delete(SocialAccount).where(
+                        SocialAccount.user_id == user_id,
+                        SocialAccount.platform == platform
+                    )
+                )
+                await db.commit()
+                return result.rowcount
+            except Exception:
+                await db.rollback()
+                raise
+    
+    async def _identify(self, platform: str, access_token: str) -> Dict:
+        """{"platform_user_id", "platform_username", "profile_data"} of the account behind a token"""
+        if platform == "gmail":
+            from app.services.gmail_service import gmail_service
+            result = await run_in_threadpool(gmail_service.get_user_profile, access_token)
+            if not result.get("success"):
+                return result
+            email = result["data"]["email"]
+            return {"success": True, "platform_user_id": email, "platform_username": email}
+        
+        if platform == "linkedin":
+            from app.services.linkedin_service import linkedin_service
+            result = await linkedin_service.get_user_profile(access_token)
+            if not result.get("success"):
+                return result
+            profile = result["data"]
+            return {
+                "success": True,
+                "platform_user_id": profile.get("sub"),
+                "platform_username": profile.get("name"),
+                "profile_data": profile
+            }
+        
+        # Notion tokens belong to a workspace, identified through the integration's bot user
+        from app.services.notion_service import notion_service
+        result = await notion_service.get_bot_user(access_token)
+        if not result.get("success"):
+            return result
+        bot = result["data"]
+        return {
+            "success": True,
+            "platform_user_id": bot["workspace_id"],
+            "platform_username": bot.get("workspace_name"),
+            "profile_data": bot
+        }
+    
+    def _serialize(self, account: SocialAccount, latest_job: Optional[SyncJob] = None) -> Dict:
+        return {
+            "account_id": account.id,
+            "platform": account.platform,
+            "platform_user_id": account.platform_user_id,
+            "platform_username": account.platform_username,
+            "is_active": account.is_active,
+            "last_synced_at": account.last_synced_at.isoformat() if account.last_synced_at else None,
+            "connected_at": account.connected_at.isoformat() if account.connected_at else None,
+            "latest_job": sync_job_service.serialize(latest_job) if latest_job else None
+        }
+
+
+# Singleton instance
+social_account_service = SocialAccountService()
@@ -0,0 +1,83 @@
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, Optional
+from app.database import SessionLocal, AsyncSessionLocal
+from app.models.sync_cursor import SyncCursor
+
+
+class SyncCursorService:
+    """Read and advance the per-user positions of incremental imports"""
+    
+    def get(self, user_id: int, source: str, account_id: str = "") -> Optional[Dict]:
+        """{"cursor", "state", "updated_at"} of the last import, or None"""
+        db = SessionLocal()
+        try:
+            row = db.execute(self._select_statement(user_id, source, account_id)).scalar_one_or_none()
+            return self._serialize(row)
+        finally:
+            db.close()
+    
+    async def aget(self, user_id: int, source: str, account_id: str = "") -> Optional[Dict]:
+        """Async get()"""
+        async with AsyncSessionLocal() as db:
+            row = (await db.execute(self._select_statement(user_id, source, account_id))).scalar_one_or_none()
+            return self._serialize(row)
+    
+    def save(self, user_id: int, source: str, account_id: str, cursor: Optional[str], state: Optional[Dict] = None):
+        """Store the position the next import resumes from"""
+        db = SessionLocal()
+        try:
+            db.execute(self._upsert_statement(user_id, source, account_id, cursor, state))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    async def asave(self, user_id: int, source: str, account_id: str, cursor: Optional[str], state: Optional[Dict] = None):
+        """Async save()"""
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(self._upsert_statement(user_id, source, account_id, cursor, state))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+    
+    def _select_statement(self, user_id: int, source: str, account_id: str):
+        return select(SyncCursor).where(
+            SyncCursor.user_id == user_id,
+            SyncCursor.source == source,
+            SyncCursor.account_id == account_id
+        )
+    
+    def _upsert_statement(self, user_id: int, source: str, account_id: str, cursor: Optional[str], state: Optional[Dict]):
+        statement = insert(SyncCursor).values(
+            user_id=user_id,
+            source=source,
+            account_id=account_id,
+            cursor=cursor,
+            state=state or {}
+        )
+        return statement.on_conflict_do_update(
+            index_elements=[SyncCursor.user_id, SyncCursor.source, SyncCursor.account_id],
+            set_={
+                "cursor": statement.excluded.cursor,
+                "state": statement.excluded.state,
+                "updated_at": func.now()
+            }
+        )
+    
+    def _serialize(self, row: Optional[SyncCursor]) -> Optional[Dict]:
+        if row is None:
+            return None
+        return {
+            "cursor": row.cursor,
+            "state": row.state or {},
+            "updated_at": row.updated_at.isoformat() if row.updated_at else None
+        }
+
+
+# Singleton instance
+sync_cursor_service = SyncCursorService()
@@ -0,0 +1,298 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, func, or_, exists, text, cast, literal, String
+from sqlalchemy.dialects.postgresql import insert
+from typing import Dict, List, Optional
+from app.config import settings
+from app.database import SessionLocal, AsyncSessionLocal
+from app.models.social_account import SocialAccount
+from app.models.sync_job import SyncJob
+
+
+class SyncJobService:
+    """Queue of background syncs of connected accounts (the sync_jobs table)
+    
+    Routers enqueue jobs and read their status; SyncWorker threads claim
+    them, report progress and record the outcome. Every state change is a
+    committed row, so a job queued by one app process can be run by another.
+    """
+    
+    # Platforms an account can be synced from. Not Twitter: its client uses
+    # the operator's app-wide credentials, so any user connecting "twitter"
+    # would get the operator's timeline until per-user OAuth exists
+    PLATFORMS = ("linkedin", "gmail", "notion")
+    
+    # Statuses covered by the one-active-job-per-account unique index
+    ACTIVE_STATUSES = ("queued", "running")
+    
+    # pg_advisory_xact_lock key serializing claims, so the concurrency caps
+    # hold across every process running workers
+    CLAIM_LOCK_KEY = 7_301_001
+    
+    async def enqueue(self, user_id: int, platform: str, trigger: str = "manual") -> List[Dict]:
+        """Queue a sync of each of the user's active accounts on a platform
+        
+        An account that already has a queued or running job gets that job
+        back instead of a second one. Returns the accounts' active jobs.
+        """
+        accounts = select(
+            SocialAccount.user_id,
+            SocialAccount.id,
+            SocialAccount.platform
+        ).where(
+            SocialAccount.user_id == user_id,
+            SocialAccount.platform == platform,
+            SocialAccount.is_active.is_(True)
+        )
+        
+        async with AsyncSessionLocal() as db:
+            try:
+                await db.execute(self._enqueue_statement(accounts, trigger))
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+            
+            jobs = (await db.execute(
+                select(SyncJob).where(
+                    SyncJob.user_id == user_id,
+                    SyncJob.platform == platform,
+                    SyncJob.status.in_(self.ACTIVE_STATUSES)
+                ).order_by(SyncJob.id)
+            )).scalars().all()
+            return [self.serialize(job) for job in jobs]
+    
+    def enqueue_due(self) -> int:
+        """Queue scheduled syncs of accounts last synced over SYNC_INTERVAL_MINUTES ago
+        
+        Accounts with a job created within the interval are skipped too, so
+        an account whose syncs fail is retried once per interval, not on
+        every scheduler poll. Returns the number of jobs queued.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.SYNC_INTERVAL_MINUTES)
+        recent_job = select(SyncJob.id).where(
+            SyncJob.social_account_id == SocialAccount.id,
+            SyncJob.created_at >= cutoff
+        )
+        accounts = select(
+            SocialAccount.user_id,
+            SocialAccount.id,
+            SocialAccount.platform
+        ).where(
+            SocialAccount.is_active.is_(True),
+            SocialAccount.platform.in_(self.PLATFORMS),
+            or_(SocialAccount.last_synced_at.is_(None), SocialAccount.last_synced_at < cutoff),
+            ~exists(recent_job)
+        )
+        
+        db = SessionLocal()
+        try:
+            queued = db.execute(self._enqueue_statement(accounts, "scheduled")).rowcount
+            db.commit()
+            return queued
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def claim_next(self) -> Optional[Dict]:
+        """Mark the oldest queued job whose user and platform are under their caps as running
+        
+        Returns the job with its account's credentials, or None when nothing
+        can start yet (the queue is empty or every queued job is capped).
+        """
+        running = SyncJob.status == "running"
+        busy_users = select(SyncJob.user_id).where(running).group_by(SyncJob.user_id).having(
+            func.count() >= settings.SYNC_MAX_JOBS_PER_USER
+        )
+        busy_platforms = select(SyncJob.platform).where(running).group_by(SyncJob.platform).having(
+            func.count() >= settings.SYNC_MAX_JOBS_PER_PLATFORM
+        )
+        
+        db = SessionLocal()
+        try:
+            # Held until commit: counting and claiming must not interleave
+            db.execute(select(func.pg_advisory_xact_lock(self.CLAIM_LOCK_KEY)))
+            
+            row = db.execute(
+                select(SyncJob, SocialAccount)
+                .join(SocialAccount, SocialAccount.id == SyncJob.social_account_id)
+                .where(
+                    SyncJob.status == "queued",
+                    SyncJob.user_id.not_in(busy_users),
+                    SyncJob.platform.not_in(busy_platforms)
+                )
+                .order_by(SyncJob.id)
+                .limit(1)
+                .with_for_update(of=SyncJob, skip_locked=True)
+            ).first()
+            
+            if row is None:
+                db.commit()
+                return None
+            
+            job, account = row
+            claimed = {
+                "job_id": job.id,
+                "user_id": job.user_id,
+                "platform": job.platform,
+                "account_id": account.id,
+                "access_token": account.access_token,
+                "refresh_token": account.refresh_token,
+                "token_expires_at": account.token_expires_at,
+                "platform_user_id": account.platform_user_id
+            }
+            job.status = "running"
+            job.started_at = func.now()
+            db.commit()
+            return claimed
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def update_progress(self, job_id: int, progress: Dict):
+        """Store a running job's latest counts (also its liveness heartbeat)"""
+        self._execute(
+            update(SyncJob)
+            .where(SyncJob.id == job_id, SyncJob.status == "running")
+            .values(progress=progress, updated_at=func.now())
+        )
+    
+    def heartbeat(self, job_ids: List[int]) -> int:
+        """Mark running jobs as alive, whether or not their counts moved"""
+        if not job_ids:
+            return 0
+        return self._execute(
+            update(SyncJob)
+            .where(SyncJob.id.in_(job_ids), SyncJob.status == "running")
+            .values(updated_at=func.now())
+        )
+    
+    def finish(self, job: Dict, result: Dict) -> bool:
+        """Record a sync's response; a successful one advances the account's last_synced_at
+        
+        Only a job still running is finished: one failed by fail_stale in the
+        meantime keeps its status. Returns whether the job was updated.
+        """
+        succeeded = bool(result.get("success"))
+        db = SessionLocal()
+        try:
+            finished = db.execute(
+                update(SyncJob)
+                .where(SyncJob.id == job["job_id"], SyncJob.status == "running")
+                .values(
+                    status="succeeded" if succeeded else "failed",
+                    result=result,
+                    error=None if succeeded else (result.get("error") or "Sync failed"),
+                    finished_at=func.now()
+                )
+            ).rowcount
+            if finished and succeeded:
+                db.execute(
+                    update(SocialAccount)
+                    .where(SocialAccount.id == job["account_id"])
+                    .values(last_synced_at=func.now())
+                )
+            db.commit()
+            return bool(finished)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def update_token(self, account_id: int, access_token: str, expires_at: Optional[datetime]):
+        """Store an access token a sync refreshed, so the next job starts with it"""
+        self._execute(
+            update(SocialAccount)
+            .where(SocialAccount.id == account_id)
+            .values(access_token=access_token, token_expires_at=expires_at)
+        )
+    
+    def fail_stale(self) -> int:
+        """Fail running jobs without a heartbeat for SYNC_JOB_STALE_MINUTES
+        
+        Workers touch their jobs every scheduler poll (see heartbeat), so only
+        jobs whose worker died or whose process was stopped go stale; failing
+        them frees the account for its next manual or scheduled sync.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(minutes=settings.SYNC_JOB_STALE_MINUTES)
+        return self._execute(
+            update(SyncJob)
+            .where(SyncJob.status == "running", SyncJob.updated_at < cutoff)
+            .values(
+                status="failed",
+                error="Sync worker stopped before the job finished",
+                finished_at=func.now()
+            )
+        )
+    
+    async def get_job(self, user_id: int, job_id: int) -> Optional[Dict]:
+        """One of the user's jobs, or None"""
+        async with AsyncSessionLocal() as db:
+            job = (await db.execute(
+                select(SyncJob).where(SyncJob.id == job_id, SyncJob.user_id == user_id)
+            )).scalar_one_or_none()
+            return self.serialize(job) if job else None
+    
+    async def list_jobs(
+        self,
+        user_id: int,
+        platform: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict]:
+        """The user's most recent jobs, newest first"""
+        query = select(SyncJob).where(SyncJob.user_id == user_id)
+        if platform:
+            query = query.where(SyncJob.platform == platform)
+        if status:
+            query = query.where(SyncJob.status == status)
+        
+        async with AsyncSessionLocal() as db:
+            jobs = (await db.execute(query.order_by(SyncJob.id.desc()).limit(limit))).scalars().all()
+            return [self.serialize(job) for job in jobs]
+    
+    def _enqueue_statement(self, accounts, trigger: str):
+        """INSERT a queued job per (user_id, id, platform) row of accounts, skipping accounts with an active job"""
+        statement = insert(SyncJob).from_select(
+            ["user_id", "social_account_id", "platform", "status", "trigger"],
+            accounts.add_columns(cast(literal("queued"), String), cast(literal(trigger), String))
+        )
+        return statement.on_conflict_do_nothing(
+            index_elements=[SyncJob.social_account_id],
+            index_where=text("status IN ('queued', 'running')")
+        )
+    
+    def _execute(self, statement) -> int:
+        db = SessionLocal()
+        try:
+            rowcount = db.execute(statement).rowcount
+            db.commit()
+            return rowcount
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def serialize(self, job: SyncJob) -> Dict:
+        return {
+            "job_id": job.id,
+            "platform": job.platform,
+            "account_id": job.social_account_id,
+            "status": job.status,
+            "trigger": job.trigger,
+            "progress": job.progress or {},
+            "result": job.result,
+            "error": job.error,
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "finished_at": job.finished_at.isoformat() if job.finished_at else None
+        }
+
+
+# Singleton instance
+sync_job_service = SyncJobService()
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from app.config import settings
+from app.services.sync_job_service import sync_job_service
+
+
+class JobProgress:
+    """Progress callback of one running job, written to its row at most every SYNC_PROGRESS_INTERVAL_SECONDS"""
+    
+    def __init__(self, job_id: int, write_on_report: bool = True):
+        self.job_id = job_id
+        self.write_on_report = write_on_report
+        self._latest: Optional[Dict] = None
+        self._written: Optional[Dict] = None
+        self._written_at = 0.0
+        self._lock = threading.Lock()
+    
+    def __call__(self, counts: Dict):
+        with self._lock:
+            self._latest = dict(counts)
+        if self.write_on_report:
+            self.flush()
+    
+    def flush(self, force: bool = False):
+        """Write the latest counts if they changed and the interval has passed"""
+        with self._lock:
+            latest = self._latest
+            due = force or time.monotonic() - self._written_at >= settings.SYNC_PROGRESS_INTERVAL_SECONDS
+            if latest is None or latest == self._written or not due:
+                return
+            self._written, self._written_at = latest, time.monotonic()
+        
+        try:
+            sync_job_service.update_progress(self.job_id, latest)
+        except Exception as e:
+            print(f"Sync job {self.job_id} progress update failed: {str(e)}")
+
+
+class SyncWorker:
+    """Pool of threads that run queued sync jobs, plus a scheduler thread that queues due ones
+    
+    The queue is the sync_jobs table (see SyncJobService.claim_next), so
+    jobs outlive the request that queued them and the per-user and
+    per-platform caps apply across every app process. Gmail syncs block,
+    so they run in the worker thread itself; Notion and LinkedIn syncs are
+    coroutines and are submitted to the app's event loop, where the pooled
+    HTTP, database and Qdrant clients live, while the worker thread waits
+    for them.
+    """
+    
+    def __init__(self):
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Jobs this process is running, kept alive by the scheduler's heartbeat
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+    
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Start SYNC_WORKERS worker threads and the scheduler (no-op if already running)
+        
+        loop is the app's event loop, which runs the async platforms' syncs.
+        """
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        
+        self._loop = loop
+        self._stopping.clear()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"sync-worker-{i}", daemon=True)
+            for i in range(settings.SYNC_WORKERS)
+        ]
+        self._threads.append(threading.Thread(target=self._schedule, name="sync-scheduler", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        print(f"✅ Sync workers started ({settings.SYNC_WORKERS})")
+    
+    def stop(self, timeout: float = 5.0):
+        """Ask the threads to exit once their current job is done
+        
+        Jobs still running after timeout are abandoned with the process; with
+        no heartbeat they are failed later by SyncJobService.fail_stale.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+        self._threads = []
+    
+    def notify(self):
+        """Wake the workers up because jobs were queued"""
+        self._wakeup.set()
+    
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                job = sync_job_service.claim_next()
+            except Exception as e:
+                print(f"Sync worker error: {str(e)}")
+                job = None
+            
+            if job is None:
+                # Nothing claimable: the queue is empty or every job is capped
+                self._wakeup.wait(timeout=settings.SYNC_SCHEDULER_POLL_SECONDS)
+                self._wakeup.clear()
+                continue
+            
+            with self._running_lock:
+                self._running.add(job["job_id"])
+            try:
+                result = self._run(job)
+                if not sync_job_service.finish(job, result):
+                    print(f"Sync job {job['job_id']} was no longer running; its result was dropped")
+            except Exception as e:
+                print(f"Sync job {job['job_id']} could not be finished: {str(e)}")
+            finally:
+                with self._running_lock:
+                    self._running.discard(job["job_id"])
+            
+            # A finished job frees a slot another worker may be waiting for
+            self._wakeup.set()
+    
+    def _run(self, job: Dict) -> Dict:
+        """Run one job's sync and return its response"""
+        from app.services.gmail_service import gmail_service
+        from app.services.notion_service import notion_service
+        from app.services.linkedin_service import linkedin_service
+        
+        platform = job["platform"]
+        user_id = job["user_id"]
+        access_token = job["access_token"]
+        
+        try:
+            if platform == "gmail":
+                return gmail_service.sync_to_memory(
+                    access_token,
+                    user_id,
+                    progress=JobProgress(job["job_id"]),
+                    refresh_token=job["refresh_token"],
+                    token_expires_at=job["token_expires_at"],
+                    on_token_refresh=lambda token, expires_at: self._save_token(job, token, expires_at)
+                )
+            if platform == "notion":
+                progress = JobProgress(job["job_id"], write_on_report=False)
+                return self._run_on_loop(notion_service.sync_to_memory(access_token, user_id, progress=progress), progress)
+            if platform == "linkedin":
+                return self._run_on_loop(linkedin_service.sync_to_memory(access_token, user_id))
+            return {"success": False, "error": f"Unsupported platform: {platform}"}
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+    
+    def _save_token(self, job: Dict, access_token: str, expires_at: Optional[datetime]):
+        """Store the token a sync refreshed (a failed write only costs another refresh next time)"""
+        try:
+            sync_job_service.update_token(job["account_id"], access_token, expires_at)
+        except Exception as e:
+            print(f"Sync job {job['job_id']} could not store the refreshed token: {str(e)}")
+    
+    def _run_on_loop(self, coroutine, progress: Optional[JobProgress] = None) -> Dict:
+        """Run a coroutine on the app's loop, writing its progress from this thread
+        
+        The database write stays off the event loop, which keeps serving
+        requests while the sync runs.
+        """
+        future = asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+        while True:
+            try:
+                return future.result(timeout=settings.SYNC_PROGRESS_INTERVAL_SECONDS)
+            except FutureTimeoutError:
+                if not self._loop.is_running():
+                    future.cancel()
+                    return {"success": False, "error": "App event loop stopped during the sync"}
+                if progress:
+                    progress.flush()
+    
+    def _schedule(self):
+        while not self._stopping.is_set():
+            try:
+                with self._running_lock:
+                    running = list(self._running)
+                sync_job_service.heartbeat(running)
+                sync_job_service.fail_stale()
+                if settings.SYNC_INTERVAL_MINUTES > 0 and sync_job_service.enqueue_due():
+                    self._wakeup.set()
+            except Exception as e:
+                print(f"Sync scheduler error: {str(e)}")
+            
+            self._stopping.wait(timeout=settings.SYNC_SCHEDULER_POLL_SECONDS)
+
+
+# Singleton instance
+sync_worker = SyncWorker()
@@ -1,9 +1,23 @@
+import time
+import requests
 import tweepy
 from app.config import settings
-from typing import List, Dict, Optional
+from app.services.sync_cursor_service import sync_cursor_service
+from app.utils.rate_limiter import rate_limiter
+from typing import Callable, List, Dict, Iterator, Optional, Tuple
 
 
 class TwitterService:
+    # get_users_tweets page size limits, and how far back the API lets a timeline go
+    PAGE_MIN = 5
+    PAGE_MAX = 100
+    TIMELINE_LIMIT = 3200
+    
+    TWEET_FIELDS = ['id', 'text', 'created_at', 'public_metrics']
+    
+    # Rate-limit bucket of the configured credentials
+    RATE_LIMIT_ACCOUNT = "app"
+    
     def __init__(self):
         """Initialize Twitter API client with OAuth 1.0a credentials"""
         self.client = tweepy.Client(
@@ -11,13 +25,63 @@ class TwitterService:
             consumer_key=settings.TWITTER_API_KEY,
             consumer_secret=settings.TWITTER_API_SECRET,
             access_token=settings.TWITTER_ACCESS_TOKEN,
-            access_token_secret=settings.TWITTER_ACCESS_TOKEN_SECRET
+            access_token_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
+            # Raw responses keep the x-rate-limit-* headers; _call parses the body
+            return_type=requests.Response
         )
+        # The credentials are fixed, so the account behind them never changes
+        self._user_id: Optional[int] = None
+    
+    def _call(self, method, data_type, **kwargs) -> tweepy.Response:
+        """Call a tweepy.Client method through the rate limiter, retrying on 429
+        
+        Every response's x-rate-limit-remaining/reset adapt the bucket, so it
+        slows down before the window runs out. Twitter's 429 carries the reset
+        too, so a retry waits for the window to reopen instead of failing the
+        sync (up to RATE_LIMIT_MAX_WAIT). data_type is the tweepy model the
+        response's data is parsed into.
+        """
+        attempt = 0
+        while True:
+            rate_limiter.acquire("twitter", self.RATE_LIMIT_ACCOUNT)
+            try:
+                response = method(**kwargs)
+            except tweepy.TooManyRequests as e:
+                retry_after = rate_limiter.observe("twitter", self.RATE_LIMIT_ACCOUNT, 429, e.response.headers)
+                delay = rate_limiter.retry_delay(attempt, retry_after)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            
+            rate_limiter.observe("twitter", self.RATE_LIMIT_ACCOUNT, response.status_code, response.headers)
+            return self._parse(response, data_type)
+    
+    @staticmethod
+    def _parse(response: requests.Response, data_type) -> tweepy.Response:
+        """The tweepy.Response tweepy.Client would have returned for a raw response"""
+        body = response.json()
+        data = body.get("data")
+        if data is not None:
+            data = [data_type(item) for item in data] if isinstance(data, list) else data_type(data)
+        return tweepy.Response(data, body.get("includes", {}), body.get("errors", []), body.get("meta", {}))
+    
+    def get_authenticated_user_id(self) -> int:
+        """ID of the account behind the configured credentials (one get_me() per process)"""
+        if self._user_id is None:
+            me = self._call(self.client.get_me, tweepy.User)
+            if not me.data:
+                raise ValueError("Could not get user ID")
+            self._user_id = me.data.id
+        return self._user_id
     
     def get_my_user_info(self) -> Dict:
         """Get authenticated user's information"""
         try:
-            me = self.client.get_me(
+            me = self._call(
+                self.client.get_me,
+                tweepy.User,
                 user_fields=['id', 'name', 'username', 'description', 'created_at', 'public_metrics']
             )
             
@@ -42,32 +106,13 @@ class TwitterService:
     def get_my_recent_tweets(self, max_results: int = 10) -> Dict:
         """Get authenticated user's recent tweets"""
         try:
-            # First get user ID
-            me = self.client.get_me()
-            if not me.data:
-                return {"success": False, "error": "Could not get user ID"}
-            
-            user_id = me.data.id
-            
-            # Get user's tweets
-            tweets = self.client.get_users_tweets(
-                id=user_id,
-                max_results=max_results,
-                tweet_fields=['id', 'text', 'created_at', 'public_metrics']
-            )
+            tweet_list = [
+                tweet
+                for page in self.iter_tweet_pages(max_tweets=max_results)
+                for tweet in page
+            ]
             
-            if tweets.data:
-                tweet_list = []
-                for tweet in tweets.data:
-                    tweet_list.append({
-                        "id": tweet.id,
-                        "text": tweet.text,
-                        "created_at": str(tweet.created_at),
-                        "likes": tweet.public_metrics.get('like_count', 0),
-                        "retweets": tweet.public_metrics.get('retweet_count', 0),
-                        "replies": tweet.public_metrics.get('reply_count', 0)
-                    })
-                
+            if tweet_list:
                 return {
                     "success": True,
                     "count": len(tweet_list),
@@ -78,10 +123,169 @@ class TwitterService:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def iter_tweet_pages(self, since_id: Optional[str] = None, max_tweets: int = TIMELINE_LIMIT) -> Iterator[List[Dict]]:
+        """Yield the authenticated user's tweets page by page, newest first
+        
+        Follows pagination_token until the timeline (or everything newer than
+        since_id) is exhausted or max_tweets have been yielded.
+        """
+        remaining = max_tweets
+        for page, _ in self._iter_timeline(since_id, max_tweets):
+            page = page[:remaining]
+            yield page
+            remaining -= len(page)
+            if remaining <= 0:
+                break
+    
+    def _iter_timeline(
+        self,
+        since_id: Optional[str],
+        max_tweets: int,
+        pagination_token: Optional[str] = None
+    ) -> Iterator[Tuple[List[Dict], Optional[str]]]:
+        """Yield (page, token of the page after it) until the timeline ends or max_tweets are reached
+        
+        Pages are whole (at least PAGE_MIN tweets are requested), so the token
+        resumes right below the last tweet yielded. It is None on the last page.
+        """
+        user_id = self.get_authenticated_user_id()
+        remaining = max_tweets
+        
+        while remaining > 0:
+            response = self._call(
+                self.client.get_users_tweets,
+                tweepy.Tweet,
+                id=user_id,
+                max_results=max(self.PAGE_MIN, min(self.PAGE_MAX, remaining)),
+                since_id=since_id,
+                pagination_token=pagination_token,
+                tweet_fields=self.TWEET_FIELDS
+            )
+            
+            page = [self._format_tweet(tweet) for tweet in (response.data or [])]
+            pagination_token = (response.meta or {}).get("next_token")
+            if page:
+                yield page, pagination_token
+            remaining -= len(page)
+            
+            if not pagination_token:
+                break
+    
+    def sync_to_memory(
+        self,
+        user_id: int,
+        max_tweets: int = TIMELINE_LIMIT,
+        full_resync: bool = False,
+        progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Store tweets newer than the account's since_id cursor as memories
+        
+        Each page is written as it arrives; the cursor moves to the newest
+        tweet only after every page was stored, so a failed run is retried in
+        full. A run cut short by max_tweets keeps the old since_id and saves
+        where it stopped, and the next run carries on from there before the
+        cursor advances. Once caught up, a sync is a single small API call.
+        max_tweets is rounded up to whole pages. Runs in a
+        worker thread (tweepy and the sync MemoryService block); progress, if
+        given, is called with the running counts after each page.
+        """
+        from app.services.memory_service import memory_service
+        
+        try:
+            account_id = str(self.get_authenticated_user_id())
+            saved = None if full_resync else sync_cursor_service.get(user_id, "twitter", account_id)
+            since_id = saved["cursor"] if saved else None
+            
+            # Left by a previous run that max_tweets cut short
+            state = saved["state"] if saved else {}
+            resume_token = state.get("pagination_token")
+            newest_id = state.get("newest_id") if resume_token else None
+            
+            fetched = saved_count = deduplicated = pages = 0
+            next_token = None
+            errors = []
+            
+            for page, next_token in self._iter_timeline(since_id, max_tweets, resume_token):
+                pages += 1
+                fetched += len(page)
+                newest_id = newest_id or str(page[0]["id"])
+                
+                bulk_result = memory_service.create_memories_bulk(
+                    user_id=user_id,
+                    items=[self._memory_item(tweet) for tweet in page]
+                )
+                saved_count += bulk_result["created"]
+                deduplicated += bulk_result["deduplicated"]
+                errors.extend(r["error"] for r in bulk_result["results"] if r.get("error"))
+                
+                if progress:
+                    progress({"pages_fetched": pages, "tweets_fetched": fetched, "memories_saved": saved_count})
+            
+            if newest_id and not errors:
+                if next_token:
+                    # Tweets between since_id and the last page remain: resume below it next run
+                    sync_cursor_service.save(
+                        user_id,
+                        "twitter",
+                        account_id,
+                        since_id,
+                        {"newest_id": newest_id, "pagination_token": next_token, "last_sync_fetched": fetched}
+                    )
+                else:
+                    sync_cursor_service.save(
+                        user_id,
+                        "twitter",
+                        account_id,
+                        newest_id,
+                        {"last_sync_fetched": fetched}
+                    )
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+        
+        return {
+            "success": True,
+            "incremental": since_id is not None,
+            "since_id": since_id,
+            "newest_id": newest_id or since_id,
+            "complete": not next_token,
+            "pages_fetched": pages,
+            "tweets_fetched": fetched,
+            "memories_saved": saved_count,
+            "duplicates_skipped": deduplicated,
+            "errors": errors if errors else None,
+            "message": f"Successfully synced {saved_count} tweets to memory!"
+        }
+    
+    def _format_tweet(self, tweet) -> Dict:
+        return {
+            "id": tweet.id,
+            "text": tweet.text,
+            "created_at": str(tweet.created_at),
+            "likes": tweet.public_metrics.get('like_count', 0),
+            "retweets": tweet.public_metrics.get('retweet_count', 0),
+            "replies": tweet.public_metrics.get('reply_count', 0)
+        }
+    
+    def _memory_item(self, tweet: Dict) -> Dict:
+        return {
+            "content": tweet["text"],
+            "source": "twitter",
+            "category": "tweet",
+            "meta_data": {
+                "likes": tweet["likes"],
+                "retweets": tweet["retweets"],
+                "replies": tweet["replies"]
+            },
+            "original_post_id": str(tweet["id"]),
+            "original_url": f"https://twitter.com/i/web/status/{tweet['id']}"
+        }
+    
     def search_user_by_username(self, username: str) -> Dict:
         """Search for a user by username"""
         try:
-            user = self.client.get_user(
+            user = self._call(
+                self.client.get_user,
+                tweepy.User,
                 username=username,
                 user_fields=['id', 'name', 'username', 'description', 'public_metrics']
             )
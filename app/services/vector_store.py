@@ -0,0 +1,415 @@
+import asyncio
+import json
+import os
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.models import CollectionsResponse, CollectionDescription, ScoredPoint
+from app.config import settings
+
+try:
+    import hnswlib
+except ImportError:  # optional: without it large users are searched brute force
+    hnswlib = None
+
+
+class _Collection:
+    """One embedded collection: a memory-mapped vector matrix plus an append-only log
+    
+    Row i of `<name>.vectors` holds the unit-normalised vector of the point stored
+    at row i. `<name>.log` records upserts/deletes (id, row, payload) as JSON lines
+    and is replayed on load, then compacted once it is mostly dead entries.
+    """
+    
+    # Payload fields kept in an inverted index for filtering
+    INDEXED_FIELDS = ("user_id", "source", "category")
+    
+    def __init__(self, directory: str, name: str, dimension: int, dtype: str):
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.vectors_path = os.path.join(directory, f"{name}.vectors")
+        self.log_path = os.path.join(directory, f"{name}.log")
+        
+        self.capacity = 0
+        self.matrix: Optional[np.memmap] = None
+        self.ids: List[Optional[str]] = []
+        self.payloads: List[Optional[Dict]] = []
+        self.id_to_row: Dict[str, int] = {}
+        self.free_rows: List[int] = []
+        self.field_rows: Dict[Tuple[str, Any], Set[int]] = defaultdict(set)
+        self.log_entries = 0
+        self.hnsw: Dict[Any, Any] = {}
+        
+        if os.path.exists(self.vectors_path):
+            row_bytes = self.dimension * self.dtype.itemsize
+            self._map(os.path.getsize(self.vectors_path) // row_bytes)
+        self._replay_log()
+    
+    # Storage
+    
+    def _map(self, capacity: int):
+        if capacity:
+            self.matrix = np.memmap(self.vectors_path, dtype=self.dtype, mode="r+", shape=(capacity, self.dimension))
+        self.capacity = capacity
+    
+    def _grow(self, needed: int):
+        if needed <= self.capacity:
+            return
+        capacity = max(1024, self.capacity * 2, needed)
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+        with open(self.vectors_path, "ab") as f:
+            f.truncate(capacity * self.dimension * self.dtype.itemsize)
+        self._map(capacity)
+    
+    def _replay_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                if entry["op"] == "upsert":
+                    self._set_row(entry["row"], entry["id"], entry["payload"])
+                else:
+                    self._clear_row(entry["id"])
+                self.log_entries += 1
+        self.free_rows = [row for row, point_id in enumerate(self.ids) if point_id is None]
+    
+    def _append_log(self, entries: List[Dict]):
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        self.log_entries += len(entries)
+        
+        # Compact once dead entries dominate the log
+        if self.log_entries > 2 * len(self.id_to_row) + 1000:
+            tmp_path = self.log_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for point_id, row in self.id_to_row.items():
+                    f.write(json.dumps({"op": "upsert", "id": point_id, "row": row, "payload": self.payloads[row]}) + "\n")
+            os.replace(tmp_path, self.log_path)
+            self.log_entries = len(self.id_to_row)
+    
+    # Row bookkeeping
+    
+    def _set_row(self, row: int, point_id: str, payload: Dict):
+        while len(self.ids) <= row:
+            self.ids.append(None)
+            self.payloads.append(None)
+        if self.ids[row] is not None and self.ids[row] != point_id:
+            self._clear_row(self.ids[row])
+        self._unindex(row)
+        
+        self.ids[row] = point_id
+        self.payloads[row] = payload
+        self.id_to_row[point_id] = row
+        for field in self.INDEXED_FIELDS:
+            if payload.get(field) is not None:
+                self.field_rows[(field, payload[field])].add(row)
+    
+    def _clear_row(self, point_id: str) -> Optional[int]:
+        row = self.id_to_row.pop(point_id, None)
+        if row is None:
+            return None
+        self._unindex(row)
+        self.ids[row] = None
+        self.payloads[row] = None
+        return row
+    
+    def _unindex(self, row: int):
+        payload = self.payloads[row] if row < len(self.payloads) else None
+        if not payload:
+            return
+        for field in self.INDEXED_FIELDS:
+            rows = self.field_rows.get((field, payload.get(field)))
+            if rows is not None:
+                rows.discard(row)
+        index = self.hnsw.get(payload.get("user_id"))
+        if index is not None:
+            try:
+                index.mark_deleted(row)
+            except RuntimeError:
+                pass
+    
+    # Operations
+    
+    def upsert(self, points: List):
+        entries = []
+        for point in points:
+            point_id = str(point.id)
+            vector = np.asarray(point.vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector = vector / norm
+            
+            row = self.id_to_row.get(point_id)
+            if row is None:
+                row = self.free_rows.pop() if self.free_rows else len(self.ids)
+            self._grow(row + 1)
+            
+            payload = dict(point.payload or {})
+            self.matrix[row] = vector.astype(self.dtype)
+            self._set_row(row, point_id, payload)
+            self._add_to_hnsw(payload.get("user_id"), row)
+            entries.append({"op": "upsert", "id": point_id, "row": row, "payload": payload})
+        
+        if self.matrix is not None:
+            self.matrix.flush()
+        self._append_log(entries)
+    
+    def set_payload(self, point_ids: List, payload: Dict):
+        """Merge payload into stored points, keeping their vectors (unknown ids are skipped)"""
+        entries = []
+        for point_id in map(str, point_ids):
+            row = self.id_to_row.get(point_id)
+            if row is None:
+                continue
+            merged = {**self.payloads[row], **payload}
+            self._set_row(row, point_id, merged)
+            self._add_to_hnsw(merged.get("user_id"), row)
+            entries.append({"op": "upsert", "id": point_id, "row": row, "payload": merged})
+        if entries:
+            self._append_log(entries)
+    
+    def delete(self, point_ids: List):
+        entries = []
+        for point_id in point_ids:
+            row = self._clear_row(str(point_id))
+            if row is not None:
+                self.free_rows.append(row)
+                entries.append({"op": "delete", "id": str(point_id)})
+        if entries:
+            self._append_log(entries)
+    
+    def search(self, query_vector: List[float], conditions: List[Tuple[str, Any]], limit: int) -> List[ScoredPoint]:
+        rows = self._candidate_rows(conditions)
+        if rows is None:
+            rows = np.fromiter(self.id_to_row.values(), dtype=np.int64, count=len(self.id_to_row))
+        else:
+            rows = np.fromiter(rows, dtype=np.int64, count=len(rows))
+        if len(rows) == 0 or limit <= 0:
+            return []
+        
+        query = np.asarray(query_vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        
+        labels = None
+        user_id = dict(conditions).get("user_id")
+        if hnswlib is not None and user_id is not None and len(rows) >= settings.EMBEDDED_HNSW_MIN_POINTS:
+            try:
+                labels, scores = self._search_hnsw(user_id, query, rows, limit)
+            except RuntimeError:
+                # Filter left fewer than k reachable points; exact scan instead
+                labels = None
+        if labels is None:
+            labels, scores = self._search_exact(query, rows, limit)
+        
+        return [
+            ScoredPoint(id=self.ids[row], version=0, score=float(score), payload=self.payloads[row])
+            for row, score in zip(labels, scores)
+        ]
+    
+    def _search_exact(self, query: np.ndarray, rows: np.ndarray, limit: int):
+        rows = np.sort(rows)  # sequential reads from the memmap
+        scores = self.matrix[rows].astype(np.float32) @ query
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+    
+    def _candidate_rows(self, conditions: List[Tuple[str, Any]]) -> Optional[Set[int]]:
+        """Rows matching all conditions, or None when unfiltered"""
+        if not conditions:
+            return None
+        
+        rows = None
+        for key, value in conditions:
+            if key in self.INDEXED_FIELDS:
+                matched = self.field_rows.get((key, value), set())
+            else:
+                source = rows if rows is not None else self.id_to_row.values()
+                matched = {row for row in source if self.payloads[row].get(key) == value}
+            rows = set(matched) if rows is None else rows & matched
+            if not rows:
+                break
+        
+        return rows
+    
+    # Optional HNSW graph for users with many points
+    
+    def _search_hnsw(self, user_id, query: np.ndarray, rows: np.ndarray, limit: int):
+        index = self.hnsw.get(user_id)
+        if index is None:
+            index = self._build_hnsw(user_id)
+        
+        allowed = set(rows.tolist())
+        k = min(limit, len(allowed))
+        index.set_ef(max(64, k * 2))
+        labels, distances = index.knn_query(query, k=k, filter=lambda label: label in allowed)
+        # "ip" space returns 1 - dot product
+        return labels[0].astype(np.int64), 1.0 - distances[0]
+    
+    def _build_hnsw(self, user_id):
+        user_rows = np.fromiter(self.field_rows[("user_id", user_id)], dtype=np.int64)
+        index = hnswlib.Index(space="ip", dim=self.dimension)
+        index.init_index(max_elements=max(1024, len(user_rows) * 2), ef_construction=200, M=16)
+        index.add_items(self.matrix[user_rows].astype(np.float32), user_rows)
+        self.hnsw[user_id] = index
+        return index
+    
+    def _add_to_hnsw(self, user_id, row: int):
+        index = self.hnsw.get(user_id)
+        if index is None:
+            return
+        try:
+            # Rows are reused after deletes; an existing label is updated in place
+            index.unmark_deleted(row)
+        except RuntimeError:
+            pass
+        if index.get_current_count() >= index.get_max_elements():
+            index.resize_index(index.get_max_elements() * 2)
+        index.add_items(self.matrix[row:row + 1].astype(np.float32), [row])
+
+
+class EmbeddedVectorStore:
+    """In-process vector index exposing the subset of the QdrantClient API we use
+    
+    Selected with VECTOR_STORE=embedded for small deployments and tests that
+    should not run a Qdrant server. Single-process only: the files under
+    EMBEDDED_VECTOR_PATH must not be shared between app processes.
+    """
+    
+    def __init__(self, path: str, dtype: str = "float32"):
+        self.path = path
+        self.dtype = dtype
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.RLock()
+        os.makedirs(path, exist_ok=True)
+        
+        for filename in os.listdir(path):
+            if filename.endswith(".meta.json"):
+                with open(os.path.join(path, filename), "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                self._open(meta["name"], meta["dimension"], meta["dtype"])
+    
+    def get_collections(self) -> CollectionsResponse:
+        with self._lock:
+            return CollectionsResponse(
+                collections=[CollectionDescription(name=name) for name in self._collections]
+            )
+    
+    def create_collection(self, collection_name: str, vectors_config, **kwargs):
+        with self._lock:
+            meta = {"name": collection_name, "dimension": vectors_config.size, "dtype": self.dtype}
+            with open(os.path.join(self.path, f"{collection_name}.meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            self._open(collection_name, vectors_config.size, self.dtype)
+            return True
+    
+    def upsert(self, collection_name: str, points: List, **kwargs):
+        with self._lock:
+            self._get(collection_name).upsert(points)
+    
+    def delete(self, collection_name: str, points_selector, **kwargs):
+        with self._lock:
+            self._get(collection_name).delete(list(points_selector))
+    
+    def batch_update_points(self, collection_name: str, update_operations: List, **kwargs):
+        """Apply SetPayloadOperations (the only update operation MemoryService sends)"""
+        with self._lock:
+            collection = self._get(collection_name)
+            for operation in update_operations:
+                set_payload = getattr(operation, "set_payload", None)
+                if set_payload is None:
+                    raise Exception(f"Embedded vector store does not support {type(operation).__name__}")
+                collection.set_payload(set_payload.points, set_payload.payload)
+    
+    def search(
+        self,
+        collection_name: str,
+        query_vector: List[float],
+        query_filter=None,
+        limit: int = 10,
+        **kwargs
+    ) -> List[ScoredPoint]:
+        conditions = self._parse_filter(query_filter)
+        with self._lock:
+            return self._get(collection_name).search(query_vector, conditions, limit)
+    
+    def close(self):
+        with self._lock:
+            for collection in self._collections.values():
+                if collection.matrix is not None:
+                    collection.matrix.flush()
+    
+    def _open(self, name: str, dimension: int, dtype: str):
+        self._collections[name] = _Collection(self.path, name, dimension, dtype)
+    
+    def _get(self, name: str) -> _Collection:
+        if name not in self._collections:
+            raise Exception(f"Collection {name} not found")
+        return self._collections[name]
+    
+    def _parse_filter(self, query_filter) -> List[Tuple[str, Any]]:
+        """Accept the dict filters MemoryService builds or qdrant Filter models (must + match only)"""
+        if query_filter is None:
+            return []
+        if not isinstance(query_filter, dict):
+            query_filter = query_filter.model_dump(exclude_none=True)
+        if set(query_filter) - {"must"}:
+            raise Exception("Embedded vector store only supports 'must' filters")
+        
+        conditions = []
+        for condition in query_filter.get("must") or []:
+            match = condition.get("match") or {}
+            if "value" not in match:
+                raise Exception(f"Unsupported filter condition on {condition.get('key')}")
+            conditions.append((condition["key"], match["value"]))
+        return conditions
+
+
+class AsyncEmbeddedVectorStore:
+    """Awaitable facade over EmbeddedVectorStore, matching AsyncQdrantClient call sites
+    
+    Calls run in a worker thread; NumPy releases the GIL for the scoring matmul.
+    """
+    
+    def __init__(self, store: EmbeddedVectorStore):
+        self._store = store
+    
+    def __getattr__(self, name: str):
+        method = getattr(self._store, name)
+        
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+        
+        return call
+
+
+_embedded_store: Optional[EmbeddedVectorStore] = None
+
+
+def get_embedded_store() -> EmbeddedVectorStore:
+    """Process-wide embedded store shared by the sync and async services"""
+    global _embedded_store
+    if _embedded_store is None:
+        _embedded_store = EmbeddedVectorStore(settings.EMBEDDED_VECTOR_PATH, settings.EMBEDDED_VECTOR_DTYPE)
+    return _embedded_store
+
+
+def create_vector_client():
+    """Vector backend selected by VECTOR_STORE ("qdrant" or "embedded")"""
+    if settings.VECTOR_STORE == "embedded":
+        return get_embedded_store()
+    return QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY or None)
+
+
+def create_async_vector_client():
+    """Async counterpart of create_vector_client()"""
+    if settings.VECTOR_STORE == "embedded":
+        return AsyncEmbeddedVectorStore(get_embedded_store())
+    return AsyncQdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY or None)
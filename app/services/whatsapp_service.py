@@ -1,5 +1,6 @@
+import io
 import re
-from typing import Dict, List
+from typing import Dict, Iterable, Iterator, List, Optional, Union
 from datetime import datetime
 
 
@@ -19,87 +20,126 @@ class WhatsAppService:
             r'(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?(?:\s*(?:AM|PM|am|pm))?)\s*-\s*([^:]+):\s*(.+)'
         )
     
-    def parse_whatsapp_chat(self, file_content: str) -> Dict:
-        """Parse WhatsApp chat export file"""
-        try:
-            lines = file_content.split('\n')
-            messages = []
-            current_message = None
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Try to match message pattern
-                match = self.message_pattern.match(line)
-                if not match:
-                    match = self.alt_pattern.match(line)
-                
-                if match:
-                    # Save previous message
-                    if current_message:
-                        messages.append(current_message)
-                    
-                    # Start new message
-                    if len(match.groups()) == 3:
-                        timestamp, sender, text = match.groups()
-                    else:
-                        # Alternative pattern with separate date and time
-                        date, time, sender, text = match.groups()
-                        timestamp = f"{date}, {time}"
-                    
-                    current_message = {
-                        "timestamp": timestamp,
-                        "sender": sender.strip(),
-                        "message": text.strip(),
-                        "is_system": self._is_system_message(text)
-                    }
-                else:
-                    # Multi-line message continuation
-                    if current_message:
-                        current_message["message"] += "\n" + line
-            
-            # Add last message
-            if current_message:
-                messages.append(current_message)
-            
-            # Filter out system messages if needed
-            user_messages = [msg for msg in messages if not msg["is_system"]]
-            
-            # Get chat statistics
-            stats = self._get_chat_stats(messages)
-            
-            return {
-                "success": True,
-                "total_messages": len(messages),
-                "user_messages": len(user_messages),
-                "system_messages": len(messages) - len(user_messages),
-                "data": messages,
-                "statistics": stats
-            }
-        except Exception as e:
-            return {"success": False, "error": f"WhatsApp chat parsing failed: {str(e)}"}
+    def parse_whatsapp_chat(self, file_content: Union[str, Iterable[Union[str, bytes]]]) -> Dict:
+        """Parse WhatsApp chat export file (a string or an iterator of lines)"""
+        return self.parse_whatsapp_chat_filtered(file_content)
     
-    def parse_whatsapp_chat_filtered(self, file_content: str, sender_filter: str = None) -> Dict:
+    def parse_whatsapp_chat_filtered(
+        self,
+        file_content: Union[str, Iterable[Union[str, bytes]]],
+        sender_filter: str = None
+    ) -> Dict:
         """Parse WhatsApp chat and filter by sender"""
-        result = self.parse_whatsapp_chat(file_content)
+        messages = []
+        summary = None
+        
+        for event in self.iter_chat_events(file_content, sender_filter):
+            if event["type"] == "message":
+                event.pop("type")
+                messages.append(event)
+            else:
+                summary = event
         
-        if not result.get("success"):
-            return result
+        if summary["type"] == "error":
+            return {"success": False, "error": summary["error"]}
         
+        result = {
+            "success": True,
+            "total_messages": summary["total_messages"],
+            "user_messages": summary["user_messages"],
+            "system_messages": summary["system_messages"],
+            "data": messages,
+            "statistics": summary["statistics"]
+        }
         if sender_filter:
-            filtered_messages = [
-                msg for msg in result["data"]
-                if sender_filter.lower() in msg["sender"].lower()
-            ]
-            
-            result["data"] = filtered_messages
-            result["filtered_count"] = len(filtered_messages)
+            result["filtered_count"] = summary["filtered_count"]
             result["filter_applied"] = sender_filter
         
         return result
     
+    def iter_chat_events(
+        self,
+        file_content: Union[str, Iterable[Union[str, bytes]]],
+        sender_filter: Optional[str] = None
+    ) -> Iterator[Dict]:
+        """Yield {"type": "message", ...} per (matching) message, then one "summary" event
+        
+        Statistics are accumulated as messages go by, so memory stays constant
+        however long the chat is. A parsing failure ends the stream with an
+        {"type": "error"} event instead of the summary.
+        """
+        stats = ChatStats()
+        filtered_count = 0
+        sender_filter = sender_filter.lower() if sender_filter else None
+        
+        try:
+            for message in self.iter_messages(file_content):
+                stats.add(message)
+                if sender_filter and sender_filter not in message["sender"].lower():
+                    continue
+                filtered_count += 1
+                yield {"type": "message", **message}
+        except Exception as e:
+            yield {"type": "error", "error": f"WhatsApp chat parsing failed: {str(e)}"}
+            return
+        
+        yield {
+            "type": "summary",
+            "total_messages": stats.total_messages,
+            "user_messages": stats.total_messages - stats.system_messages,
+            "system_messages": stats.system_messages,
+            "filtered_count": filtered_count,
+            "statistics": stats.as_dict()
+        }
+    
+    def iter_messages(self, file_content: Union[str, Iterable[Union[str, bytes]]]) -> Iterator[Dict]:
+        """Yield parsed messages one at a time; lines may be str or UTF-8 bytes"""
+        lines = io.StringIO(file_content) if isinstance(file_content, str) else file_content
+        current_message = None
+        current_lines = []
+        
+        for line in lines:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            line = line.strip()
+            if not line:
+                continue
+            
+            # Try to match message pattern
+            match = self.message_pattern.match(line)
+            if not match:
+                match = self.alt_pattern.match(line)
+            
+            if match:
+                # Emit previous message
+                if current_message:
+                    current_message["message"] = "\n".join(current_lines)
+                    yield current_message
+                
+                # Start new message
+                if len(match.groups()) == 3:
+                    timestamp, sender, text = match.groups()
+                else:
+                    # Alternative pattern with separate date and time
+                    date, time, sender, text = match.groups()
+                    timestamp = f"{date}, {time}"
+                
+                current_message = {
+                    "timestamp": timestamp,
+                    "sender": sender.strip(),
+                    "message": None,
+                    "is_system": self._is_system_message(text)
+                }
+                current_lines = [text.strip()]
+            elif current_message:
+                # Multi-line message continuation
+                current_lines.append(line)
+        
+        # Emit last message
+        if current_message:
+            current_message["message"] = "\n".join(current_lines)
+            yield current_message
+    
     def _is_system_message(self, text: str) -> bool:
         """Check if message is a system message"""
         system_keywords = [
@@ -117,30 +157,12 @@ class WhatsAppService:
         text_lower = text.lower()
         return any(keyword.lower() in text_lower for keyword in system_keywords)
     
-    def _get_chat_stats(self, messages: List[Dict]) -> Dict:
+    def _get_chat_stats(self, messages: Iterable[Dict]) -> Dict:
         """Get statistics about the chat"""
-        if not messages:
-            return {}
-        
-        # Count messages per sender
-        sender_counts = {}
-        total_words = 0
-        
+        stats = ChatStats()
         for msg in messages:
-            if msg["is_system"]:
-                continue
-            
-            sender = msg["sender"]
-            sender_counts[sender] = sender_counts.get(sender, 0) + 1
-            total_words += len(msg["message"].split())
-        
-        return {
-            "participants": list(sender_counts.keys()),
-            "participant_count": len(sender_counts),
-            "messages_by_sender": sender_counts,
-            "total_words": total_words,
-            "avg_words_per_message": total_words / len(messages) if messages else 0
-        }
+            stats.add(msg)
+        return stats.as_dict()
     
     def export_to_json(self, messages: List[Dict]) -> str:
         """Export parsed messages to JSON format"""
@@ -156,5 +178,37 @@ class WhatsAppService:
         ]
 
 
+class ChatStats:
+    """Chat statistics accumulated one message at a time"""
+    
+    def __init__(self):
+        self.total_messages = 0
+        self.system_messages = 0
+        self.sender_counts: Dict[str, int] = {}
+        self.total_words = 0
+    
+    def add(self, msg: Dict):
+        self.total_messages += 1
+        if msg["is_system"]:
+            self.system_messages += 1
+            return
+        
+        sender = msg["sender"]
+        self.sender_counts[sender] = self.sender_counts.get(sender, 0) + 1
+        self.total_words += len(msg["message"].split())
+    
+    def as_dict(self) -> Dict:
+        if not self.total_messages:
+            return {}
+        
+        return {
+            "participants": list(self.sender_counts.keys()),
+            "participant_count": len(self.sender_counts),
+            "messages_by_sender": self.sender_counts,
+            "total_words": self.total_words,
+            "avg_words_per_message": self.total_words / self.total_messages
+        }
+
+
 # Singleton instance
 whatsapp_service = WhatsAppService()
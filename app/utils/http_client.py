@@ -0,0 +1,61 @@
+import httpx
+from typing import Dict
+from app.config import settings
+
+try:
+    import h2  # noqa: F401 (httpx negotiates HTTP/2 only when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClients:
+    """One long-lived, pooled httpx.AsyncClient per third-party provider
+    
+    Connections are kept alive between calls (and multiplexed over HTTP/2
+    where the provider supports it), so a sync loop making hundreds of
+    requests pays the TCP and TLS handshakes once per connection instead of
+    once per request. Clients are created on first use, on the app's event
+    loop, and closed on app shutdown. Code running its own loop (asyncio.run
+    in a worker thread) must use create() and close the client itself.
+    """
+    
+    # Per-provider settings; credentials are sent per request, never stored here
+    PROVIDERS = {
+        "notion": {"timeout": 30.0, "http2": True},
+        "linkedin": {"timeout": 15.0, "http2": True},
+        "google": {"timeout": 15.0, "http2": True}
+    }
+    
+    def __init__(self):
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+    
+    def get(self, provider: str) -> httpx.AsyncClient:
+        """The shared client for a provider"""
+        client = self._clients.get(provider)
+        if client is None or client.is_closed:
+            client = self._clients[provider] = self.create(provider)
+        return client
+    
+    def create(self, provider: str) -> httpx.AsyncClient:
+        """A new client with the provider's timeout, pool limits and protocol"""
+        config = self.PROVIDERS[provider]
+        return httpx.AsyncClient(
+            http2=config["http2"] and settings.CONNECTOR_HTTP2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(config["timeout"], connect=settings.CONNECTOR_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.CONNECTOR_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.CONNECTOR_MAX_KEEPALIVE,
+                keepalive_expiry=settings.CONNECTOR_KEEPALIVE_EXPIRY
+            )
+        )
+    
+    async def close(self):
+        """Close every provider's connection pool (on app shutdown)"""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            await client.aclose()
+
+
+# Singleton instance
+http_clients = HttpClients()
@@ -0,0 +1,223 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+from app.config import settings
+
+
+class TokenBucket:
+    """Request budget of one (provider, account)
+    
+    Tokens refill at `rate` per second up to `capacity`. A caller takes its
+    tokens up front and sleeps off any deficit, so concurrent callers queue
+    in order instead of racing. The rate adapts to what the provider reports
+    (see RateLimiter.observe) and never exceeds the configured one.
+    """
+    
+    # Slowest pace adaptation may drop to, as a fraction of the configured rate
+    MIN_RATE_FRACTION = 0.05
+    
+    # AIMD: halve on a 429, win back 10% of the configured rate per success
+    DECREASE_FACTOR = 0.5
+    INCREASE_FRACTION = 0.1
+    
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, cost: float = 1) -> float:
+        """Take cost tokens; returns the seconds to wait before sending"""
+        with self._lock:
+            now = self._refill()
+            self.tokens -= cost
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(wait, self.blocked_until - now)
+    
+    def adapt(
+        self,
+        status_code: int,
+        remaining: Optional[int],
+        reset_in: Optional[float],
+        retry_after: Optional[float]
+    ) -> Optional[float]:
+        """Fold one response into the bucket; returns how long to wait before retrying, if known"""
+        with self._lock:
+            now = self._refill()
+            min_rate = self.max_rate * self.MIN_RATE_FRACTION
+            
+            if remaining is not None:
+                # The provider's count is authoritative
+                self.tokens = min(self.tokens, remaining)
+                if reset_in:
+                    if remaining <= 0:
+                        self.blocked_until = max(self.blocked_until, now + reset_in)
+                    else:
+                        # Spread what is left of the window evenly over it
+                        self.rate = min(self.max_rate, max(min_rate, remaining / reset_in))
+            
+            if status_code == 429:
+                self.rate = max(min_rate, self.rate * self.DECREASE_FACTOR)
+                delay = retry_after
+                if delay is None and remaining is not None and remaining <= 0:
+                    delay = reset_in
+                if delay:
+                    self.blocked_until = max(self.blocked_until, now + delay)
+                return delay
+            
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+            elif status_code < 400 and remaining is None:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * self.INCREASE_FRACTION)
+            return retry_after
+    
+    def _refill(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+
+class RateLimiter:
+    """Token buckets shared by every connector, one per (provider, account)
+    
+    Callers acquire() before each request and report the response to
+    observe(), which adapts the bucket from x-rate-limit-remaining /
+    x-rate-limit-reset and Retry-After headers. Rate-limited calls are
+    retried after retry_delay(): the provider's Retry-After when it sends
+    one, otherwise jittered exponential backoff. acquire() sleeps in the
+    calling thread (tweepy, googleapiclient); aacquire() awaits.
+    """
+    
+    # Provider -> (requests, or quota units, per second; burst)
+    PROVIDERS = {
+        "notion": (3.0, 3),        # ~3 requests/s per integration
+        "twitter": (1.0, 5),       # 900 timeline requests per 15 minutes per user
+        "linkedin": (2.0, 5),
+        "gmail": (250.0, 250)      # 250 quota units/s per user (messages.get costs 5)
+    }
+    
+    # Responses worth retrying after a wait
+    RETRY_STATUSES = {429, 503}
+    
+    def __init__(self):
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def account_key(credential: str) -> str:
+        """Bucket key for an access token (the token itself is not kept)"""
+        return hashlib.sha256(credential.encode("utf-8")).hexdigest()[:16]
+    
+    def bucket(self, provider: str, account: str = "") -> TokenBucket:
+        key = (provider, account)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                rate, capacity = self.PROVIDERS[provider]
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+            return bucket
+    
+    def acquire(self, provider: str, account: str = "", cost: float = 1) -> float:
+        """Block until the request may be sent; returns the seconds waited"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return 0.0
+        wait = self.bucket(provider, account).reserve(cost)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+    
+    async def aacquire(self, provider: str, account: str = "", cost: float = 1) -> float:
+        """Async acquire()"""
+        if not settings.RATE_LIMIT_ENABLED:
+            return 0.0
+        wait = self.bucket(provider, account).reserve(cost)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+    
+    def observe(self, provider: str, account: str, status_code: int, headers: Optional[Mapping] = None) -> Optional[float]:
+        """Adapt the bucket to a response; returns the provider's retry delay, if it gave one"""
+        headers = headers or {}
+        remaining = self._int_header(headers, "x-rate-limit-remaining", "x-ratelimit-remaining")
+        reset = self._int_header(headers, "x-rate-limit-reset", "x-ratelimit-reset")
+        # Twitter sends the reset as epoch seconds, others as seconds from now
+        reset_in = max(0.0, reset - time.time()) if reset and reset > 1_000_000_000 else reset
+        
+        return self.bucket(provider, account).adapt(
+            status_code,
+            remaining,
+            reset_in,
+            self._retry_after(headers)
+        )
+    
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """Seconds to wait before retry number attempt + 1, or None to give up
+        
+        The provider's own delay wins when it sent one; otherwise full jitter
+        keeps clients that failed together from retrying together. Gives up
+        after RATE_LIMIT_MAX_RETRIES or when the wait would exceed
+        RATE_LIMIT_MAX_WAIT (a 15-minute window is not worth holding a request).
+        """
+        if attempt >= settings.RATE_LIMIT_MAX_RETRIES:
+            return None
+        base = settings.RATE_LIMIT_BACKOFF_BASE
+        if retry_after is not None:
+            delay = retry_after + random.uniform(0, base)
+        else:
+            delay = random.uniform(0, min(settings.RATE_LIMIT_BACKOFF_CAP, base * 2 ** attempt))
+        return delay if delay <= settings.RATE_LIMIT_MAX_WAIT else None
+    
+    async def arequest(self, client, provider: str, account: str, method: str, url: str, **kwargs):
+        """Send an httpx request through the provider's bucket, retrying rate-limited calls
+        
+        Returns the last response (still 429/503 if retrying gave up).
+        """
+        attempt = 0
+        while True:
+            await self.aacquire(provider, account)
+            response = await client.request(method, url, **kwargs)
+            retry_after = self.observe(provider, account, response.status_code, response.headers)
+            
+            delay = self.retry_delay(attempt, retry_after) if response.status_code in self.RETRY_STATUSES else None
+            if delay is None:
+                return response
+            await asyncio.sleep(delay)
+            attempt += 1
+    
+    @staticmethod
+    def _int_header(headers: Mapping, *names: str) -> Optional[int]:
+        for name in names:
+            value = headers.get(name)
+            if value is not None:
+                try:
+                    return int(float(value))
+                except (TypeError, ValueError):
+                    return None
+        return None
+    
+    @staticmethod
+    def _retry_after(headers: Mapping) -> Optional[float]:
+        """Retry-After as seconds (it may also be an HTTP date)"""
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
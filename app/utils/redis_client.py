@@ -0,0 +1,78 @@
+import time
+import redis
+import redis.asyncio
+from typing import Optional
+from app.config import settings
+
+
+class RedisClient:
+    """Lazily connected, shared Redis client that degrades to None when Redis is down"""
+    
+    RETRY_AFTER_SECONDS = 30
+    
+    def __init__(self):
+        self._client: Optional[redis.Redis] = None
+        self._async_client: Optional[redis.asyncio.Redis] = None
+        self._last_failure = float("-inf")
+    
+    def get(self) -> Optional[redis.Redis]:
+        """Return a connected client, or None if Redis is unavailable"""
+        if self._client is not None:
+            return self._client
+        
+        # Don't hammer an unreachable Redis on every call
+        if time.monotonic() - self._last_failure < self.RETRY_AFTER_SECONDS:
+            return None
+        
+        try:
+            client = redis.Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=1,
+                socket_timeout=1
+            )
+            client.ping()
+            self._client = client
+            return client
+        except Exception as e:
+            print(f"Redis unavailable: {str(e)}")
+            self._last_failure = time.monotonic()
+            return None
+    
+    async def get_async(self) -> Optional[redis.asyncio.Redis]:
+        """Async counterpart of get() for code running on the event loop"""
+        if self._async_client is not None:
+            return self._async_client
+        
+        if time.monotonic() - self._last_failure < self.RETRY_AFTER_SECONDS:
+            return None
+        
+        try:
+            client = redis.asyncio.Redis.from_url(
+                settings.REDIS_URL,
+                socket_connect_timeout=1,
+                socket_timeout=1
+            )
+            await client.ping()
+            self._async_client = client
+            return client
+        except Exception as e:
+            print(f"Redis unavailable: {str(e)}")
+            self._last_failure = time.monotonic()
+            return None
+    
+    def reset(self):
+        """Drop the current connections so the next call reconnects"""
+        self._client = None
+        self._async_client = None
+        self._last_failure = time.monotonic()
+    
+    async def close(self):
+        """Close the async connection pool (on app shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+# Singleton instance
+redis_client = RedisClient()
+
@@ -20,12 +20,42 @@ CREATE TABLE IF NOT EXISTS memories (
     original_post_id VARCHAR(255),
     original_url TEXT,
     vector_id VARCHAR(255),
+    embedding_status VARCHAR(20) DEFAULT 'skipped',
+    embedding_attempts INTEGER DEFAULT 0,
+    content_tsv TSVECTOR GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    content_simhash BIGINT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     source_timestamp TIMESTAMP
 );
 
 CREATE INDEX IF NOT EXISTS idx_memories_user_id ON memories(user_id);
 CREATE INDEX IF NOT EXISTS idx_memories_source ON memories(source);
+CREATE INDEX IF NOT EXISTS ix_memories_embedding_pending ON memories(id) WHERE embedding_status = 'pending';
+CREATE INDEX IF NOT EXISTS ix_memories_content_tsv ON memories USING GIN (content_tsv);
+CREATE INDEX IF NOT EXISTS ix_memories_user_created ON memories(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_memories_simhash_b0 ON memories(user_id, ((content_simhash >> 0) & 65535));
+CREATE INDEX IF NOT EXISTS ix_memories_simhash_b1 ON memories(user_id, ((content_simhash >> 16) & 65535));
+CREATE INDEX IF NOT EXISTS ix_memories_simhash_b2 ON memories(user_id, ((content_simhash >> 32) & 65535));
+CREATE INDEX IF NOT EXISTS ix_memories_simhash_b3 ON memories(user_id, ((content_simhash >> 48) & 65535));
+
+-- Per-user/source totals; the API installs the maintaining triggers on startup
+CREATE TABLE IF NOT EXISTS memory_counts (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    source VARCHAR(50) NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, source)
+);
+
+-- Incremental import positions (browser history high-water marks, API page tokens)
+CREATE TABLE IF NOT EXISTS sync_cursors (
+    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+    source VARCHAR(50) NOT NULL,
+    account_id VARCHAR(255) NOT NULL DEFAULT '',
+    cursor TEXT,
+    state JSONB DEFAULT '{}',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, source, account_id)
+);
 
 -- Insert test user
 INSERT INTO users (email, username, hashed_password) 